@@ -0,0 +1,80 @@
+# batch_render.py
+"""Headless batch renderer: turns a directory of .gedoc documents into PNGs.
+
+    python batch_render.py boards/ renders/ --scale 1 --scale 0.25 --workers 8
+
+Runs on the Qt offscreen platform and spreads documents over a process pool.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+_app = None
+
+def _init_worker():
+    global _app
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5.QtWidgets import QApplication
+    from main import load_fonts
+    _app = QApplication.instance() or QApplication(['batch_render'])
+    load_fonts()
+
+def output_name(doc_path, scale):
+    stem = os.path.splitext(os.path.basename(doc_path))[0]
+    return f"{stem}.png" if scale == 1 else f"{stem}@{scale:g}x.png"
+
+def render_document(doc_path, out_dir, scales, tile_size):
+    """Render one document at every scale; returns the written paths."""
+    from PyQt5.QtWidgets import QGraphicsScene
+    import document_io, exporter
+    from image_store import image_store
+    scene = QGraphicsScene()
+    document_io.load_document(scene, doc_path)
+    bounds = scene.itemsBoundingRect()
+    outputs = []
+    if bounds.isValid():
+        for scale in scales:
+            out_path = os.path.join(out_dir, output_name(doc_path, scale))
+            exporter.export_png(scene, bounds, out_path, scale=scale, tile_size=tile_size)
+            outputs.append(out_path)
+    # Workers render many documents; drop this one's images from the process-wide store
+    scene.clear(); image_store.collect()
+    return outputs
+
+def find_documents(input_dir):
+    return sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir) if name.endswith('.gedoc'))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render saved documents to PNG without opening the editor.")
+    parser.add_argument('input_dir'); parser.add_argument('output_dir')
+    parser.add_argument('--scale', type=float, action='append', dest='scales', help="Export scale; repeat for several outputs (default 1)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    parser.add_argument('--tile-size', type=int, default=512)
+    args = parser.parse_args(argv)
+    scales = args.scales or [1.0]
+    documents = find_documents(args.input_dir)
+    if not documents:
+        print(f"No .gedoc files in {args.input_dir}"); return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failures = 0
+    # Qt does not survive fork(), so workers are always spawned fresh
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context, initializer=_init_worker) as pool:
+        futures = {pool.submit(render_document, doc, args.output_dir, scales, args.tile_size): doc for doc in documents}
+        for future in as_completed(futures):
+            doc = futures[future]
+            try:
+                outputs = future.result()
+                print(f"{doc}: {', '.join(outputs) if outputs else 'empty document, skipped'}")
+            except Exception as e:
+                failures += 1; print(f"{doc}: FAILED ({e})", file=sys.stderr)
+    print(f"Rendered {len(documents) - failures}/{len(documents)} documents")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
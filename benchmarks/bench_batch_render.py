@@ -0,0 +1,62 @@
+# benchmarks/bench_batch_render.py
+"""Memory of a batch render worker across documents.
+
+    python benchmarks/bench_batch_render.py --documents 20 --images 4
+
+Writes documents that each hold their own images and renders them one after
+another in this process, as a long-lived batch_render worker does, reporting
+the image store's entries and bytes after each. Exits with status 1 if the
+store keeps anything from a document after rendering it.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QGraphicsScene
+from PyQt5.QtGui import QImage, QColor, QPixmap
+from PyQt5.QtCore import QRectF
+
+def write_documents(directory, documents, images):
+    import document_io
+    from graphics_items import ImageItem, RectangleItem
+    from image_store import image_store
+    paths = []
+    for d in range(documents):
+        scene = QGraphicsScene()
+        for i in range(images):
+            image = QImage(800, 600, QImage.Format_ARGB32_Premultiplied); image.fill(QColor(d % 256, i * 40 % 256, 120))
+            item = ImageItem(QPixmap.fromImage(image)); item.setPos(i * 820, 0); scene.addItem(item)
+        rect = RectangleItem(QRectF(0, 0, 100, 100)); rect.setPos(0, 700); scene.addItem(rect)
+        path = os.path.join(directory, f'doc{d:03}.gedoc'); document_io.save_document(scene, path); paths.append(path)
+        scene.clear()
+    image_store.collect()
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=20)
+    parser.add_argument('--images', type=int, default=4)
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    from batch_render import render_document
+    from image_store import image_store
+    growth = 0
+    with tempfile.TemporaryDirectory() as directory:
+        out_dir = os.path.join(directory, 'out'); os.makedirs(out_dir)
+        for path in write_documents(directory, args.documents, args.images):
+            start = time.perf_counter()
+            render_document(path, out_dir, [0.25], 512)
+            # Read the entries directly: stats() would collect first
+            entries = len(image_store.entries); size = sum(image_store.image_bytes(image_id) for image_id in image_store.entries)
+            growth += entries
+            print(f"{os.path.basename(path)}: rendered in {(time.perf_counter() - start) * 1000:6.0f} ms, store {entries} images, {size / 2**20:.1f} MB", flush=True)
+    print(f"store {'stays flat' if not growth else 'GROWS'} across {args.documents} documents")
+    return 1 if growth else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
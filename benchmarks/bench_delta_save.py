@@ -0,0 +1,106 @@
+# benchmarks/bench_delta_save.py
+"""Cost of saving a large board after small edits.
+
+    python benchmarks/bench_delta_save.py --items 100000 --edits 10 100 1000
+
+full      time to write the whole document, as the first save and every
+          compaction do
+delta     time for a save after `edits` property changes, moves, text edits,
+          additions and deletions, which appends only the changed items
+load      time to read the document back with its appended sections, and
+          whether the result matches the board item for item
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QRectF
+
+def make_board(editor, count):
+    from graphics_items import RectangleItem, EllipseItem, TextItem
+    items = []
+    for i in range(count):
+        item = TextItem('english') if i % 500 == 0 else (RectangleItem if i % 2 else EllipseItem)(QRectF(0, 0, 20, 20))
+        item.setPos((i % 300) * 30, (i // 300) * 30); item.setZValue(i)
+        items.append(item)
+    with editor.transaction():
+        for item in items: editor.scene.addItem(item)
+    return items
+
+def edit(editor, items, edits, rng):
+    from commands import PropertyChangeCommand, AddCommand, DeleteCommand
+    from graphics_items import TextItem, RectangleItem
+    for i in range(edits):
+        kind = i % 5
+        if kind == 0:
+            item = rng.choice(items)
+            if not isinstance(item, TextItem): editor.add_command(PropertyChangeCommand(item, 'stroke', item.stroke_color, QColor(rng.randrange(0x1000000))))
+        elif kind == 1:
+            rng.choice(items).moveBy(rng.uniform(-5, 5), rng.uniform(-5, 5))
+        elif kind == 2:
+            text = rng.choice([item for item in items if isinstance(item, TextItem)])
+            text.setPlainText(f"edit {i}")
+        elif kind == 3:
+            item = RectangleItem(QRectF(0, 0, 10, 10)); item.setPos(rng.uniform(0, 9000), rng.uniform(0, 9000)); item.setZValue(len(items) + i)
+            editor.add_command(AddCommand(editor.scene, item)); items.append(item)
+        else:
+            item = rng.choice(items)
+            if item.scene() is not None and not isinstance(item, TextItem): editor.push_transaction(DeleteCommand(editor.scene, [item]))
+
+def snapshot(scene):
+    from document_io import top_level_items, encode_item
+    return {item.doc_uid: bytes(encode_item(item)) for item in top_level_items(scene)}
+
+def timed(fn):
+    start = time.perf_counter(); fn(); return (time.perf_counter() - start) * 1000
+
+def run(count, edit_counts, directory):
+    import document_io
+    from main_window import ProfessionalEditor
+    from editor_scene import EditorScene
+    editor = ProfessionalEditor(); editor.show(); QApplication.processEvents()
+    rng = random.Random(1)
+    items = make_board(editor, count)
+    path = os.path.join(directory, f'board{count}.gedoc')
+    full = timed(lambda: document_io.save_document(editor.scene, path))
+    size = os.path.getsize(path)
+    print(f"{count:>7} items: full save {full:.0f} ms, {size / 2**20:.1f} MB", flush=True)
+    for edits in edit_counts:
+        edit(editor, items, edits, rng)
+        pending = editor.scene.changes.pending()
+        appended = editor.scene.changes.end
+        delta = timed(lambda: document_io.save_document(editor.scene, path))
+        print(f"{'':>7}  {edits:>5} edits ({pending} records): save {delta:.1f} ms, appended {(os.path.getsize(path) - appended) / 1024:.0f} KiB", flush=True)
+    # A save cut short leaves a section without its END; readers and the next save ignore it
+    with open(path, 'ab') as f: f.write(b'ITEM\x00\x00\x01\x00partial')
+    expected = snapshot(editor.scene)
+    scene = EditorScene()
+    load = timed(lambda: document_io.load_document(scene, path))
+    print(f"{'':>7}  load {load:.0f} ms with {os.path.getsize(path) / 2**20:.1f} MB of sections, "
+          f"{'matches' if snapshot(scene) == expected else 'DIFFERS FROM'} the board", flush=True)
+    # Reopened, the next save appends over the torn tail
+    for item in document_io.top_level_items(scene)[:10]: item.moveBy(1, 1)
+    resaved = timed(lambda: document_io.save_document(scene, path)); reloaded = EditorScene(); document_io.load_document(reloaded, path)
+    print(f"{'':>7}  save over torn tail {resaved:.1f} ms, {'matches' if snapshot(reloaded) == snapshot(scene) else 'DIFFERS FROM'} the board", flush=True)
+    editor.undo_stack.clear(); editor.scene.clear(); editor.deleteLater(); QApplication.processEvents()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--edits', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.items: run(count, args.edits, directory)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
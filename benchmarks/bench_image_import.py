@@ -0,0 +1,67 @@
+# benchmarks/bench_image_import.py
+"""Batch image import time against the number of decode threads.
+
+    python benchmarks/bench_image_import.py --images 200 --threads 1 2 4 8
+
+Writes a folder of JPEGs, then times import_image_files() from the call until
+the last decode has been delivered, once per thread count. With decoding on
+the pool the time should fall roughly with the number of cores.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QColor, QPainter
+from PyQt5.QtCore import QThread, QThreadPool
+
+def write_images(directory, count, size):
+    rng = random.Random(1)
+    for i in range(count):
+        image = QImage(size + rng.randint(-size // 4, size // 4), size + rng.randint(-size // 4, size // 4), QImage.Format_RGB32)
+        image.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        painter = QPainter(image)
+        for _ in range(20): painter.fillRect(rng.randrange(image.width()), rng.randrange(image.height()), 80, 80, QColor(rng.randrange(256), 0, 0))
+        painter.end()
+        image.save(os.path.join(directory, f"photo{i:04}.jpg"), quality=90)
+
+def run(paths, threads):
+    from main_window import ProfessionalEditor
+    from image_store import image_store
+    QThreadPool.globalInstance().setMaxThreadCount(threads)
+    editor = ProfessionalEditor(); editor.resize(1200, 900)
+    start = time.perf_counter()
+    editor.import_image_files(paths)
+    placed = time.perf_counter() - start
+    editor.image_loader.wait()
+    total = time.perf_counter() - start
+    assert not any(i.is_loading() for i in editor.scene.items())
+    editor.undo_stack.clear(); editor.scene.clear(); editor.deleteLater(); QApplication.processEvents()
+    image_store.clear()
+    return {'threads': threads, 'placed_s': placed, 'total_s': total}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--size', type=int, default=2000, help="approximate side of each image in pixels")
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, 4, QThread.idealThreadCount()}))
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        write_images(directory, args.images, args.size)
+        paths = sorted(os.path.join(directory, n) for n in os.listdir(directory))
+        results = [run(paths, threads) for threads in args.threads]
+    base = results[0]['total_s']
+    print(f"{args.images} images, {QThread.idealThreadCount()} cores")
+    for r in results:
+        print(f"{r['threads']:>3} threads: placeholders {r['placed_s'] * 1000:7.1f} ms, all decoded {r['total_s']:6.2f} s, speed-up {base / r['total_s']:.2f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# benchmarks/bench_item_memory.py
+"""Memory per shape item and allocations per painted frame.
+
+    python benchmarks/bench_item_memory.py --items 100000
+
+bytes/item  Python heap (tracemalloc) and process RSS growth per rectangle,
+            ellipse or stroke added to a scene, with colours and widths drawn
+            from a small palette as in real drawings
+allocs      QPen, QBrush and QColor objects the item and level-of-detail
+            code creates while the view paints one frame at 100% zoom, plus
+            the peak of transient Python memory during that frame
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor, QPainterPath
+from PyQt5.QtCore import QRectF, QPointF
+
+PALETTE = ["#343a40", "#d9534f", "#0078d4", "#28a745", "#f0ad4e"]
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def make_items(count, rng):
+    from graphics_items import RectangleItem, EllipseItem, FreehandItem
+    items = []
+    for i in range(count):
+        if i % 10 == 9:
+            path = QPainterPath(QPointF(0, 0))
+            for j in range(1, 20): path.lineTo(j * 2, rng.uniform(-5, 5))
+            item = FreehandItem(path)
+        else:
+            item = (RectangleItem if i % 2 else EllipseItem)(QRectF(0, 0, rng.uniform(6, 30), rng.uniform(6, 30)))
+        item.set_property('stroke', QColor(rng.choice(PALETTE)))
+        if i % 3 == 0: item.set_property('fill', QColor(rng.choice(PALETTE)))
+        item.set_property('stroke_width', rng.choice((1, 2, 4)))
+        item.setPos((i % 300) * 35, (i // 300) * 35)
+        items.append(item)
+    return items
+
+class Counter:
+    """Replaces QPen/QBrush/QColor in the painting modules with subclasses that count constructions."""
+    MODULES = ('graphics_items', 'level_of_detail', 'style_table')
+    def __init__(self):
+        import importlib
+        self.count, self.originals = 0, []
+        for module_name in self.MODULES:
+            try: module = importlib.import_module(module_name)
+            except ImportError: continue
+            self.originals += [(module, name, getattr(module, name)) for name in ('QPen', 'QBrush', 'QColor') if hasattr(module, name)]
+    def __enter__(self):
+        counter = self
+        for module, name, cls in self.originals:
+            def __init__(obj, *args, _base=cls):
+                counter.count += 1; _base.__init__(obj, *args)
+            setattr(module, name, type(name, (cls,), {'__init__': __init__}))
+        return self
+    def __exit__(self, *exc):
+        for module, name, cls in self.originals: setattr(module, name, cls)
+
+def run(count, seed=1):
+    from main_window import ProfessionalEditor
+    rng = random.Random(seed)
+    editor = ProfessionalEditor(); editor.resize(1600, 900); editor.show(); QApplication.processEvents()
+    gc.collect()
+    tracemalloc.start()
+    heap0, rss0 = tracemalloc.get_traced_memory()[0], rss_bytes()
+    items = make_items(count, rng)
+    with editor.transaction():
+        for item in items: editor.scene.addItem(item)
+    gc.collect()
+    heap, rss = tracemalloc.get_traced_memory()[0] - heap0, rss_bytes() - rss0
+    tracemalloc.stop()
+
+    view = editor.view
+    view.resetTransform(); view.centerOn(800, 450)
+    view.viewport().grab()      # first frame builds caches
+    for item in items[::50]: item.setSelected(True)
+    with Counter() as counter:
+        tracemalloc.start(); base = tracemalloc.get_traced_memory()[0]; tracemalloc.reset_peak()
+        start = time.perf_counter()
+        view.viewport().grab()
+        frame = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    editor.undo_stack.clear(); editor.scene.clear(); editor.deleteLater(); QApplication.processEvents()
+    return {'items': count, 'heap_bytes_per_item': heap / count, 'rss_bytes_per_item': rss / count,
+            'allocs_per_frame': counter.count, 'frame_peak_bytes': peak, 'frame_ms': frame * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    for count in args.items:
+        r = run(count)
+        print(f"{r['items']:>7} items: heap {r['heap_bytes_per_item']:6.0f} B/item, RSS {r['rss_bytes_per_item']:6.0f} B/item, "
+              f"frame {r['frame_ms']:7.1f} ms with {r['allocs_per_frame']} pen/brush/colour allocations, {r['frame_peak_bytes'] / 1024:.0f} KiB transient peak", flush=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# benchmarks/bench_live_stroke.py
+"""Per-mouse-event cost of the pencil preview as a stroke grows.
+
+    python benchmarks/bench_live_stroke.py --points 20000
+
+Drives CanvasView's press/move/release handlers on the offscreen platform,
+flushing the pending repaint after every move, and compares the median cost of the first and
+last window of events. A flat preview keeps the ratio close to 1.
+"""
+import argparse
+import gc
+import math
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtCore import Qt, QEvent, QPointF
+
+FLATNESS_TARGET = 2.0
+
+def mouse_event(kind, pos, buttons=Qt.LeftButton):
+    button = Qt.NoButton if kind == QEvent.MouseMove else Qt.LeftButton
+    return QMouseEvent(kind, QPointF(pos), button, buttons, Qt.NoModifier)
+
+def stroke_points(count, width, height):
+    # Handwriting-like sweep: a wavy line that runs across the viewport row by
+    # row without crossing itself, so later events have no more ink under them
+    # than early ones
+    per_row, rows = int(width - 40), max(1, int((height - 40) / 40))
+    step = min(1.0, per_row * rows / count)
+    per_row = int((width - 40) / step)
+    for i in range(count):
+        row, col = divmod(i, per_row)
+        yield QPointF(20 + col * step, 20 + row * 40 + math.sin(col * step * 0.2) * 12)
+
+def run(points, window, tool='pencil'):
+    from main_window import ProfessionalEditor
+    editor = ProfessionalEditor(); editor.resize(1200, 900); editor.show()
+    view = editor.view
+    QApplication.processEvents()
+    editor.set_tool(tool)
+    samples = list(stroke_points(points, view.viewport().width(), view.viewport().height()))
+    view.mousePressEvent(mouse_event(QEvent.MouseButtonPress, samples[0]))
+    timings = []
+    gc.disable()
+    for pos in samples[1:]:
+        start = time.perf_counter()
+        view.mouseMoveEvent(mouse_event(QEvent.MouseMove, pos))
+        QApplication.processEvents()
+        timings.append(time.perf_counter() - start)
+    gc.enable()
+    view.mouseReleaseEvent(mouse_event(QEvent.MouseButtonRelease, samples[-1], Qt.NoButton))
+    first = statistics.median(timings[:window])
+    last = statistics.median(timings[-window:])
+    return {'tool': tool, 'events': len(timings), 'first_ms': first * 1000, 'last_ms': last * 1000, 'ratio': last / first}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=2000)
+    parser.add_argument('--tool', default='pencil', choices=['pencil', 'rectangle', 'ellipse', 'line', 'arrow'])
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    result = run(args.points, args.window, args.tool)
+    print(f"{result['tool']}: {result['events']} events, first {result['first_ms']:.3f} ms, last {result['last_ms']:.3f} ms, ratio {result['ratio']:.2f}")
+    return 0 if result['ratio'] <= FLATNESS_TARGET else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
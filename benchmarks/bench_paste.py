@@ -0,0 +1,62 @@
+# benchmarks/bench_paste.py
+"""Paste cost as the clipboard grows.
+
+    python benchmarks/bench_paste.py --sizes 1000 2500 5000 10000
+
+Copies N rectangles, times paste_selection() (including the coalesced UI
+refresh) and the undo/redo of the resulting macro, and reports the cost per
+item. Linear scaling keeps the per-item cost of the largest paste within
+LINEARITY_TARGET of the smallest.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QRectF
+
+LINEARITY_TARGET = 2.0
+
+def timed(action):
+    gc.disable()
+    start = time.perf_counter()
+    action(); QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    return elapsed
+
+def run(size):
+    from main_window import ProfessionalEditor
+    from graphics_items import RectangleItem
+    editor = ProfessionalEditor()
+    with editor.transaction():
+        for i in range(size):
+            item = RectangleItem(QRectF(0, 0, 20, 20)); item.setPos((i % 100) * 25, (i // 100) * 25)
+            editor.scene.addItem(item); item.setSelected(True)
+    editor.copy_selection()
+    paste = timed(editor.paste_selection)
+    undo = timed(editor.undo_stack.undo)
+    redo = timed(editor.undo_stack.redo)
+    assert len(editor.scene.selectedItems()) == size
+    editor.deleteLater(); QApplication.processEvents()
+    return {'items': size, 'paste_s': paste, 'undo_s': undo, 'redo_s': redo, 'paste_us_per_item': paste / size * 1e6}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2500, 5000, 10000])
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    results = [run(size) for size in sorted(args.sizes)]
+    for r in results:
+        print(f"{r['items']:>6} items: paste {r['paste_s'] * 1000:8.1f} ms ({r['paste_us_per_item']:.1f} us/item), undo {r['undo_s'] * 1000:8.1f} ms, redo {r['redo_s'] * 1000:8.1f} ms")
+    ratio = results[-1]['paste_us_per_item'] / results[0]['paste_us_per_item']
+    print(f"per-item cost ratio {results[-1]['items']}/{results[0]['items']}: {ratio:.2f}")
+    return 0 if ratio <= LINEARITY_TARGET else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# benchmarks/bench_session_journal.py
+"""Cost of the crash-recovery journal.
+
+    python benchmarks/bench_session_journal.py --items 20000 --edits 2000
+
+record   GUI-thread time added per undo stack step (encoding the touched
+         items and queuing them), with and without the journal attached
+commit   records written per fsync by the journal thread
+replay   time to rebuild the session from the journal, before and after it
+         is compacted to one record per item
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QRectF
+
+def edit_session(editor, items, edits, rng):
+    from commands import PropertyChangeCommand, BatchPropertyCommand
+    start = time.perf_counter()
+    for i in range(edits):
+        if i % 10 == 9:
+            chosen = rng.sample(items, 50)
+            editor.add_command(BatchPropertyCommand(editor.scene, chosen, 'stroke_width', [item.stroke_width for item in chosen], rng.randint(1, 12)))
+        else:
+            item = rng.choice(items)
+            editor.add_command(PropertyChangeCommand(item, 'stroke', item.stroke_color, QColor(rng.randrange(0x1000000))))
+    return (time.perf_counter() - start) * 1000 / edits
+
+def run(count, edits, directory):
+    from main_window import ProfessionalEditor
+    from graphics_items import RectangleItem, EllipseItem
+    from editor_scene import EditorScene
+    import session_journal
+    editor = ProfessionalEditor(); editor.show(); QApplication.processEvents()
+    rng = random.Random(1)
+    items = [(RectangleItem if i % 2 else EllipseItem)(QRectF(0, 0, 20, 20)) for i in range(count)]
+    with editor.transaction():
+        for i, item in enumerate(items): item.setPos((i % 200) * 30, (i // 200) * 30); editor.scene.addItem(item)
+    plain = edit_session(editor, items, edits, rng)
+    editor.start_session_journal(directory)
+    journal = editor.session_journal
+    # Write the board once, as compaction would leave it, then edit on top of it
+    journal.record(items); journal.flush()
+    journaled = edit_session(editor, items, edits, rng)
+    journal.flush(); st = journal.stats()
+    start = time.perf_counter(); session_journal.replay(EditorScene(), journal.path); replay_ms = (time.perf_counter() - start) * 1000
+    size = st['bytes']
+    with journal._condition: journal._compact()
+    start = time.perf_counter(); session_journal.replay(EditorScene(), journal.path); compacted_ms = (time.perf_counter() - start) * 1000
+    print(f"{count:>7} items, {edits} edits: step {plain:.3f} ms -> {journaled:.3f} ms with journal; "
+          f"{st['records']} records in {st['commits']} fsyncs; replay {size / 2**20:.1f} MB in {replay_ms:.0f} ms, "
+          f"compacted {journal.stats()['bytes'] / 2**20:.1f} MB in {compacted_ms:.0f} ms", flush=True)
+    journal.close(discard=True); editor.session_journal = None
+    editor.undo_stack.clear(); editor.scene.clear(); editor.deleteLater(); QApplication.processEvents()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[2000, 20000])
+    parser.add_argument('--edits', type=int, default=2000)
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.items: run(count, args.edits, directory)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# benchmarks/bench_spatial_index.py
+"""Hit-testing cost of each spatial index at several scene sizes.
+
+    python benchmarks/bench_spatial_index.py --sizes 1000 10000 100000
+
+For every index configuration and item count this fills an EditorScene with
+small shapes at constant density and measures:
+  build   adding the items plus the first query (Qt builds its BSP lazily)
+  point   items_at() at random points, as a click or hover does
+  band    items_in() over viewport-sized rectangles, as rubber-band selection does
+  drag    moving a 500-item selection in 40 steps with a hit test after each,
+          with and without the index paused for the drag
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QPointF, QRectF
+
+CONFIGS = [('bsp', 0), ('bsp', 6), ('bsp', 12), ('rtree', 0), ('none', 0)]
+POINT_QUERIES, BAND_QUERIES = 2000, 200
+DRAG_ITEMS, DRAG_STEPS = 500, 40
+
+def config_name(mode, depth): return f"bsp depth {depth or 'auto'}" if mode == 'bsp' else mode
+
+def populate(scene, count, rng):
+    from graphics_items import RectangleItem, EllipseItem
+    side = math.sqrt(count) * 40
+    items = []
+    for i in range(count):
+        item = (RectangleItem if i % 2 else EllipseItem)(QRectF(0, 0, rng.uniform(6, 30), rng.uniform(6, 30)))
+        item.setPos(rng.uniform(0, side), rng.uniform(0, side)); scene.addItem(item); items.append(item)
+    return items, side
+
+def run(count, mode, depth, seed=1):
+    from editor_scene import EditorScene
+    rng = random.Random(seed)
+    scene = EditorScene(); scene.setSceneRect(-10000, -10000, 20000, 20000)
+    scene.set_index_mode(mode, depth)
+    start = time.perf_counter()
+    items, side = populate(scene, count, rng)
+    scene.rebuild_index(); scene.items_at(QPointF(0, 0))
+    build = time.perf_counter() - start
+
+    points = [QPointF(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(POINT_QUERIES)]
+    start = time.perf_counter()
+    for p in points: scene.items_at(p)
+    point = (time.perf_counter() - start) / len(points)
+
+    rects = [QRectF(rng.uniform(0, side), rng.uniform(0, side), 400, 300) for _ in range(BAND_QUERIES)]
+    start = time.perf_counter()
+    for r in rects: scene.items_in(r)
+    band = (time.perf_counter() - start) / len(rects)
+
+    drag = {}
+    for paused in (False, True):
+        moving = rng.sample(items, min(DRAG_ITEMS, len(items)))
+        start = time.perf_counter()
+        if paused: scene.suspend_index()
+        for step in range(DRAG_STEPS):
+            for item in moving: item.moveBy(3, 2)
+            scene.items_at(points[step])
+        if paused: scene.resume_index()
+        scene.items_at(points[0])
+        drag[paused] = time.perf_counter() - start
+    scene.clear()
+    return {'items': count, 'index': config_name(mode, depth), 'build_s': build, 'point_us': point * 1e6, 'band_ms': band * 1e3,
+            'drag_ms': drag[False] * 1e3, 'drag_paused_ms': drag[True] * 1e3}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--index', nargs='+', help="limit to these modes (bsp, rtree, none)")
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    print(f"{'items':>7} {'index':<14} {'build s':>8} {'point us':>9} {'band ms':>8} {'drag ms':>8} {'paused':>8}")
+    for count in args.sizes:
+        for mode, depth in CONFIGS:
+            if args.index and mode not in args.index: continue
+            r = run(count, mode, depth)
+            print(f"{r['items']:>7} {r['index']:<14} {r['build_s']:8.2f} {r['point_us']:9.1f} {r['band_ms']:8.2f} {r['drag_ms']:8.1f} {r['drag_paused_ms']:8.1f}", flush=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
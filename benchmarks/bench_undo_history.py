@@ -0,0 +1,76 @@
+# benchmarks/bench_undo_history.py
+"""Cost of the undo memory budget per edit as the history grows.
+
+    python benchmarks/bench_undo_history.py --macros 5 --items 10000
+
+Pastes `macros` batches of `items` rectangles, undoes some so the history
+holds off-scene items, then times small edits, undos and redos including
+the budget check that follows every index change. The running total is
+compared with a full walk of the stack after every step.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QRectF
+
+def walked_bytes(history):
+    """Bytes held only by the history, from a walk of every command."""
+    from undo_history import held_items, item_nodes, payload_bytes, ITEM_OVERHEAD_BYTES
+    nodes = set()
+    for i in range(history.stack.count()):
+        for item in held_items(history.stack.command(i)):
+            if item.scene() is None: nodes.update(item_nodes(item))
+    return sum(ITEM_OVERHEAD_BYTES + payload_bytes(node) for node in nodes)
+
+def run(macros, count, edits):
+    from main_window import ProfessionalEditor
+    from graphics_items import RectangleItem
+    from commands import PropertyChangeCommand
+    editor = ProfessionalEditor(); history = editor.undo_history
+    rng = random.Random(1)
+    with editor.transaction():
+        for i in range(count):
+            item = RectangleItem(QRectF(0, 0, 20, 20)); item.setPos((i % 100) * 25, (i // 100) * 25)
+            editor.scene.addItem(item); item.setSelected(True)
+    editor.copy_selection()
+    for _ in range(macros): editor.paste_selection(); QApplication.processEvents()
+    for _ in range(macros // 2): editor.undo_stack.undo()
+    QApplication.processEvents()
+    target = [i for i in editor.scene.items() if isinstance(i, RectangleItem)][0]
+    times, mismatches = [], 0
+    for step in range(edits):
+        start = time.perf_counter()
+        if step % 3 == 0: editor.add_command(PropertyChangeCommand(target, 'stroke', target.stroke_color, QColor(rng.randrange(0x1000000))))
+        elif step % 3 == 1: editor.undo_stack.undo()
+        else: editor.undo_stack.redo()
+        history.enforce()
+        times.append((time.perf_counter() - start) * 1000)
+        if history.held != walked_bytes(history): mismatches += 1
+    editor.undo_stack.clear(); history.enforce()
+    if history.held != 0: mismatches += 1
+    editor.deleteLater(); QApplication.processEvents()
+    times.sort()
+    return times[len(times) // 2], times[-1], mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--macros', type=int, default=5)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--edits', type=int, default=60)
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    median, worst, mismatches = run(args.macros, args.items, args.edits)
+    print(f"{args.macros} macros of {args.items} items: edit + budget check median {median:.2f} ms, worst {worst:.2f} ms; "
+          f"running total {'matches' if not mismatches else f'differs in {mismatches} steps from'} a full walk")
+    return 0 if not mismatches else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
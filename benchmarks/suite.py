@@ -0,0 +1,271 @@
+# benchmarks/suite.py
+"""Headless benchmark suite for the editor's core operations.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json --tolerance 0.15
+
+Builds a synthetic document from the real item classes (shapes, arrows, long
+freehand strokes, Urdu and English text, large images) in a ProfessionalEditor
+on the offscreen platform and times each case REPEAT times. Results are
+written as JSON; with --baseline every case's median is compared against the
+baseline's and the run exits with status 1 if any case is slower than
+baseline * (1 + tolerance).
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QColor, QPainter, QPainterPath, QPixmap
+from PyQt5.QtCore import QT_VERSION_STR, PYQT_VERSION_STR, QPointF, QRectF, QLineF
+
+SCHEMA = 1
+DEFAULT_TOLERANCE = 0.2
+# Below this, timer noise dominates; such cases never count as regressions
+NOISE_FLOOR_MS = 0.5
+
+CASES = {}
+
+def case(name):
+    """Register a benchmark. The function receives the editor and returns
+    (action, reset): action is timed, reset restores the document untimed."""
+    def register(fn): CASES[name] = fn; return fn
+    return register
+
+# --- Synthetic document ---
+def build_document(editor, scale, seed=1):
+    from graphics_items import RectangleItem, EllipseItem, ArrowItem, FreehandItem, TextItem, ImageItem
+    rng = random.Random(seed)
+    count = lambda n: max(1, int(n * scale))
+    side = math.sqrt(count(2000)) * 60
+    pos = lambda: QPointF(rng.uniform(0, side), rng.uniform(0, side))
+    items = []
+    for i in range(count(2000)):
+        item = (RectangleItem if i % 2 else EllipseItem)(QRectF(0, 0, rng.uniform(10, 60), rng.uniform(10, 60)))
+        item.setPos(pos()); items.append(item)
+    for _ in range(count(300)):
+        start = pos(); items.append(ArrowItem(QLineF(start, start + QPointF(rng.uniform(-150, 150), rng.uniform(-150, 150)))))
+    for _ in range(count(60)):
+        origin, points = pos(), []
+        for j in range(2000): points.append(QPointF(j * 0.5, math.sin(j * 0.05) * 30 + rng.uniform(-1, 1)))
+        path = QPainterPath(points[0])
+        for p in points[1:]: path.lineTo(p)
+        item = FreehandItem(path); item.setPos(origin); items.append(item)
+    for i in range(count(100)):
+        item = TextItem('urdu' if i % 2 else 'english'); item.setPos(pos()); items.append(item)
+    for i in range(count(8)):
+        image = QImage(2400, 1600, QImage.Format_ARGB32_Premultiplied); image.fill(QColor(rng.randrange(256), rng.randrange(256), 200))
+        painter = QPainter(image)
+        for _ in range(40): painter.fillRect(rng.randrange(2400), rng.randrange(1600), 120, 90, QColor(rng.randrange(256), 0, 0))
+        painter.end()
+        item = ImageItem(QPixmap.fromImage(image)); item.setScale(0.25); item.setPos(pos()); items.append(item)
+    with editor.transaction():
+        for item in items: editor.scene.addItem(item)
+    editor.scene.rebuild_index()
+    return items
+
+def select(editor, items):
+    with editor.transaction():
+        editor.scene.clearSelection()
+        for item in items: item.setSelected(True)
+
+def undo_all(editor, to_index):
+    def reset():
+        while editor.undo_stack.index() > to_index: editor.undo_stack.undo()
+        editor.scene.clearSelection()
+    return reset
+
+def top_level(editor): return [i for i in editor.scene.items() if i.parentItem() is None]
+
+# --- Cases ---
+@case('paint_viewport')
+def paint_viewport(editor):
+    view = editor.view
+    view.fitInView(editor.scene.itemsBoundingRect())
+    return (lambda: view.viewport().grab()), None
+
+@case('zoom_steps')
+def zoom_steps(editor):
+    # Every step painted at full quality, as with draft rendering turned off
+    from progressive_render import progressive_settings
+    view = editor.view
+    def action():
+        progressive_settings.enabled = False
+        try:
+            for _ in range(6): editor.zoom_in(); view.viewport().grab()
+            for _ in range(6): editor.zoom_out(); view.viewport().grab()
+        finally: progressive_settings.enabled = True
+    reset = zoom_reset(editor); reset()
+    return action, reset
+
+@case('zoom_gesture')
+def zoom_gesture(editor):
+    # The same steps as one gesture: the snapshot, draft frames scaled from it, then the
+    # refinement pass, which the runner's processEvents() paints
+    view = editor.view
+    def action():
+        for _ in range(6): editor.zoom_in(); view.viewport().grab()
+        for _ in range(6): editor.zoom_out(); view.viewport().grab()
+        view.gesture.refine()
+    reset = zoom_reset(editor); reset()
+    return action, reset
+
+def zoom_reset(editor):
+    center = editor.scene.itemsBoundingRect().center()
+    def reset():
+        editor.reset_zoom(); editor.view.centerOn(center); editor.view.gesture.refine()
+    return reset
+
+@case('erase_at')
+def erase_at(editor):
+    view, bounds = editor.view, editor.scene.itemsBoundingRect()
+    # A zig-zag eraser drag across the whole document
+    trail = [QPointF(bounds.left() + bounds.width() * i / 200, bounds.center().y() + (100 if i % 2 else -100)) for i in range(201)]
+    def action():
+        for pos in trail: view.erase_at(pos)
+        view.finish_erase()
+    return action, undo_all(editor, editor.undo_stack.index())
+
+@case('rubber_band_select')
+def rubber_band_select(editor):
+    bounds = editor.scene.itemsBoundingRect()
+    rects = [QRectF(bounds.left() + bounds.width() * i / 10, bounds.top(), bounds.width() / 3, bounds.height() / 3) for i in range(8)]
+    def action():
+        for rect in rects:
+            area = QPainterPath(); area.addRect(rect)
+            editor.scene.select_in(area)
+    return action, editor.scene.clearSelection
+
+@case('copy_paste')
+def copy_paste(editor):
+    items = top_level(editor)[:2000]
+    index = editor.undo_stack.index()
+    def action(): select(editor, items); editor.copy_selection(); editor.paste_selection()
+    return action, undo_all(editor, index)
+
+@case('duplicate')
+def duplicate(editor):
+    items = top_level(editor)[:2000]
+    index = editor.undo_stack.index()
+    def action(): select(editor, items); editor.duplicate_selection()
+    return action, undo_all(editor, index)
+
+@case('group_ungroup')
+def group_ungroup(editor):
+    items = top_level(editor)[:1000]
+    index = editor.undo_stack.index()
+    def action(): select(editor, items); editor.group_selection(); editor.ungroup_selection()
+    return action, undo_all(editor, index)
+
+@case('z_order')
+def z_order(editor):
+    items = top_level(editor)[::7]
+    index = editor.undo_stack.index()
+    def action():
+        select(editor, items)
+        editor.bring_to_front(); editor.send_to_back(); editor.bring_forward(); editor.send_backward()
+    return action, undo_all(editor, index)
+
+@case('undo_redo_macro')
+def undo_redo_macro(editor):
+    select(editor, top_level(editor)[:5000]); editor.copy_selection(); editor.paste_selection()
+    editor.undo_stack.undo()
+    def action(): editor.undo_stack.redo(); editor.undo_stack.undo()
+    return action, None
+
+@case('snapshot')
+def snapshot(editor):
+    import display_list
+    return (lambda: display_list.snapshot(editor.scene)), None
+
+@case('save_image')
+def save_image(editor):
+    import exporter, display_list
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'export.png')
+    bounds = editor.scene.itemsBoundingRect()
+    # What save_image() runs, without its dialogs and with the tiles rendered on this thread
+    def action():
+        snapshot = display_list.snapshot(editor.scene, bounds, 0.5)
+        exporter.export_png(None, bounds, path, scale=0.5, render_tile=exporter.display_list_renderer(snapshot))
+    return action, None
+
+# --- Runner ---
+def measure(action, reset, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect(); gc.disable()
+        start = time.perf_counter()
+        action(); QApplication.processEvents()
+        samples.append((time.perf_counter() - start) * 1000)
+        gc.enable()
+        if reset: reset(); QApplication.processEvents()
+    return {'median_ms': statistics.median(samples), 'min_ms': min(samples), 'max_ms': max(samples), 'repeat': repeat}
+
+def run(names, scale, repeat):
+    from main_window import ProfessionalEditor
+    from image_store import image_store
+    editor = ProfessionalEditor(); editor.resize(1600, 900); editor.show()
+    QApplication.processEvents()
+    start = time.perf_counter()
+    items = build_document(editor, scale)
+    results = {'build_document': {'median_ms': (time.perf_counter() - start) * 1000, 'items': len(items), 'repeat': 1}}
+    for name in names:
+        action, reset = CASES[name](editor)
+        action(); QApplication.processEvents()   # warm caches once, as an interactive session would
+        if reset: reset(); QApplication.processEvents()
+        results[name] = measure(action, reset, repeat)
+        print(f"{name:<20} {results[name]['median_ms']:10.1f} ms", file=sys.stderr, flush=True)
+    editor.undo_stack.clear(); editor.scene.clear(); editor.deleteLater(); QApplication.processEvents()
+    image_store.clear()
+    return results
+
+def compare(results, baseline, tolerance):
+    """(name, baseline ms, current ms, ratio, regressed) for the cases present in both runs."""
+    rows = []
+    for name, current in results.items():
+        if name not in baseline: continue
+        before, now = baseline[name]['median_ms'], current['median_ms']
+        ratio = now / before if before else float('inf')
+        rows.append((name, before, now, ratio, ratio > 1 + tolerance and now - before > NOISE_FLOOR_MS))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), help="run only these cases")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier on the synthetic document's item counts")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    results = run(args.cases or list(CASES), args.scale, args.repeat)
+    report = {'schema': SCHEMA, 'scale': args.scale, 'repeat': args.repeat, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(), 'qt': QT_VERSION_STR, 'pyqt': PYQT_VERSION_STR, 'machine': platform.machine(),
+              'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(text + '\n')
+    else: print(text)
+    if not args.baseline: return 0
+    with open(args.baseline) as f: baseline = json.load(f)
+    if baseline.get('scale') != args.scale: print(f"warning: baseline scale {baseline.get('scale')} differs from {args.scale}", file=sys.stderr)
+    regressions = 0
+    for name, before, now, ratio, regressed in compare(results, baseline['results'], args.tolerance):
+        regressions += regressed
+        print(f"{name:<20} {before:10.1f} -> {now:10.1f} ms  {ratio:5.2f}x{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,25 +1,71 @@
 # canvas_view.py
-from PyQt5.QtWidgets import QGraphicsView, QMenu
+from contextlib import contextmanager
+from PyQt5.QtWidgets import QGraphicsView, QMenu, QRubberBand
 from PyQt5.QtGui import QPainter, QPen, QPainterPath
-from PyQt5.QtCore import Qt, QRectF, QLineF
-import qtawesome as qta
+from PyQt5.QtCore import Qt, QRect, QRectF, QLineF, QSize
 
 # Import our custom classes
-from commands import AddCommand, DeleteCommand
-from graphics_items import TextItem, RectangleItem, EllipseItem, LineItem, ArrowItem, FreehandItem
+from commands import AddCommand
+from eraser import EraserStroke
+from instrumentation import profiler
+from progressive_render import GestureRenderer
+from icon_cache import icon
+from graphics_items import TextItem, RectangleItem, EllipseItem, LineItem, ArrowItem, FreehandItem, LiveStrokeItem, ShapePreviewItem
+from stroke_geometry import simplify
 
 class CanvasView(QGraphicsView):
+    # Qt can call the view's virtuals before __init__ creates it or after Python has torn it down
+    gesture = None
+    panning = False
+
     def __init__(self, scene, editor):
         super().__init__(scene)
         self.editor = editor
         self.start_pos = None
         self.temp_item = None
-        self.current_path = None
+        self.eraser_stroke = None
+        self.band, self.band_origin, self.band_keep = None, None, set()
+        self.index_paused = False
         self.setRenderHint(QPainter.Antialiasing)
+        # Many small item updates are merged into one bounding rect instead of a region of hundreds of rects
+        self.setViewportUpdateMode(self.SmartViewportUpdate)
+        self.gesture = GestureRenderer(self)
         self.setTransformationAnchor(self.AnchorUnderMouse)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
 
+    def paintEvent(self, event):
+        paint_event = self.paint_draft if self.gesture is not None and self.gesture.active else super().paintEvent
+        if profiler.enabled: profiler.paint_frame(self, event, paint_event)
+        else: paint_event(event)
+
+    def paint_draft(self, event):
+        self.gesture.paint(event, super().paintEvent)
+        if profiler.enabled and self.gesture.snapshot is not None:
+            painter = QPainter(self.viewport()); profiler.draw_hud(painter, QRectF(self.viewport().rect())); painter.end()
+
+    def scrollContentsBy(self, dx, dy):
+        # Programmatic scrolls (fitInView, centerOn, a growing scene rect) repaint at full quality
+        if self.panning and self.gesture is not None: self.gesture.step(zoom=False)
+        super().scrollContentsBy(dx, dy)
+
+    @contextmanager
+    def user_pan(self):
+        """Scrolls made inside the block come from the wheel, a hand drag or the keyboard
+        and are drawn as steps of a pan gesture."""
+        self.panning = True
+        try: yield
+        finally: self.panning = False
+
+    def zoom_by(self, factor):
+        self.gesture.step(zoom=True)
+        self.scale(factor, factor)
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        # Left out of zoom snapshots, which would scale it along with the canvas
+        if profiler.enabled and not (self.gesture is not None and self.gesture.grabbing): profiler.draw_hud(painter, QRectF(self.viewport().rect()))
+
     def mousePressEvent(self, event):
         # --- NEW: Handle eyedropper picking ---
         if self.editor.is_picking_color:
@@ -30,6 +76,8 @@ class CanvasView(QGraphicsView):
             return  # Stop further processing
 
         tool = self.editor.current_tool
+        # Edits must show up at once rather than under a stale zoom snapshot
+        if tool != 'pan': self.gesture.refine()
         if event.button() == Qt.LeftButton and tool not in ['select', 'pan']:
             self.start_pos = self.mapToScene(event.pos())
             if tool in ['text_urdu', 'text_english']:
@@ -42,32 +90,43 @@ class CanvasView(QGraphicsView):
                 item.setFocus()
                 self.editor.set_tool('select')
             elif tool == 'pencil':
-                self.current_path = QPainterPath()
-                self.current_path.moveTo(self.start_pos)
+                self.temp_item = LiveStrokeItem(self.start_pos, QPen(Qt.gray, 2, Qt.DashLine), self.scene().sceneRect())
+                self.scene().addItem(self.temp_item)
             elif tool == 'eraser':
                 self.erase_at(self.start_pos)
+            elif tool in ['rectangle', 'ellipse', 'line', 'arrow']:
+                self.temp_item = ShapePreviewItem(tool, self.start_pos, QPen(Qt.gray, 2, Qt.DashLine))
+                self.scene().addItem(self.temp_item)
+        elif tool == 'select' and event.button() == Qt.LeftButton and self.scene().index_mode != 'bsp' and self.scene().item_at(self.mapToScene(event.pos())) is None:
+            # Without Qt's BSP tree its rubber band would scan every item per move; ours queries the editor's index
+            self.start_band(event)
         else:
             super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
+        if self.band_origin is not None:
+            self.update_band(event.pos()); return
+        if self.editor.pause_index_while_dragging and not self.index_paused and event.buttons() & Qt.LeftButton and self.scene().mouseGrabberItem() is not None:
+            self.scene().suspend_index(); self.index_paused = True
         if self.start_pos and self.editor.current_tool not in ['select', 'pan']:
             current_pos = self.mapToScene(event.pos())
-            if self.temp_item: self.scene().removeItem(self.temp_item)
             tool = self.editor.current_tool
-            pen = QPen(Qt.gray, 2, Qt.DashLine)
-            if tool == 'pencil':
-                self.current_path.lineTo(current_pos)
-                self.temp_item = self.scene().addPath(self.current_path, pen)
-            elif tool == 'eraser':
+            if tool == 'eraser':
                 self.erase_at(current_pos)
-            elif tool in ['line', 'arrow']:
-                self.temp_item = self.scene().addLine(QLineF(self.start_pos, current_pos), pen)
-            else:
-                self.temp_item = self.scene().addRect(QRectF(self.start_pos, current_pos).normalized(), pen)
+            elif isinstance(self.temp_item, LiveStrokeItem):
+                self.temp_item.append(current_pos)
+            elif isinstance(self.temp_item, ShapePreviewItem):
+                self.temp_item.set_end(current_pos)
+        elif self.dragMode() == self.ScrollHandDrag:
+            with self.user_pan(): super().mouseMoveEvent(event)
         else:
             super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
+        if self.band_origin is not None:
+            self.band.hide(); self.band_origin = None; self.band_keep = set(); return
+        if self.index_paused:
+            self.index_paused = False; self.scene().resume_index()
         if self.start_pos and event.button() == Qt.LeftButton and self.editor.current_tool not in ['select', 'pan', 'text_urdu', 'text_english']:
             if self.temp_item: self.scene().removeItem(self.temp_item)
             end_pos = self.mapToScene(event.pos())
@@ -77,30 +136,60 @@ class CanvasView(QGraphicsView):
                 'ellipse': EllipseItem(rect),
                 'line': LineItem(QLineF(self.start_pos, end_pos)),
                 'arrow': ArrowItem(QLineF(self.start_pos, end_pos)),
-                'pencil': FreehandItem(self.current_path) if self.current_path else None
+                'pencil': self.finish_stroke(self.temp_item) if isinstance(self.temp_item, LiveStrokeItem) and self.temp_item.point_count() > 1 else None
             }
             if (new_item := item_map.get(self.editor.current_tool)):
                 self.editor.add_command(AddCommand(self.scene(), new_item))
+            self.finish_erase()
             self.editor.set_tool('select')
         self.start_pos = None
         self.temp_item = None
-        self.current_path = None
         super().mouseReleaseEvent(event)
 
+    def start_band(self, event):
+        self.band_origin = event.pos()
+        self.band_keep = set(self.scene().selectedItems()) if event.modifiers() & Qt.ControlModifier else set()
+        if self.band is None: self.band = QRubberBand(QRubberBand.Rectangle, self.viewport())
+        self.band.setGeometry(QRect(event.pos(), QSize())); self.band.show()
+        self.scene().select_in(QRectF(), keep=self.band_keep)
+
+    def update_band(self, pos):
+        rect = QRect(self.band_origin, pos).normalized()
+        self.band.setGeometry(rect)
+        area = QPainterPath(); area.addPolygon(self.mapToScene(rect)); area.closeSubpath()
+        self.scene().select_in(area, self.rubberBandSelectionMode(), keep=self.band_keep)
+
+    def finish_stroke(self, preview):
+        points = preview.points
+        if self.editor.simplify_strokes:
+            # Tolerance is given in screen pixels, so strokes drawn zoomed out are simplified harder
+            points = simplify(points, self.editor.stroke_tolerance_px / max(self.transform().m11(), 1e-6))
+        return FreehandItem(points, smooth=self.editor.smooth_strokes)
+
     def erase_at(self, pos):
-        if (items_to_erase := [item for item in self.scene().items(pos) if not getattr(item, 'locked', False)]):
-            self.editor.add_command(DeleteCommand(self.scene(), items_to_erase))
+        if self.eraser_stroke is None:
+            radius = self.editor.eraser_radius_px / max(self.transform().m11(), 1e-6)
+            self.eraser_stroke = EraserStroke(self.scene(), radius, partial=self.editor.partial_erase)
+        self.eraser_stroke.erase_to(pos)
+
+    def finish_erase(self):
+        if self.eraser_stroke is None: return
+        if (command := self.eraser_stroke.finish()): self.editor.add_command(command)
+        self.eraser_stroke = None
 
     def wheelEvent(self, event):
         if event.modifiers() == Qt.ControlModifier:
             factor = 1.2 if event.angleDelta().y() > 0 else 1 / 1.2
-            self.scale(factor, factor)
+            self.zoom_by(factor)
             self.editor.update_zoom_display()
         else:
-            super().wheelEvent(event)
+            with self.user_pan(): super().wheelEvent(event)
+
+    def keyPressEvent(self, event):
+        with self.user_pan(): super().keyPressEvent(event)
 
     def contextMenuEvent(self, event):
-        item = self.itemAt(event.pos())
+        item = self.scene().item_at(self.mapToScene(event.pos()))
         if not item:
             super().contextMenuEvent(event)
             return
@@ -110,7 +199,7 @@ class CanvasView(QGraphicsView):
             item.setSelected(True)
 
         menu = QMenu(self)
-        layer_menu = menu.addMenu(qta.icon('fa5s.layer-group', color='#333'), "Layer")
+        layer_menu = menu.addMenu(icon('fa5s.layer-group', color='#333'), "Layer")
         layer_menu.addAction(self.editor.bring_to_front_action)
         layer_menu.addAction(self.editor.bring_forward_action)
         layer_menu.addAction(self.editor.send_backward_action)
@@ -120,7 +209,7 @@ class CanvasView(QGraphicsView):
         if hasattr(item, 'locked'):
             is_locked = item.locked
             lock_text = "Unlock" if is_locked else "Lock"
-            lock_icon = qta.icon('fa5s.lock', color='#333') if is_locked else qta.icon('fa5s.unlock', color='#333')
+            lock_icon = icon('fa5s.lock', color='#333') if is_locked else icon('fa5s.unlock', color='#333')
             from PyQt5.QtWidgets import QAction
             lock_action = QAction(lock_icon, lock_text, self)
             lock_action.triggered.connect(self.editor.toggle_lock_selected)
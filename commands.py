@@ -1,9 +1,15 @@
 # commands.py
+import time
 from PyQt5.QtWidgets import QUndoCommand
 from PyQt5.QtCore import QPointF
 
 from graphics_items import GroupItem
 
+def dissolve_group(scene, group):
+    # Unlike scene.destroyItemGroup() this keeps the group alive, so the command can regroup on undo/redo
+    for item in group.childItems(): group.removeFromGroup(item)
+    scene.removeItem(group)
+
 class AddCommand(QUndoCommand):
     def __init__(self, scene, item, text="", parent=None):
         super().__init__(text, parent)
@@ -13,29 +19,52 @@ class AddCommand(QUndoCommand):
         if not text:
             self.setText(f"Add {item.type_name()}")
 
+        self.z = None
+
+    def held_items(self): return [self.item]
+
     def undo(self):
         self.scene.removeItem(self.item)
-        self.editor.update_action_states()
+        self.editor.schedule_refresh()
 
     def redo(self):
-        self.item.setZValue(self.editor.z_counter)
+        # The item goes on top the first time; redoing restores that same slot
+        if self.z is None: self.z = self.scene.z_index.top_z(default=-1) + 1
+        self.item.setZValue(self.z)
         self.scene.addItem(self.item)
-        self.editor.z_counter += 1
-        self.editor.update_action_states()
+        self.editor.schedule_refresh()
 
 class DeleteCommand(QUndoCommand):
     def __init__(self, scene, items):
         super().__init__("Delete Selection")
         self.scene, self.items = scene, items
+    def held_items(self): return self.items
     def undo(self):
         for item in self.items: self.scene.addItem(item)
     def redo(self):
         for item in self.items: self.scene.removeItem(item)
 
+class EraseCommand(QUndoCommand):
+    # The eraser edits the scene live during a drag, so redo must tolerate
+    # finding its changes already applied when the command is first pushed
+    def __init__(self, scene, removed, added):
+        super().__init__("Erase")
+        self.scene, self.removed, self.added = scene, removed, added
+    def held_items(self): return self.removed + self.added
+    def undo(self):
+        for item in self.added: self.scene.removeItem(item)
+        for item in self.removed: self.scene.addItem(item)
+    def redo(self):
+        for item in self.removed:
+            if item.scene() is self.scene: self.scene.removeItem(item)
+        for item in self.added:
+            if item.scene() is not self.scene: self.scene.addItem(item)
+
 class PropertyChangeCommand(QUndoCommand):
     def __init__(self, item, prop, old, new):
         super().__init__(f"Change {prop.replace('_', ' ').capitalize()}")
         self.item, self.prop, self.old, self.new = item, prop, old, new
+    def held_items(self): return [self.item]
     def _apply(self, val):
         self.item.set_property(self.prop, val)
         if self.item.scene() and self.item.scene().views():
@@ -43,24 +72,62 @@ class PropertyChangeCommand(QUndoCommand):
     def undo(self): self._apply(self.old)
     def redo(self): self._apply(self.new)
 
+class ZOrderCommand(QUndoCommand):
+    # changes maps item -> (old_z, new_z); it may include items renumbered to make room
+    def __init__(self, scene, changes, text="Change Stacking Order"):
+        super().__init__(text)
+        self.scene, self.changes = scene, changes
+    def held_items(self): return list(self.changes)
+    def _apply(self, which):
+        with self.scene.z_index.bulk():
+            for item, values in self.changes.items(): item.setZValue(values[which])
+    def undo(self): self._apply(0)
+    def redo(self): self._apply(1)
+
+class BatchPropertyCommand(QUndoCommand):
+    # One property set to one value on many items, applied in a single pass.
+    # Mergeable commands fold into the previous one while the same property of the
+    # same items keeps changing (slider drags, spinbox scrubbing).
+    MERGE_ID = 1
+    MERGE_WINDOW = 1.0
+    def __init__(self, scene, items, prop, old_values, new, mergeable=False):
+        label = prop.replace('_', ' ').capitalize()
+        super().__init__(f"Change {label}" if len(items) == 1 else f"Change {label} ({len(items)} items)")
+        self.scene, self.items, self.prop = scene, list(items), prop
+        self.old_values, self.new = list(old_values), new
+        self.mergeable, self.stamp = mergeable, time.monotonic()
+    def held_items(self): return self.items
+    def id(self): return self.MERGE_ID if self.mergeable else -1
+    def mergeWith(self, other):
+        if not (other.mergeable and other.prop == self.prop and other.items == self.items and other.stamp - self.stamp < self.MERGE_WINDOW): return False
+        self.new, self.stamp = other.new, other.stamp
+        return True
+    def _apply(self, values):
+        for item, value in zip(self.items, values): item.set_property(self.prop, value)
+        if self.scene.views(): self.scene.views()[0].editor.update_inspector()
+    def undo(self): self._apply(self.old_values)
+    def redo(self): self._apply([self.new] * len(self.items))
+
 class GroupCommand(QUndoCommand):
     def __init__(self, scene, items_to_group):
         super().__init__("Group Items")
         self.scene = scene
         self.items = items_to_group
         self.group = GroupItem()
+        self.group.setZValue(max(item.zValue() for item in items_to_group))
+
+    def held_items(self): return [self.group] + self.items
 
     def redo(self):
         self.scene.clearSelection()
         for item in self.items:
-            item.setPos(item.mapToParent(item.pos()))
             self.group.addToGroup(item)
 
         self.scene.addItem(self.group)
         self.group.setSelected(True)
 
     def undo(self):
-        self.scene.destroyItemGroup(self.group)
+        dissolve_group(self.scene, self.group)
         for item in self.items:
             item.setSelected(True)
 
@@ -75,17 +142,18 @@ class UngroupCommand(QUndoCommand):
         for item in self.group.childItems():
             self.children_items.append(item)
 
+    def held_items(self): return [self.group] + self.children_items
+
     def redo(self):
         self.scene.clearSelection()
         items = self.group.childItems()
-        self.scene.destroyItemGroup(self.group)
+        dissolve_group(self.scene, self.group)
         for item in items:
             item.setSelected(True)
 
     def undo(self):
         self.scene.clearSelection()
         for item in self.children_items:
-            item.setPos(item.mapToParent(item.pos()))
             self.group.addToGroup(item)
 
         self.scene.addItem(self.group)
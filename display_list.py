@@ -0,0 +1,131 @@
+# display_list.py
+import math
+from collections import namedtuple
+from PyQt5.QtGui import QImage, QPainter, QPainterPath, QColor, QTransform, QTextDocument, QPalette, QFontDatabase, QAbstractTextDocumentLayout
+from PyQt5.QtCore import Qt, QRectF, QSizeF
+
+from graphics_items import BaseItem, ArrowItem, TextItem, ImageItem
+from image_store import image_store
+from level_of_detail import mip_level_for
+
+# One drawing step: what to draw (kind and data), where (item-to-scene
+# transform) and how opaque, plus the scene bounds used to skip it when a
+# tile does not overlap. Every field is a value type or plain data; nothing
+# refers back to a QGraphicsItem.
+DisplayOp = namedtuple('DisplayOp', 'kind transform opacity bounds data')
+
+PLACEHOLDER_COLOR = QColor("#e9ecef")
+
+def _path_op(item, transform, bounds, path, pen, brush):
+    return DisplayOp('path', transform, item.opacity_val, bounds, (QPainterPath(path), pen, brush))
+
+def _shape_ops(item, transform, bounds):
+    # Interned styles are never modified, so their pens and brushes are captured as they are
+    style = item.style
+    yield _path_op(item, transform, bounds, item.geometry_path(), style.pen, style.brush)
+    if isinstance(item, ArrowItem):
+        head = QPainterPath(); head.addPolygon(item.arrowhead()); head.closeSubpath()
+        yield _path_op(item, transform, bounds, head, style.head_pen, style.head_brush)
+
+def _text_html(item):
+    # toHtml() is the costly part of a text snapshot; it is redone only after the document changes
+    revision = item.document().revision()
+    cached = getattr(item, '_snapshot_html', None)
+    if cached is None or cached[0] != revision: cached = item._snapshot_html = (revision, item.document().toHtml())
+    return cached[1]
+
+def _text_op(item, transform, bounds):
+    document = item.document()
+    data = (_text_html(item), item.font(), QColor(item.defaultTextColor()), item.textWidth(), document.documentMargin(), document.defaultTextOption())
+    return DisplayOp('text', transform, item.opacity_val, bounds, data)
+
+def _image_op(item, transform, bounds, scale):
+    if item.is_loading(): return DisplayOp('placeholder', transform, item.opacity_val, bounds, item.boundingRect())
+    if item.image_id is None: return None
+    target = QRectF(item.offset(), QSizeF(image_store.pixmap(item.image_id).size()))
+    # Draw from the pyramid level matching the output resolution
+    lod = scale * math.sqrt(abs(transform.determinant()))
+    levels = image_store.mip_levels(item.image_id) if lod < 1.0 else [image_store.pixmap(item.image_id)]
+    # On the raster backend toImage() shares the pixmap's pixels rather than copying them
+    image = levels[mip_level_for(lod, len(levels))].toImage()
+    return DisplayOp('image', transform, item.opacity_val, bounds, (image, target))
+
+def snapshot(scene, area=None, scale=1.0):
+    """Capture the visible document items of scene, or those overlapping area,
+    as a DisplayList. Runs on the GUI thread and touches each item once; the
+    result can be rendered from any thread. scale is the output resolution the
+    list will be drawn at, used to pick image pyramid levels."""
+    found = scene.items(Qt.AscendingOrder) if area is None else scene.items(area, Qt.IntersectsItemBoundingRect, Qt.AscendingOrder)
+    ops = []
+    for item in found:
+        if not item.isVisible(): continue
+        transform, bounds = item.sceneTransform(), item.sceneBoundingRect()
+        if isinstance(item, BaseItem): ops.extend(_shape_ops(item, transform, bounds))
+        elif isinstance(item, TextItem): ops.append(_text_op(item, transform, bounds))
+        elif isinstance(item, ImageItem):
+            if (op := _image_op(item, transform, bounds, scale)) is not None: ops.append(op)
+    return DisplayList(ops, scene.itemsBoundingRect() if area is None else QRectF(area))
+
+class DisplayList:
+    """An immutable, ordered list of DisplayOps captured by snapshot().
+
+    render() may be called from any number of threads at once. Text is laid
+    out again from the captured HTML in a QTextDocument created by each
+    render() call, since a document can only be used by one thread.
+    """
+    def __init__(self, ops, bounds):
+        self.ops, self.bounds = tuple(ops), QRectF(bounds)
+
+    def __len__(self): return len(self.ops)
+
+    def has_text(self): return any(op.kind == 'text' for op in self.ops)
+
+    def thread_safe(self):
+        """False when this platform cannot draw text outside the GUI thread."""
+        return not self.has_text() or QFontDatabase.supportsThreadedFontRendering()
+
+    @staticmethod
+    def _document(data):
+        html, font, _, width, margin, option = data
+        document = QTextDocument()
+        document.setDefaultFont(font); document.setDocumentMargin(margin); document.setDefaultTextOption(option)
+        document.setHtml(html); document.setTextWidth(width)
+        return document
+
+    def render(self, image, source, background=None):
+        """Draw the part of the list inside source (scene coordinates) onto image, filling it."""
+        painter = QPainter(image)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform | QPainter.TextAntialiasing)
+        if background is not None: painter.fillRect(image.rect(), background)
+        base = QTransform.fromScale(image.width() / source.width(), image.height() / source.height())
+        base.translate(-source.left(), -source.top())
+        for op in self.ops:
+            if not op.bounds.intersects(source): continue
+            painter.setTransform(op.transform * base); painter.setOpacity(op.opacity)
+            if op.kind == 'path':
+                path, pen, brush = op.data
+                painter.setPen(pen); painter.setBrush(brush); painter.drawPath(path)
+            elif op.kind == 'text':
+                context = QAbstractTextDocumentLayout.PaintContext(); context.palette.setColor(QPalette.Text, op.data[2])
+                document = self._document(op.data)   # kept referenced: the layout belongs to it
+                document.documentLayout().draw(painter, context)
+            elif op.kind == 'image':
+                picture, target = op.data
+                painter.drawImage(target, picture, QRectF(picture.rect()))
+            elif op.kind == 'placeholder':
+                painter.fillRect(op.data, PLACEHOLDER_COLOR)
+        painter.end()
+
+    def render_image(self, size, source=None, background=Qt.transparent):
+        """A new ARGB image of size showing source (default: everything), aspect ratio kept, for thumbnails."""
+        source = QRectF(source if source is not None else self.bounds)
+        image = QImage(size, QImage.Format_ARGB32_Premultiplied); image.fill(background)
+        if source.isEmpty(): return image
+        # Grow the source rect to the image's aspect ratio so the content is not stretched
+        aspect = size.width() / size.height()
+        if source.width() / source.height() < aspect:
+            grow = source.height() * aspect - source.width(); source.adjust(-grow / 2, 0, grow / 2, 0)
+        else:
+            grow = source.width() / aspect - source.height(); source.adjust(0, -grow / 2, 0, grow / 2)
+        self.render(image, source)
+        return image
@@ -0,0 +1,361 @@
+# document_io.py
+import os
+import random
+import struct
+import sys
+from PyQt5.QtGui import QColor, QFont, QPixmap
+from PyQt5.QtCore import Qt, QByteArray, QDataStream, QFile, QIODevice, QSaveFile, QPointF, QRectF, QLineF
+
+from stroke_geometry import new_points
+from graphics_items import BaseItem, GroupItem, RectangleItem, EllipseItem, LineItem, ArrowItem, FreehandItem, TextItem, ImageItem
+from image_store import image_store
+from style_table import style_table
+
+# File layout: MAGIC, format version, top-level item count, then a flat
+# sequence of chunks. Every chunk is a 4-byte tag followed by a
+# length-prefixed payload, so readers can skip tags they do not know.
+# Since version 2 each distinct image is written once, in an IMG chunk ahead
+# of the items, and image items refer to it by its image store id.
+# Since version 3 the chunks form sections, each closed by an END chunk. A
+# full save writes one section; later saves append a section holding only
+# the items that changed (an ITEM record replaces the earlier one with the
+# same uid) and DEL tombstones for top-level items that are gone. A section
+# without its END, left by a save that did not finish, is ignored.
+MAGIC = b'GEDOC\x00'
+FORMAT_VERSION = 3
+STREAM_VERSION = QDataStream.Qt_5_15
+FILE_FILTER = "Graphics Editor Document (*.gedoc)"
+
+TAG_ITEM = b'ITEM'
+TAG_IMAGE = b'IMG '
+TAG_DELETE = b'DEL '
+TAG_END = b'END '
+
+# Appended sections are folded back into one by a full rewrite once they
+# exceed COMPACT_RATIO of the last full write and COMPACT_MIN_BYTES
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 4 * 2**20
+
+TYPE_CODES = {RectangleItem: 1, EllipseItem: 2, LineItem: 3, ArrowItem: 4, FreehandItem: 5, TextItem: 6, ImageItem: 7, GroupItem: 8}
+CODE_TYPES = {code: cls for cls, code in TYPE_CODES.items()}
+
+class DocumentError(Exception):
+    pass
+
+def item_uid(item):
+    """Stable 63-bit id for an item, assigned on first use."""
+    uid = getattr(item, 'doc_uid', None)
+    if uid is None:
+        uid = item.doc_uid = random.getrandbits(63)
+    return uid
+
+def is_document_item(item):
+    return type(item) in TYPE_CODES
+
+def top_level_items(scene):
+    items = [i for i in scene.items() if i.parentItem() is None and is_document_item(i)]
+    items.sort(key=lambda i: i.zValue())
+    return items
+
+# --- Encoding ---
+def encode_item(item):
+    payload = QByteArray()
+    stream = QDataStream(payload, QIODevice.WriteOnly); stream.setVersion(STREAM_VERSION)
+    _write_item(stream, item)
+    return payload
+
+def _write_item(stream, item):
+    stream.writeUInt8(TYPE_CODES[type(item)]); stream.writeUInt64(item_uid(item))
+    stream << item.pos(); stream.writeDouble(item.zValue())
+    stream.writeDouble(item.opacity_val); stream.writeBool(item.locked)
+    if isinstance(item, GroupItem):
+        children = sorted((c for c in item.childItems() if is_document_item(c)), key=lambda c: c.zValue())
+        stream.writeUInt32(len(children))
+        for child in children: stream << encode_item(child)
+    elif isinstance(item, TextItem):
+        stream.writeQString(item.language); stream.writeQString(item.toPlainText())
+        stream << item.font() << item.defaultTextColor(); stream.writeInt32(int(item.alignment))
+    elif isinstance(item, ImageItem):
+        stream.writeQString(item.image_id or "")
+    else:
+        stream << item.stroke_color << item.fill_color; stream.writeInt32(item.stroke_width)
+        if isinstance(item, (RectangleItem, EllipseItem)): stream << item.rect
+        elif isinstance(item, LineItem): stream << item.line
+        else: stream.writeBool(item.smooth); stream << QByteArray(_points_le(item.points).tobytes())
+
+# --- Decoding ---
+def decode_item(payload, version=FORMAT_VERSION):
+    stream = QDataStream(payload); stream.setVersion(STREAM_VERSION)
+    item = _read_item(stream, version)
+    if stream.status() != QDataStream.Ok: raise DocumentError("Corrupt item record")
+    return item
+
+def _points_le(points):
+    # Point buffers are stored little-endian regardless of the host
+    if sys.byteorder == 'little': return points
+    swapped = new_points(points); swapped.byteswap(); return swapped
+
+def _read(stream, value):
+    stream >> value; return value
+
+def _read_item(stream, version):
+    cls = CODE_TYPES.get(stream.readUInt8())
+    if cls is None: raise DocumentError("Unknown item type")
+    uid = stream.readUInt64()
+    pos = _read(stream, QPointF()); z = stream.readDouble()
+    opacity = stream.readDouble(); locked = stream.readBool()
+    if cls is GroupItem:
+        item = GroupItem()
+        for _ in range(stream.readUInt32()):
+            # Children are stored relative to the group, so they are added while the group sits at the origin
+            item.addToGroup(decode_item(_read(stream, QByteArray()), version))
+        item.setOpacity(opacity)
+    elif cls is TextItem:
+        item = TextItem(stream.readQString()); item.setPlainText(stream.readQString())
+        item.setFont(_read(stream, QFont())); item.setDefaultTextColor(_read(stream, QColor()))
+        item.apply_alignment(Qt.AlignmentFlag(stream.readInt32()))
+    elif cls is ImageItem:
+        if version < 2: item = ImageItem(_read(stream, QPixmap()))
+        else:
+            image_id = stream.readQString()
+            if image_id and image_id not in image_store: raise DocumentError("Image data missing")
+            item = ImageItem(image_id=image_id or None)
+    else:
+        stroke, fill = _read(stream, QColor()), _read(stream, QColor()); width = stream.readInt32()
+        if cls in (RectangleItem, EllipseItem): item = cls(_read(stream, QRectF()))
+        elif cls in (LineItem, ArrowItem): item = cls(_read(stream, QLineF()))
+        else:
+            smooth = stream.readBool(); points = new_points(); points.frombytes(bytes(_read(stream, QByteArray())))
+            item = cls(_points_le(points), smooth)
+        item.style_id = style_table.intern(stroke, fill, width, opacity=opacity)
+    item.doc_uid = uid
+    if not isinstance(item, BaseItem): item.opacity_val = opacity
+    if locked: item.set_property('locked', True)
+    item.setPos(pos); item.setZValue(z)
+    return item
+
+# --- Images ---
+def image_ids(items, complete=False):
+    """Distinct image store ids used by items and their descendants, in first-use order.
+    With complete, raises DocumentError for images still being decoded, which
+    have no id yet and would be saved as empty placeholders."""
+    ids, pending = {}, list(reversed(items))
+    while pending:
+        item = pending.pop()
+        if isinstance(item, ImageItem):
+            if item.image_id is not None: ids.setdefault(item.image_id)
+            elif complete and item.is_loading() and getattr(item, 'load_error', None) is None: raise DocumentError("Images are still loading")
+        pending.extend(reversed(item.childItems()))
+    return list(ids)
+
+def encode_image(image_id):
+    payload = QByteArray()
+    stream = QDataStream(payload, QIODevice.WriteOnly); stream.setVersion(STREAM_VERSION)
+    stream.writeQString(image_id); stream << image_store.pixmap(image_id)
+    return payload
+
+def decode_image(payload):
+    """Put an IMG chunk's image into the store under the id items refer to it by."""
+    stream = QDataStream(payload); stream.setVersion(STREAM_VERSION)
+    image_id = stream.readQString(); pixmap = _read(stream, QPixmap())
+    if stream.status() != QDataStream.Ok or pixmap.isNull(): raise DocumentError("Corrupt image record")
+    image_store.add(pixmap, image_id=image_id)
+    return image_id
+
+# --- Change tracking ---
+class ChangeTracker:
+    """Top-level items changed since the scene was last written to or read from its file.
+
+    EditorScene feeds it every change its items report. save_document() then
+    appends just those items, and tombstones for the ones that are gone,
+    instead of rewriting the whole document.
+    """
+    def __init__(self):
+        self.dirty, self.removed = {}, set()
+        self.reset()
+
+    def reset(self, path=None, end=0, images=(), base=0):
+        """Track changes against path, whose last complete section ends at end and
+        whose first one, the last full write, at base. Without a path the next
+        save writes the whole document."""
+        self.dirty.clear(); self.removed.clear()
+        self.path, self.end, self.base, self.images = path, end, base, set(images)
+        self.stamp = _stamp(path) if path else None
+
+    def saved(self, end, images):
+        """Note a section appended up to end that also wrote images."""
+        self.dirty.clear(); self.removed.clear()
+        self.end = end; self.images.update(images); self.stamp = _stamp(self.path)
+
+    def can_append(self, path):
+        """Whether a save to path may append: it is the tracked file, nothing else has
+        written to it since, and the appended sections are not yet due for compaction."""
+        return (path == self.path and _stamp(path) == self.stamp
+                and self.end - self.base < max(COMPACT_MIN_BYTES, self.base * COMPACT_RATIO))
+
+    def pending(self): return len(self.dirty) + len(self.removed)
+
+    def changed(self, item):
+        top = item.topLevelItem()
+        if is_document_item(top):
+            uid = item_uid(top); self.dirty[uid] = top; self.removed.discard(uid)
+
+    def leaving(self, item):
+        parent = item.parentItem()
+        if parent is not None and parent.scene() is item.scene(): self.changed(parent); return
+        # Top-level until now; Qt reparents into a group outside the scene before the item leaves
+        if is_document_item(item):
+            uid = item_uid(item); self.dirty.pop(uid, None); self.removed.add(uid)
+
+    def reparented(self, item):
+        if item.parentItem() is not None and is_document_item(item):
+            # Saved inside its new group from now on, not as a record of its own
+            uid = item_uid(item); self.dirty.pop(uid, None); self.removed.add(uid)
+        self.changed(item)
+
+def _stamp(path):
+    try: st = os.stat(path)
+    except OSError: return None
+    return st.st_size, st.st_mtime_ns
+
+# --- Streaming file access ---
+def write_document(path, items):
+    """Write top-level items to path as a single section; the file is replaced atomically.
+    Returns the ids of the images written."""
+    images = image_ids(items, complete=True)
+    out = QSaveFile(path)
+    if not out.open(QIODevice.WriteOnly): raise DocumentError(out.errorString())
+    stream = QDataStream(out); stream.setVersion(STREAM_VERSION)
+    stream.writeRawData(MAGIC); stream.writeUInt16(FORMAT_VERSION); stream.writeUInt32(len(items))
+    _write_section(stream, images, items, ())
+    if stream.status() != QDataStream.Ok or not out.commit(): raise DocumentError(out.errorString())
+    return images
+
+def append_changes(scene, path, changes):
+    """Append a section with the items changed since the last save, in place of
+    anything after the last complete section, and sync it to disk."""
+    items = sorted((item for item in changes.dirty.values() if item.scene() is scene and item.parentItem() is None), key=lambda i: i.zValue())
+    images = [image_id for image_id in image_ids(items, complete=True) if image_id not in changes.images]
+    out = QFile(path)
+    if not out.open(QIODevice.ReadWrite): raise DocumentError(out.errorString())
+    try:
+        if not out.resize(changes.end) or not out.seek(changes.end): raise DocumentError(out.errorString())
+        stream = QDataStream(out); stream.setVersion(STREAM_VERSION)
+        _write_section(stream, images, items, changes.removed)
+        if stream.status() != QDataStream.Ok or not out.flush(): raise DocumentError(out.errorString())
+        os.fsync(out.handle()); end = out.size()
+    finally:
+        out.close()
+    changes.saved(end, images)
+
+def _write_section(stream, images, items, removed):
+    for image_id in images:
+        stream.writeRawData(TAG_IMAGE); stream << encode_image(image_id)
+    for uid in removed:
+        stream.writeRawData(TAG_DELETE); stream << QByteArray(struct.pack('>Q', uid))
+    for item in items:
+        stream.writeRawData(TAG_ITEM); stream << encode_item(item)
+    stream.writeRawData(TAG_END); stream << QByteArray()
+
+class DocumentReader:
+    """Reads a document chunk by chunk; iterating yields top-level items in z order.
+
+    Version 3 files are indexed first: one pass over the sections loads their
+    images and notes where the latest record of every live item starts, so
+    only those records are decoded.
+    """
+    def __init__(self, path):
+        self.file = QFile(path)
+        if not self.file.open(QIODevice.ReadOnly): raise DocumentError(self.file.errorString())
+        self.stream = QDataStream(self.file); self.stream.setVersion(STREAM_VERSION)
+        if self.stream.readRawData(len(MAGIC)) != MAGIC: self.close(); raise DocumentError("Not a Graphics Editor document")
+        self.version = self.stream.readUInt16()
+        if self.version > FORMAT_VERSION: self.close(); raise DocumentError(f"Unsupported document version {self.version}")
+        self.item_count = self.stream.readUInt32()
+        # Ends of the first and the last complete section, and the images they hold
+        self.base = self.end = None; self.image_ids = []
+        if self.version >= 3:
+            self.offsets = self._index(); self.item_count = len(self.offsets)
+
+    def _index(self):
+        live, section, images = {}, [], []
+        while not self.stream.atEnd():
+            tag = self.stream.readRawData(4); start = self.file.pos()
+            length = self.stream.readUInt32()
+            if length == 0xFFFFFFFF: length = 0     # null QByteArray
+            if tag == TAG_ITEM:
+                # Type code and uid lead every item record
+                head = self.stream.readRawData(min(length, 9)); self.stream.skipRawData(length - len(head))
+                if len(head) == 9: section.append((struct.unpack('>BQ', head)[1], start))
+            elif tag == TAG_DELETE:
+                head = self.stream.readRawData(length)
+                if len(head) == 8: section.append((struct.unpack('>Q', head)[0], None))
+            elif tag == TAG_IMAGE:
+                payload = self.stream.readRawData(length)
+                if self.stream.status() == QDataStream.Ok: images.append(decode_image(QByteArray(payload)))
+            elif length:
+                self.stream.skipRawData(length)
+            if self.stream.status() != QDataStream.Ok: break    # torn tail of a save that did not finish
+            if tag == TAG_END:
+                for uid, offset in section:
+                    if offset is None: live.pop(uid, None)
+                    else: live[uid] = offset
+                self.image_ids += images; section.clear(); images.clear()
+                self.end = self.file.pos()
+                if self.base is None: self.base = self.end
+        if self.end is None: self.close(); raise DocumentError("Truncated document")
+        return list(live.values())
+
+    def __iter__(self):
+        try:
+            if self.version >= 3:
+                for offset in self.offsets:
+                    self.stream.resetStatus(); self.file.seek(offset); payload = _read(self.stream, QByteArray())
+                    if self.stream.status() != QDataStream.Ok: raise DocumentError("Truncated document")
+                    yield decode_item(payload, self.version)
+                return
+            while not self.stream.atEnd():
+                tag = self.stream.readRawData(4); payload = _read(self.stream, QByteArray())
+                if self.stream.status() != QDataStream.Ok: raise DocumentError("Truncated document")
+                if tag == TAG_ITEM: yield decode_item(payload, self.version)
+                elif tag == TAG_IMAGE: decode_image(payload)
+        finally:
+            self.close()
+
+    def close(self): self.file.close()
+
+def save_document(scene, path):
+    """Save scene to path. When path is the file the scene's changes are tracked
+    against, only the items changed since the last save are appended; otherwise,
+    and once the appended sections have grown too large, the whole document is
+    rewritten, which also compacts it."""
+    changes = getattr(scene, 'changes', None)
+    if changes is not None and changes.can_append(path):
+        if changes.pending(): append_changes(scene, path, changes)
+        return
+    items = top_level_items(scene)
+    images = write_document(path, items)
+    if changes is not None:
+        size = _stamp(path)[0]; changes.reset(path, size, images, size)
+
+def load_document(scene, path, batch_size=1000, on_batch=None):
+    """Add a document's items straight to scene, bypassing the undo stack, and
+    track the scene's changes against path from here on.
+    on_batch(loaded, total) is called after every batch_size items."""
+    reader, batch, loaded = DocumentReader(path), [], []
+    for item in reader:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            _add_batch(scene, batch, loaded)
+            if on_batch: on_batch(len(loaded), reader.item_count)
+    _add_batch(scene, batch, loaded)
+    if on_batch: on_batch(len(loaded), reader.item_count)
+    if (changes := getattr(scene, 'changes', None)) is not None:
+        # Older versions have no sections to append to; the next save rewrites them
+        if reader.version >= 3: changes.reset(path, reader.end, reader.image_ids, reader.base)
+        else: changes.reset()
+    return loaded
+
+def _add_batch(scene, batch, loaded):
+    for item in batch: scene.addItem(item)
+    loaded.extend(batch); batch.clear()
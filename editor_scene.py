@@ -0,0 +1,139 @@
+# editor_scene.py
+from contextlib import contextmanager
+from PyQt5.QtWidgets import QGraphicsScene, QGraphicsItem
+from PyQt5.QtGui import QPainterPath
+from PyQt5.QtCore import Qt, QRectF
+
+from z_order import ZOrderIndex
+from spatial_index import ItemIndex
+from document_io import ChangeTracker
+
+# Spatial index strategies: Qt's BSP tree, our R-tree over top-level items, or none
+INDEX_MODES = ('bsp', 'rtree', 'none')
+
+class EditorScene(QGraphicsScene):
+    """QGraphicsScene that keeps side indexes in sync with its top-level items.
+    Document items report membership, parent, z and geometry changes via
+    notify_item_change / notify_geometry_change / notify_content_change, which
+    also feed the ChangeTracker that lets saves append only what changed.
+
+    Editor code asks for hits through items_at(), item_at() and items_in(),
+    which answer from whichever spatial index is selected with set_index_mode().
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.z_index = ZOrderIndex()
+        self.index_mode, self.bsp_depth, self.item_index = 'bsp', 0, None
+        self._suspended = 0
+        self.changes = ChangeTracker()
+
+    # --- Side index maintenance ---
+    def item_entered(self, item):
+        if item.parentItem() is None:
+            self.z_index.add(item)
+            if self.item_index is not None: self.item_index.add(item)
+        self.changes.changed(item)
+
+    def item_leaving(self, item):
+        self.z_index.discard(item)
+        if self.item_index is not None: self.item_index.discard(item)
+        self.changes.leaving(item)
+
+    def item_reparented(self, item):
+        if item.parentItem() is None:
+            self.z_index.add(item)
+            if self.item_index is not None: self.item_index.add(item)
+        else:
+            self.z_index.discard(item)
+            if self.item_index is not None: self.item_index.discard(item); self.item_index.changed(item.topLevelItem())
+        self.changes.reparented(item)
+
+    def item_restacked(self, item):
+        self.z_index.update(item)
+        self.changes.changed(item)
+
+    def item_geometry_changed(self, item):
+        if self.item_index is not None: self.item_index.changed(item.topLevelItem())
+        self.changes.changed(item)
+
+    def item_changed(self, item):
+        self.changes.changed(item)
+
+    def clear(self):
+        self.z_index.clear(); super().clear(); self.changes.reset()
+        if self.item_index is not None: self.item_index = ItemIndex()
+
+    # --- Index selection ---
+    def set_index_mode(self, mode, bsp_depth=0):
+        """Switch spatial index; bsp_depth 0 lets Qt pick the BSP depth from the item count."""
+        if mode not in INDEX_MODES: raise ValueError(f"Unknown index mode {mode!r}")
+        self.index_mode, self.bsp_depth = mode, bsp_depth
+        if mode == 'bsp':
+            self.item_index = None
+            self.setItemIndexMethod(QGraphicsScene.BspTreeIndex); self.setBspTreeDepth(bsp_depth)
+        else:
+            self.setItemIndexMethod(QGraphicsScene.NoIndex)
+            self.item_index = ItemIndex(self.z_index.items()) if mode == 'rtree' else None
+
+    def rebuild_index(self):
+        """Bulk load the R-tree from scratch, e.g. after opening a document."""
+        if self.item_index is not None: self.item_index.rebuild(self.z_index.items())
+
+    def suspend_index(self):
+        """Stop Qt maintaining its BSP tree while many items move (a drag); the
+        tree is rebuilt once by resume_index(). The R-tree needs no suspension
+        since moved items only enter its overflow set."""
+        if self.index_mode == 'bsp' and not self._suspended: self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self._suspended += 1
+
+    def resume_index(self):
+        self._suspended -= 1
+        if self.index_mode == 'bsp' and not self._suspended:
+            self.setItemIndexMethod(QGraphicsScene.BspTreeIndex); self.setBspTreeDepth(self.bsp_depth)
+
+    @contextmanager
+    def index_suspended(self):
+        self.suspend_index()
+        try:
+            yield
+        finally:
+            self.resume_index()
+
+    # --- Queries ---
+    def items_at(self, pos):
+        if self.item_index is None: return self.items(pos)
+        hits = self.item_index.query(pos.x(), pos.y(), pos.x(), pos.y())
+        return self._descend(hits, lambda item: item.contains(item.mapFromScene(pos)))
+
+    def item_at(self, pos): return next(iter(self.items_at(pos)), None)
+
+    def items_in(self, area, mode=Qt.IntersectsItemShape):
+        """Items hit by a QRectF or QPainterPath in scene coordinates."""
+        if self.item_index is None: return self.items(area, mode)
+        path = area if isinstance(area, QPainterPath) else _rect_path(area)
+        box = path.boundingRect()
+        hits = self.item_index.query(box.left(), box.top(), box.right(), box.bottom())
+        return self._descend(hits, lambda item: item.collidesWithPath(item.mapFromScene(path), mode))
+
+    def _descend(self, top_level_hits, accept):
+        """Accepted items among the hits and their descendants, topmost first;
+        children stack above their parent as in Qt's own ordering."""
+        ordered = []
+        def visit(item):
+            if not item.isVisible(): return
+            for child in sorted(item.childItems(), key=lambda c: c.zValue(), reverse=True): visit(child)
+            if accept(item): ordered.append(item)
+        for top in sorted(top_level_hits, key=self.z_index.position, reverse=True): visit(top)
+        return ordered
+
+    def select_in(self, area, mode=Qt.IntersectsItemShape, keep=()):
+        """Rubber-band selection through items_in(); items in keep stay selected."""
+        hits = {item for item in self.items_in(area, mode) if item.flags() & QGraphicsItem.ItemIsSelectable}
+        hits.update(keep)
+        for item in self.selectedItems():
+            if item not in hits: item.setSelected(False)
+        for item in hits:
+            if not item.isSelected(): item.setSelected(True)
+
+def _rect_path(rect):
+    path = QPainterPath(); path.addRect(QRectF(rect)); return path
@@ -0,0 +1,97 @@
+# eraser.py
+import math
+from PyQt5.QtGui import QPainterPath, QPainterPathStroker
+from PyQt5.QtCore import Qt, QPointF
+
+from commands import EraseCommand
+from graphics_items import FreehandItem, GroupItem
+from stroke_geometry import new_points
+
+def footprint(a, b, radius):
+    """Capsule swept by a round eraser of the given radius moving from a to b."""
+    path = QPainterPath(a); path.lineTo(b)
+    if a == b: path.lineTo(b + QPointF(0.01, 0))
+    stroker = QPainterPathStroker(); stroker.setWidth(radius * 2); stroker.setCapStyle(Qt.RoundCap)
+    return stroker.createStroke(path)
+
+def _distance2_to_segment(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+    ex, ey = px - (ax + t * dx), py - (ay + t * dy)
+    return ex * ex + ey * ey
+
+def split_points(points, a, b, radius):
+    """Cut the polyline in points where it passes within radius of segment a-b.
+    Returns the surviving runs (each with at least two points), or None if the
+    polyline was not touched. Long segments are resampled near the eraser so a
+    sparse, simplified stroke is still cut where the eraser actually crossed it."""
+    ax, ay, bx, by = a.x(), a.y(), b.x(), b.y()
+    r2, step = radius * radius, max(radius * 0.5, 0.5)
+    near_l, near_r = min(ax, bx) - radius, max(ax, bx) + radius
+    near_t, near_b = min(ay, by) - radius, max(ay, by) + radius
+    runs, current, touched = [], new_points(), False
+
+    def visit(x, y):
+        nonlocal current, touched
+        if _distance2_to_segment(x, y, ax, ay, bx, by) < r2:
+            touched = True
+            if len(current) >= 4: runs.append(current)
+            current = new_points()
+        else:
+            current.append(x); current.append(y)
+
+    n = len(points) // 2
+    for i in range(n):
+        x, y = points[2*i], points[2*i+1]
+        if i > 0:
+            px, py = points[2*i-2], points[2*i-1]
+            if max(px, x) >= near_l and min(px, x) <= near_r and max(py, y) >= near_t and min(py, y) <= near_b:
+                pieces = int(math.hypot(x - px, y - py) / step)
+                for k in range(1, pieces):
+                    t = k / pieces; visit(px + (x - px) * t, py + (y - py) * t)
+        visit(x, y)
+    if len(current) >= 4: runs.append(current)
+    return runs if touched else None
+
+class EraserStroke:
+    """One eraser drag. Items are taken off the scene as the eraser touches them
+    and the whole drag becomes a single EraseCommand when finished."""
+    def __init__(self, scene, radius, partial=False):
+        self.scene, self.radius, self.partial = scene, radius, partial
+        self.removed, self.added = [], []
+        self.last_pos = None
+
+    def erase_to(self, pos):
+        start = self.last_pos if self.last_pos is not None else pos
+        self.last_pos = pos
+        area = footprint(start, pos, self.radius)
+        seen = set()
+        # IntersectsItemShape tests against each item's stroked shape(); a group
+        # counts as hit only through one of its children
+        for hit in self.scene.items_in(area, Qt.IntersectsItemShape):
+            if isinstance(hit, GroupItem): continue
+            item = hit.topLevelItem()
+            if item in seen or not hasattr(item, 'type_name') or getattr(item, 'locked', False): continue
+            seen.add(item)
+            if self.partial and isinstance(item, FreehandItem): self._split(item, start, pos)
+            else: self._take(item)
+
+    def _take(self, item):
+        self.scene.removeItem(item)
+        # Fragments created earlier in this drag were never part of the document
+        if item in self.added: self.added.remove(item)
+        else: self.removed.append(item)
+
+    def _split(self, item, start, pos):
+        runs = split_points(item.points, item.mapFromScene(start), item.mapFromScene(pos), self.radius + item.stroke_width / 2)
+        if runs is None: return
+        for points in runs:
+            fragment = FreehandItem(points, smooth=item.smooth)
+            fragment.style_id = item.style_id; fragment.setPos(item.pos()); fragment.setZValue(item.zValue())
+            self.scene.addItem(fragment); self.added.append(fragment)
+        self._take(item)
+
+    def finish(self):
+        if not self.removed and not self.added: return None
+        return EraseCommand(self.scene, self.removed, self.added)
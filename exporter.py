@@ -0,0 +1,136 @@
+# exporter.py
+import math
+import os
+import struct
+import zlib
+import threading
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtCore import Qt, QRectF, QObject, QRunnable, QThreadPool, pyqtSignal
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IDAT_CHUNK_SIZE = 1 << 16
+DEFAULT_TILE_SIZE = 512
+# Rendered pixels held at once; bands get shorter as the output gets wider
+BAND_BUDGET_BYTES = 16 * 2**20
+
+class ExportCancelled(Exception):
+    pass
+
+class PngStreamWriter:
+    """Writes an 8-bit RGBA PNG one row at a time, compressing as it goes."""
+    def __init__(self, path, width, height, compress_level=6):
+        self.path, self.width, self.height = path, width, height
+        self.file = open(path, 'wb')
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = bytearray(); self.rows_written = 0
+        self.file.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.file.write(struct.pack('>I', len(data))); self.file.write(tag); self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+
+    def _flush_idat(self, final=False):
+        while len(self.pending) >= IDAT_CHUNK_SIZE or (final and self.pending):
+            self._chunk(b'IDAT', bytes(self.pending[:IDAT_CHUNK_SIZE])); del self.pending[:IDAT_CHUNK_SIZE]
+
+    def write_row(self, *pieces):
+        """Append one scanline, given as consecutive pieces (one per tile) that together span the width."""
+        # Filter type 0 (None) per scanline; zlib does the heavy lifting
+        self.pending += self.compressor.compress(b'\x00')
+        for piece in pieces: self.pending += self.compressor.compress(piece)
+        self.rows_written += 1; self._flush_idat()
+
+    def close(self):
+        if self.rows_written != self.height: raise ValueError("PNG closed before all rows were written")
+        self.pending += self.compressor.flush(); self._flush_idat(final=True)
+        self._chunk(b'IEND', b''); self.file.close()
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+def scene_tile_renderer(scene):
+    def render(image, source):
+        painter = QPainter(image); painter.setRenderHint(QPainter.Antialiasing)
+        scene.render(painter, QRectF(image.rect()), source, Qt.IgnoreAspectRatio); painter.end()
+    return render
+
+def display_list_renderer(display_list):
+    # Safe to call off the GUI thread; see display_list.DisplayList
+    return display_list.render
+
+def export_png(scene, source_rect, path, scale=1.0, tile_size=DEFAULT_TILE_SIZE, progress=None, render_tile=None):
+    """Render source_rect of scene to a PNG at path, tile by tile.
+
+    Only one band of tiles is held in memory at a time, and its rows go to the
+    encoder tile by tile without being copied into full-width rows. Bands are
+    up to tile_size rows high but shrink as the output gets wider, keeping a
+    band within BAND_BUDGET_BYTES; only outputs too wide for a single row to
+    fit the budget exceed it. progress(done, total) is called after every
+    tile; returning False cancels the export, removes the partial file and
+    raises ExportCancelled.
+    """
+    width, height = max(1, math.ceil(source_rect.width() * scale)), max(1, math.ceil(source_rect.height() * scale))
+    render_tile = render_tile or scene_tile_renderer(scene)
+    band_size = max(1, min(tile_size, BAND_BUDGET_BYTES // (width * 4)))
+    cols, bands = math.ceil(width / tile_size), math.ceil(height / band_size)
+    total, done = cols * bands, 0
+    part_path = path + '.part'
+    writer = PngStreamWriter(part_path, width, height)
+    try:
+        for band_top in range(0, height, band_size):
+            band_h = min(band_size, height - band_top)
+            tiles = []
+            for left in range(0, width, tile_size):
+                tile_w = min(tile_size, width - left)
+                tile = QImage(tile_w, band_h, QImage.Format_RGBA8888); tile.fill(Qt.transparent)
+                source = QRectF(source_rect.left() + left / scale, source_rect.top() + band_top / scale, tile_w / scale, band_h / scale)
+                render_tile(tile, source)
+                bits = tile.constBits(); bits.setsize(tile.sizeInBytes())
+                tiles.append((memoryview(bits.asstring()), tile.bytesPerLine(), tile_w * 4)); del tile, bits
+                done += 1
+                if progress and progress(done, total) is False: raise ExportCancelled()
+            for y in range(band_h): writer.write_row(*(data[y * stride:y * stride + row_len] for data, stride, row_len in tiles))
+        writer.close()
+    except BaseException:
+        writer.abort(); raise
+    os.replace(part_path, path)
+
+class _ExportTask(QRunnable):
+    def __init__(self, export):
+        super().__init__()
+        self.export = export
+    def run(self):
+        export = self.export
+        if export.cancel_requested.is_set(): export.cancelled.emit(); return
+        def progress(done, total):
+            export.progress.emit(done, total)
+            return not export.cancel_requested.is_set()
+        try:
+            export_png(None, export.source_rect, export.path, export.scale, progress=progress, render_tile=display_list_renderer(export.display_list))
+        except ExportCancelled:
+            export.cancelled.emit()
+        except (OSError, ValueError) as e:
+            export.failed.emit(str(e))
+        else:
+            export.finished.emit(export.path)
+
+class BackgroundExport(QObject):
+    """Exports a display_list.DisplayList to PNG on the thread pool, so editing
+    carries on while the tiles render. Signals arrive on the GUI thread."""
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, display_list, source_rect, path, scale=1.0, parent=None):
+        super().__init__(parent)
+        self.display_list, self.source_rect, self.path, self.scale = display_list, QRectF(source_rect), path, scale
+        self.cancel_requested = threading.Event()
+
+    def start(self, pool=None):
+        self.pool = pool or QThreadPool.globalInstance()
+        self.pool.start(_ExportTask(self))
+
+    def cancel(self): self.cancel_requested.set()
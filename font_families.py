@@ -0,0 +1,30 @@
+# font_families.py
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+class FontFamilyLoader(QObject):
+    """Enumerates the installed font families on a later event loop pass.
+
+    On machines with large font collections the first QFontDatabase query
+    takes a while, so it is kept out of window construction and the first
+    inspector. QFontDatabase is only used on the GUI thread; the list it
+    returns is added to the inspector in chunks. `loaded` carries the list.
+    """
+    loaded = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.families = None
+        self._scheduled = False
+
+    def start(self):
+        """Enumerate on the next event loop pass. Call again after registering
+        application fonts so the list includes them."""
+        if self._scheduled: return
+        self._scheduled = True
+        QTimer.singleShot(0, self._enumerate)
+
+    def _enumerate(self):
+        self._scheduled = False
+        self.families = QFontDatabase().families()
+        self.loaded.emit(self.families)
@@ -1,8 +1,46 @@
 # graphics_items.py
 import math
+from array import array
 from PyQt5.QtWidgets import QGraphicsItem, QGraphicsTextItem, QGraphicsPixmapItem, QGraphicsItemGroup, QStyle
-from PyQt5.QtGui import QColor, QPen, QPainterPath, QPolygonF, QFont, QPixmap, QTextCursor, QTextBlockFormat
-from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QColor, QPen, QPainter, QPainterPath, QPainterPathStroker, QPolygonF, QFont, QPixmap, QTextCursor, QTextBlockFormat
+from PyQt5.QtCore import Qt, QRectF, QPointF, QSizeF
+
+from stroke_geometry import new_points, points_from_path, build_path
+from render_cache import render_cache
+from image_store import image_store
+from level_of_detail import lod_settings, level_of_detail, paint_low_detail, apply_shape_hints, paint_text_bars, mip_level_for
+from style_table import style_table, DEFAULT_STYLE
+
+# Dashed outline drawn around every selected item; built once and shared
+SELECTION_PEN = QPen(QColor("#0078d4"), 2, Qt.DashLine)
+
+def paint_selection(painter, rect):
+    painter.setPen(SELECTION_PEN); painter.setBrush(Qt.NoBrush); painter.drawRect(rect)
+
+def notify_item_change(item, change, value):
+    """Forward scene membership, parenting and stacking changes to scenes that track them.
+    Payloads the undo history spilled to disk are read back before an item re-enters a scene."""
+    if change == QGraphicsItem.ItemSceneChange:
+        if (old := item.scene()) is not None and hasattr(old, 'item_leaving'): old.item_leaving(item)
+        if value is not None and (spill := getattr(item, 'spill_record', None)) is not None: spill.restore(item)
+    elif change == QGraphicsItem.ItemSceneHasChanged:
+        if value is not None and hasattr(value, 'item_entered'): value.item_entered(item)
+    elif change == QGraphicsItem.ItemParentChange:
+        notify_content_change(item)     # the group it leaves is saved without it
+    elif change == QGraphicsItem.ItemParentHasChanged:
+        if (scene := item.scene()) is not None and hasattr(scene, 'item_reparented'): scene.item_reparented(item)
+    elif change == QGraphicsItem.ItemZValueHasChanged:
+        if (scene := item.scene()) is not None and hasattr(scene, 'item_restacked'): scene.item_restacked(item)
+    elif change == QGraphicsItem.ItemPositionHasChanged:
+        notify_geometry_change(item)
+
+def notify_geometry_change(item):
+    """Tell a tracking scene that item's scene bounds may have changed."""
+    if (scene := item.scene()) is not None and hasattr(scene, 'item_geometry_changed'): scene.item_geometry_changed(item)
+
+def notify_content_change(item):
+    """Tell a tracking scene that something item saves, other than its bounds, has changed."""
+    if (scene := item.scene()) is not None and hasattr(scene, 'item_changed'): scene.item_changed(item)
 
 class GroupItem(QGraphicsItemGroup):
     def __init__(self, parent=None):
@@ -10,92 +48,167 @@ class GroupItem(QGraphicsItemGroup):
         self.setFlags(QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemSendsGeometryChanges)
         self.setCursor(Qt.OpenHandCursor); self.opacity_val = 1.0; self.locked = False
     def type_name(self): return "Group"
+    def itemChange(self, change, value):
+        notify_item_change(self, change, value)
+        return super().itemChange(change, value)
+    def get_property(self, name):
+        return {'opacity': self.opacity_val * 100, 'locked': self.locked, 'zValue': self.zValue()}.get(name)
     def set_property(self, name, value):
         if name == 'opacity': self.opacity_val = value / 100.0; self.setOpacity(self.opacity_val)
         elif name == 'locked': self.locked = value; self.setFlag(self.ItemIsMovable, not value)
         elif name == 'zValue': self.setZValue(value)
+        notify_content_change(self)
     def paint(self, painter, option, widget=None):
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
 
 class BaseItem(QGraphicsItem):
     def __init__(self):
         super().__init__()
         self.setFlags(self.ItemIsSelectable | self.ItemIsMovable | self.ItemSendsGeometryChanges)
         self.setCursor(Qt.OpenHandCursor)
-        self.stroke_color, self.fill_color = QColor("#343a40"), QColor(Qt.transparent)
-        self.stroke_width = 4; self.opacity_val, self.locked = 1.0, False
+        # Stroke, fill, width and opacity live in the shared style table; the item keeps the id
+        self.style_id, self.locked = DEFAULT_STYLE, False
+        self._shape = None
+    @property
+    def style(self): return style_table[self.style_id]
+    @property
+    def stroke_color(self): return QColor(self.style.stroke)
+    @stroke_color.setter
+    def stroke_color(self, color): self.style_id = self.style.replace(stroke=color)
+    @property
+    def fill_color(self): return QColor(self.style.fill)
+    @fill_color.setter
+    def fill_color(self, color): self.style_id = self.style.replace(fill=color)
+    @property
+    def stroke_width(self): return self.style.width
+    @stroke_width.setter
+    def stroke_width(self, width): self.style_id = self.style.replace(width=width)
+    @property
+    def opacity_val(self): return self.style.opacity
+    @opacity_val.setter
+    def opacity_val(self, opacity): self.style_id = self.style.replace(opacity=opacity)
     def type_name(self): return "Shape"
+    def itemChange(self, change, value):
+        notify_item_change(self, change, value)
+        return super().itemChange(change, value)
     def set_property(self, name, value):
         prop_map = { 'stroke': lambda v: setattr(self, 'stroke_color', v), 'fill': lambda v: setattr(self, 'fill_color', v), 'opacity': lambda v: setattr(self, 'opacity_val', v / 100.0), 'stroke_width': lambda v: setattr(self, 'stroke_width', v), 'locked': lambda v: (setattr(self, 'locked', v), self.setFlag(self.ItemIsMovable, not v)), 'zValue': self.setZValue }
         if name in prop_map:
-            prop_map[name](value); self.prepareGeometryChange(); self.update()
-    def paint_setup(self, painter):
-        painter.setOpacity(self.opacity_val)
-        pen = QPen(self.stroke_color, self.stroke_width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-        painter.setPen(pen); painter.setBrush(self.fill_color)
+            if name in ('stroke_width', 'fill'): self._shape = None
+            if name == 'stroke_width': self.prepareGeometryChange()
+            prop_map[name](value); self.update()
+            if name == 'stroke_width': notify_geometry_change(self)
+            notify_content_change(self)
+    def get_property(self, name):
+        return {'stroke': self.stroke_color, 'fill': self.fill_color, 'opacity': self.opacity_val * 100, 'stroke_width': self.stroke_width, 'locked': self.locked, 'zValue': self.zValue()}.get(name)
+    # --- Hit-testing: stroked outline of the painted geometry, cached until geometry or stroke changes ---
+    def geometry_path(self): return QPainterPath()
+    def filled(self): return False
+    def shape(self):
+        if self._shape is None:
+            style = self.style
+            stroker = QPainterPathStroker(); stroker.setWidth(max(style.width, 1)); stroker.setCapStyle(style.cap); stroker.setJoinStyle(style.join)
+            geometry = self.geometry_path(); outline = stroker.createStroke(geometry)
+            self._shape = outline.united(geometry) if self.filled() else outline
+        return self._shape
+    def paint_setup(self, painter, option=None):
+        style = self.style
+        painter.setOpacity(style.opacity)
+        if option is not None: apply_shape_hints(self, painter, option)
+        painter.setPen(style.pen); painter.setBrush(style.brush)
     def clone(self):
-        constructor_arg = self.rect if hasattr(self, 'rect') else (self.line if hasattr(self, 'line') else (self.path if hasattr(self, 'path') else None))
+        constructor_arg = self.rect if hasattr(self, 'rect') else (self.line if hasattr(self, 'line') else (self.points if hasattr(self, 'points') else None))
         new_item = type(self)(constructor_arg)
-        new_item.stroke_color = QColor(self.stroke_color); new_item.fill_color = QColor(self.fill_color)
-        new_item.stroke_width = self.stroke_width; new_item.opacity_val = self.opacity_val; new_item.setZValue(self.zValue())
+        new_item.style_id = self.style_id; new_item.setZValue(self.zValue())
         return new_item
 
 class RectangleItem(BaseItem):
     def __init__(self, rect): super().__init__(); self.rect = rect
-    def boundingRect(self): return self.rect.adjusted(-self.stroke_width/2, -self.stroke_width/2, self.stroke_width/2, self.stroke_width/2)
+    def boundingRect(self): w = self.style.width / 2; return self.rect.adjusted(-w, -w, w, w)
     def type_name(self): return "Rectangle"
+    def geometry_path(self): path = QPainterPath(); path.addRect(self.rect); return path
+    def filled(self): return self.style.fill.alpha() > 0
     def paint(self, painter, option, widget):
-        self.paint_setup(painter); painter.drawRect(self.rect)
+        if paint_low_detail(self, painter, option, self.style.stroke): return
+        self.paint_setup(painter, option); painter.drawRect(self.rect)
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
 
 class EllipseItem(BaseItem):
     def __init__(self, rect): super().__init__(); self.rect = rect
-    def boundingRect(self): return self.rect.adjusted(-self.stroke_width/2, -self.stroke_width/2, self.stroke_width/2, self.stroke_width/2)
+    def boundingRect(self): w = self.style.width / 2; return self.rect.adjusted(-w, -w, w, w)
     def type_name(self): return "Ellipse"
+    def geometry_path(self): path = QPainterPath(); path.addEllipse(self.rect); return path
+    def filled(self): return self.style.fill.alpha() > 0
     def paint(self, painter, option, widget):
-        self.paint_setup(painter); painter.drawEllipse(self.rect)
+        if paint_low_detail(self, painter, option, self.style.stroke): return
+        self.paint_setup(painter, option); painter.drawEllipse(self.rect)
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
 
 class LineItem(BaseItem):
     def __init__(self, line): super().__init__(); self.line = line
-    def boundingRect(self): return QRectF(self.line.p1(), self.line.p2()).normalized().adjusted(-self.stroke_width, -self.stroke_width, self.stroke_width, self.stroke_width)
+    def boundingRect(self): w = self.style.width; return QRectF(self.line.p1(), self.line.p2()).normalized().adjusted(-w, -w, w, w)
     def type_name(self): return "Line"
+    def geometry_path(self): path = QPainterPath(self.line.p1()); path.lineTo(self.line.p2()); return path
     def paint(self, painter, option, widget):
-        self.paint_setup(painter); painter.drawLine(self.line)
+        if paint_low_detail(self, painter, option, self.style.stroke): return
+        self.paint_setup(painter, option); painter.drawLine(self.line)
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
 
 class ArrowItem(LineItem):
     def type_name(self): return "Arrow"
-    def paint(self, painter, option, widget):
-        super().paint(painter, option, widget)
+    def arrowhead(self):
         arrowhead_size = 6 + self.stroke_width * 2
         angle = math.atan2(-self.line.dy(), self.line.dx())
         p1 = self.line.p2() + QPointF(math.sin(angle-math.pi/3)*arrowhead_size, math.cos(angle-math.pi/3)*arrowhead_size)
         p2 = self.line.p2() + QPointF(math.sin(angle-math.pi+math.pi/3)*arrowhead_size, math.cos(angle-math.pi+math.pi/3)*arrowhead_size)
-        painter.setBrush(self.stroke_color); painter.setPen(QPen(self.stroke_color)); painter.drawPolygon(QPolygonF([self.line.p2(), p1, p2]))
+        return QPolygonF([self.line.p2(), p1, p2])
+    def boundingRect(self): return super().boundingRect().united(self.arrowhead().boundingRect())
+    def shape(self):
+        if self._shape is None:
+            path = super().shape(); head = QPainterPath(); head.addPolygon(self.arrowhead()); head.closeSubpath()
+            self._shape = path.united(head)
+        return self._shape
+    def paint(self, painter, option, widget):
+        super().paint(painter, option, widget)
+        if lod_settings.enabled and (6 + self.stroke_width * 2) * level_of_detail(painter, option) < lod_settings.arrowhead_px: return
+        style = self.style
+        painter.setBrush(style.head_brush); painter.setPen(style.head_pen); painter.drawPolygon(self.arrowhead())
 
 class FreehandItem(BaseItem):
-    def __init__(self, path): super().__init__(); self.path = path
-    def boundingRect(self): return self.path.boundingRect().adjusted(-self.stroke_width, -self.stroke_width, self.stroke_width, self.stroke_width)
+    def __init__(self, points, smooth=False):
+        super().__init__()
+        # Points live in a flat float array; the QPainterPath is derived on demand
+        self.points = points if isinstance(points, array) else points_from_path(points)
+        self.smooth = smooth; self._path = None
+    @property
+    def path(self):
+        if self._path is None: self._path = build_path(self.points, self.smooth)
+        return self._path
+    def set_points(self, points, smooth=None):
+        self.prepareGeometryChange(); self.points = points; self._path = self._shape = None
+        if smooth is not None: self.smooth = smooth
+        self.update(); notify_geometry_change(self)
+    def boundingRect(self): w = self.style.width; return self.path.boundingRect().adjusted(-w, -w, w, w)
     def type_name(self): return "Drawing"
+    def geometry_path(self): return self.path
     def paint(self, painter, option, widget):
-        self.paint_setup(painter); painter.drawPath(self.path)
+        if paint_low_detail(self, painter, option, self.style.stroke): return
+        self.paint_setup(painter, option); painter.drawPath(self.path)
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
+    def clone(self):
+        # The point array is never mutated in place, so clones can share it
+        new_item = super().clone(); new_item.smooth = self.smooth
+        return new_item
 
 class TextItem(QGraphicsTextItem):
     def __init__(self, language='urdu'):
         super().__init__()
-        self.setFlags(self.ItemIsSelectable | self.ItemIsMovable | self.ItemIsFocusable)
+        self.setFlags(self.ItemIsSelectable | self.ItemIsMovable | self.ItemIsFocusable | self.ItemSendsGeometryChanges)
         self.setTextInteractionFlags(Qt.TextEditorInteraction); self.setCursor(Qt.IBeamCursor)
         self.opacity_val, self.locked, self.language = 1.0, False, language
         font = QFont("Jameel Noori Nastaleeq", 50) if language == 'urdu' else QFont("Segoe UI", 36)
@@ -106,6 +219,10 @@ class TextItem(QGraphicsTextItem):
         # --- NEW: Set and apply initial alignment ---
         self.alignment = Qt.AlignRight if language == 'urdu' else Qt.AlignLeft
         self.apply_alignment(self.alignment)
+        self.document().contentsChanged.connect(self.contents_changed)
+        self.document().documentLayout().documentSizeChanged.connect(lambda size: notify_geometry_change(self))
+
+    def contents_changed(self): render_cache.invalidate(self); notify_content_change(self)
 
     def focusInEvent(self, event):
         super().focusInEvent(event)
@@ -113,6 +230,9 @@ class TextItem(QGraphicsTextItem):
             self.scene().views()[0].editor.update_inspector(focused_item=self)
 
     def type_name(self): return f"{self.language.capitalize()} Text"
+    def itemChange(self, change, value):
+        notify_item_change(self, change, value)
+        return super().itemChange(change, value)
     
     # --- NEW: Method to apply alignment ---
     def apply_alignment(self, alignment):
@@ -125,6 +245,14 @@ class TextItem(QGraphicsTextItem):
         self.prepareGeometryChange()
         self.update()
 
+    def get_property(self, name):
+        font = self.font()
+        return {
+            'color': self.defaultTextColor(), 'opacity': self.opacity_val * 100, 'size': font.pointSize(), 'family': font.family(),
+            'bold': font.bold(), 'italic': font.italic(), 'underline': font.underline(), 'locked': self.locked,
+            'zValue': self.zValue(), 'alignment': self.alignment
+        }.get(name)
+
     def set_property(self, name, value):
         font = self.font()
         prop_map = {
@@ -137,16 +265,22 @@ class TextItem(QGraphicsTextItem):
         if name in prop_map:
             prop_map[name](value)
             if name not in ['color', 'opacity', 'locked', 'zValue', 'alignment']: self.setFont(font)
-            self.update()
+            if name not in ['opacity', 'locked', 'zValue']: render_cache.invalidate(self)
+            self.update(); notify_content_change(self)
 
     def paint(self, painter, option, widget):
         painter.setOpacity(self.opacity_val)
         if option.state & QStyle.State_Selected:
             option.state &= ~QStyle.State_Selected
-        super().paint(painter, option, widget)
+        if self.hasFocus():
+            # While editing, the caret and selection have to be drawn live
+            super().paint(painter, option, widget)
+        elif paint_low_detail(self, painter, option, self.defaultTextColor()) or paint_text_bars(self, painter, option):
+            pass
+        elif not render_cache.paint_cached(self, painter, option, widget, super().paint):
+            super().paint(painter, option, widget)
         if self.isSelected():
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
 
     def clone(self):
         new_item = TextItem(self.language)
@@ -160,19 +294,140 @@ class TextItem(QGraphicsTextItem):
         return new_item
 
 class ImageItem(QGraphicsPixmapItem):
-    def __init__(self, pixmap):
-        super().__init__(pixmap); self.setFlags(self.ItemIsSelectable | self.ItemIsMovable)
+    # Pixels live in the shared image store; the item keeps the id of the image it shows
+    def __init__(self, pixmap=None, image_id=None):
+        super().__init__(); self.setFlags(self.ItemIsSelectable | self.ItemIsMovable | self.ItemSendsGeometryChanges)
         self.setCursor(Qt.OpenHandCursor); self.opacity_val, self.locked = 1.0, False
+        self.image_id, self.pixels_dropped = None, False
+        if image_id is not None: self.set_image(image_id)
+        elif pixmap is not None: self.setPixmap(pixmap)
+    @classmethod
+    def placeholder(cls, size):
+        """An item of the given size that paints a loading box until set_image() is called."""
+        item = cls(); item.pending_size = QSizeF(size)
+        return item
     def type_name(self): return "Image"
+    def itemChange(self, change, value):
+        notify_item_change(self, change, value)
+        if change == self.ItemSceneChange and value is not None and self.pixels_dropped: self.use_image(self.image_id)
+        return super().itemChange(change, value)
+    def is_loading(self): return getattr(self, 'pending_size', None) is not None
+    def set_image(self, image_id):
+        """Show a stored image, ending the loading state of a placeholder."""
+        self.prepareGeometryChange(); self.pending_size = None; self.load_error = None
+        self.use_image(image_id)
+    def set_load_error(self, message):
+        self.load_error = message; self.update()
+    def use_image(self, image_id):
+        if image_id != self.image_id: image_store.release(self.image_id, self); image_store.acquire(image_id, self)
+        self.image_id, self.pixels_dropped = image_id, False
+        super().setPixmap(image_store.pixmap(image_id) if image_id is not None else QPixmap())
+        self._average_color = None; render_cache.invalidate(self); notify_geometry_change(self)
+    def drop_pixels(self):
+        # Called by the image store when it spills this item's image; use_image() brings it back
+        super().setPixmap(QPixmap()); self.pixels_dropped = True; render_cache.invalidate(self)
+    def boundingRect(self):
+        if self.is_loading(): return QRectF(self.offset(), self.pending_size)
+        return super().boundingRect()
+    def shape(self):
+        if self.is_loading(): path = QPainterPath(); path.addRect(self.boundingRect()); return path
+        return super().shape()
+    def paint_placeholder(self, painter, option):
+        rect = self.boundingRect(); failed = getattr(self, 'load_error', None)
+        painter.fillRect(rect, QColor("#f8d7da") if failed else QColor("#e9ecef"))
+        painter.setPen(QPen(QColor("#d9534f") if failed else QColor("#adb5bd"), 0, Qt.DashLine)); painter.setBrush(Qt.NoBrush); painter.drawRect(rect)
+        if failed: painter.drawLine(rect.topLeft(), rect.bottomRight()); painter.drawLine(rect.topRight(), rect.bottomLeft())
+    def get_property(self, name):
+        return {'opacity': self.opacity_val * 100, 'locked': self.locked, 'zValue': self.zValue()}.get(name)
     def set_property(self, name, value):
         prop_map = {'opacity': lambda v: setattr(self, 'opacity_val', v/100.0), 'locked': lambda v: (setattr(self, 'locked', v), self.setFlag(self.ItemIsMovable, not v)), 'zValue': self.setZValue }
-        if name in prop_map: prop_map[name](value); self.update()
+        if name in prop_map: prop_map[name](value); self.update(); notify_content_change(self)
+    def setPixmap(self, pixmap):
+        # Identical pixels resolve to the image already in the store
+        self.use_image(image_store.add(pixmap))
+    def mip_levels(self):
+        # Downsampled copies, each half the size of the previous one, shared by every item showing the image
+        return image_store.mip_levels(self.image_id) if self.image_id is not None and not self.pixels_dropped else [self.pixmap()]
+    def average_color(self):
+        if getattr(self, '_average_color', None) is None:
+            self._average_color = self.mip_levels()[-1].scaled(1, 1, Qt.IgnoreAspectRatio, Qt.SmoothTransformation).toImage().pixelColor(0, 0)
+        return self._average_color
+    def paint_image(self, painter, option, widget):
+        lod = level_of_detail(painter, option)
+        if not lod_settings.enabled or lod >= 1.0: super().paint(painter, option, widget); return
+        levels = self.mip_levels(); mip = levels[mip_level_for(lod, len(levels))]
+        painter.save(); painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(QRectF(self.offset(), QSizeF(self.pixmap().size())), mip, QRectF(mip.rect())); painter.restore()
     def paint(self, painter, option, widget):
-        painter.setOpacity(self.opacity_val); super().paint(painter, option, widget)
+        painter.setOpacity(self.opacity_val)
+        if self.is_loading(): self.paint_placeholder(painter, option)
+        elif paint_low_detail(self, painter, option, self.average_color()): return
+        # Cached copies are only worth it when drawing the image scaled down
+        elif not render_cache.paint_cached(self, painter, option, widget, self.paint_image, max_scale=1.0):
+            self.paint_image(painter, option, widget)
         if option.state & QStyle.State_Selected:
-            pen = QPen(QColor("#0078d4"), 2, Qt.DashLine)
-            painter.setPen(pen); painter.setBrush(Qt.NoBrush); painter.drawRect(self.boundingRect())
+            paint_selection(painter, self.boundingRect())
     def clone(self):
-        new_item = ImageItem(QPixmap(self.pixmap()))
+        new_item = ImageItem(image_id=self.image_id)
         new_item.opacity_val = self.opacity_val; new_item.setZValue(self.zValue())
-        return new_item
\ No newline at end of file
+        return new_item
+class LiveStrokeItem(QGraphicsItem):
+    """Pencil preview that grows one segment per mouse event.
+    The bounding rect is fixed to the scene rect so appending never triggers a
+    geometry change; only the new segment's rect is invalidated. Sealed chunks
+    of the stroke are bucketed on a coarse grid so a paint only visits the
+    chunks under the exposed area."""
+    CHUNK_SIZE = 64
+    CELL_SIZE = 128.0
+    def __init__(self, start, pen, bounds):
+        super().__init__()
+        self.setFlag(self.ItemUsesExtendedStyleOption); self.setZValue(1e9)
+        self.pen, self.bounds, self.margin = pen, bounds, pen.widthF()
+        self.last_point = start
+        self.points = new_points((start.x(), start.y()))
+        self.chunks, self.cells = [], {}
+        self.chunk = QPainterPath(start); self.chunk_len = 0
+    def boundingRect(self): return self.bounds
+    def _cell_range(self, rect):
+        c = self.CELL_SIZE
+        return range(math.floor(rect.left() / c), math.floor(rect.right() / c) + 1), range(math.floor(rect.top() / c), math.floor(rect.bottom() / c) + 1)
+    def append(self, point):
+        self.chunk.lineTo(point); self.chunk_len += 1
+        self.points.append(point.x()); self.points.append(point.y())
+        m = self.margin
+        self.update(QRectF(self.last_point, point).normalized().adjusted(-m, -m, m, m))
+        self.last_point = point
+        if self.chunk_len >= self.CHUNK_SIZE:
+            index = len(self.chunks); self.chunks.append(self.chunk)
+            xs, ys = self._cell_range(self.chunk.boundingRect().adjusted(-m, -m, m, m))
+            for x in xs:
+                for y in ys: self.cells.setdefault((x, y), []).append(index)
+            self.chunk = QPainterPath(point); self.chunk_len = 0
+    def point_count(self): return len(self.points) // 2
+    def paint(self, painter, option, widget):
+        painter.setPen(self.pen); painter.setBrush(Qt.NoBrush)
+        xs, ys = self._cell_range(option.exposedRect)
+        if len(xs) * len(ys) > len(self.cells):
+            visible = range(len(self.chunks))
+        else:
+            visible = sorted({i for x in xs for y in ys for i in self.cells.get((x, y), ())})
+        for i in visible: painter.drawPath(self.chunks[i])
+        painter.drawPath(self.chunk)
+
+class ShapePreviewItem(QGraphicsItem):
+    """Rubber-band preview for rectangle, ellipse, line and arrow drags, reused for the whole drag."""
+    def __init__(self, kind, start, pen):
+        super().__init__()
+        self.setZValue(1e9)
+        self.kind, self.pen, self.margin = kind, pen, pen.widthF()
+        self.start = self.end = start
+    def set_end(self, end):
+        self.prepareGeometryChange(); self.end = end
+    def boundingRect(self):
+        m = self.margin
+        return QRectF(self.start, self.end).normalized().adjusted(-m, -m, m, m)
+    def paint(self, painter, option, widget):
+        painter.setPen(self.pen); painter.setBrush(Qt.NoBrush)
+        if self.kind in ('line', 'arrow'): painter.drawLine(self.start, self.end)
+        elif self.kind == 'ellipse': painter.drawEllipse(QRectF(self.start, self.end).normalized())
+        else: painter.drawRect(QRectF(self.start, self.end).normalized())
@@ -0,0 +1,60 @@
+# icon_cache.py
+import hashlib
+import os
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QSize, QStandardPaths
+
+# Bump when icon rendering changes so stale PNGs are not picked up
+CACHE_VERSION = 1
+# Sizes rendered per icon: menus and buttons, the tool bar, and their 2x variants
+ICON_SIZES = (16, 28, 32, 56)
+
+def cache_directory():
+    base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation) or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'icons', f"v{CACHE_VERSION}")
+
+class IconCache:
+    """qtawesome icons rendered once to PNG files and loaded from disk after
+    that. A warm start neither imports qtawesome nor loads its icon fonts;
+    QIcon reads the PNGs only when an icon is first drawn."""
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.icons = {}
+        self.rendered = 0
+
+    def _paths(self, name, color):
+        key = hashlib.blake2b(f"{name}|{color}".encode(), digest_size=8).hexdigest()
+        directory = self.directory or cache_directory()
+        return [(size, os.path.join(directory, f"{name}-{key}-{size}.png")) for size in ICON_SIZES]
+
+    def icon(self, name, color='#333'):
+        if (cached := self.icons.get((name, color))) is not None: return cached
+        paths = self._paths(name, color)
+        if all(os.path.exists(path) for _, path in paths):
+            icon = QIcon()
+            for size, path in paths: icon.addFile(path, QSize(size, size))
+        else: icon = self._render(name, color, paths)
+        self.icons[(name, color)] = icon
+        return icon
+
+    def _render(self, name, color, paths):
+        """Render through qtawesome and store the PNGs; the rendered icon is used
+        as is when the cache directory cannot be written."""
+        import qtawesome as qta
+        source = qta.icon(name, color=color); self.rendered += 1
+        try:
+            os.makedirs(os.path.dirname(paths[0][1]), exist_ok=True)
+            for size, path in paths:
+                # Written under a temporary name so a concurrent start never reads half a file
+                partial = f"{path}.{os.getpid()}.tmp"
+                if source.pixmap(size, size).save(partial, 'PNG'): os.replace(partial, path)
+        except OSError:
+            pass
+        return source
+
+    def clear(self):
+        self.icons.clear()
+
+icon_cache = IconCache()
+
+def icon(name, color='#333'): return icon_cache.icon(name, color)
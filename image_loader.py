@@ -0,0 +1,184 @@
+# image_loader.py
+import hashlib
+import itertools
+import math
+import os
+import threading
+from PyQt5 import sip
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QImageIOHandler, QImageReader, QPixmap
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QEventLoop, QSize, QPointF, pyqtSignal
+
+from graphics_items import ImageItem
+from image_store import image_store, image_digest, MIP_MIN_SIZE
+
+
+class ImageLoadError(Exception):
+    pass
+
+def image_file_filter():
+    patterns = ' '.join(f"*.{bytes(fmt).decode()}" for fmt in QImageReader.supportedImageFormats())
+    return f"Images ({patterns})"
+
+def capped_size(size, max_dimension):
+    """size shrunk, keeping its aspect ratio, so neither side exceeds max_dimension (0 means no cap)."""
+    if not max_dimension or max(size.width(), size.height()) <= max_dimension: return QSize(size)
+    return size.scaled(max_dimension, max_dimension, Qt.KeepAspectRatio)
+
+def image_files_in(directory):
+    """Readable image files directly inside directory, sorted by name."""
+    suffixes = {bytes(fmt).decode().lower() for fmt in QImageReader.supportedImageFormats()}
+    names = sorted(os.listdir(directory), key=str.lower)
+    return [os.path.join(directory, n) for n in names if os.path.splitext(n)[1][1:].lower() in suffixes and os.path.isfile(os.path.join(directory, n))]
+
+def shelf_layout(sizes, gap=20.0):
+    """Top-left offsets packing sizes, in order, into rows of a roughly square block."""
+    if not sizes: return []
+    area = sum((s.width() + gap) * (s.height() + gap) for s in sizes)
+    row_width = max(math.sqrt(area), max(s.width() for s in sizes))
+    offsets, x, y, row_height = [], 0.0, 0.0, 0.0
+    for size in sizes:
+        if x > 0 and x + size.width() > row_width: x, y, row_height = 0.0, y + row_height + gap, 0.0
+        offsets.append(QPointF(x, y))
+        x += size.width() + gap; row_height = max(row_height, size.height())
+    return offsets
+
+def read_header(path, max_dimension=0):
+    """Size the image at path will have once loaded, read from the file header only."""
+    reader = QImageReader(path); reader.setAutoTransform(True)
+    if not reader.canRead(): raise ImageLoadError(reader.errorString())
+    size = reader.size()
+    if not size.isValid(): return None
+    # EXIF rotations by a quarter turn swap the stored dimensions
+    if reader.transformation() & QImageIOHandler.TransformationRotate90: size.transpose()
+    return capped_size(size, max_dimension)
+
+def decode_image(path, max_dimension=0):
+    """Decode path, downsampling in the decoder where the format allows it."""
+    reader = QImageReader(path); reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and reader.transformation() & QImageIOHandler.TransformationRotate90: size.transpose()
+    if size.isValid() and max(size.width(), size.height()) > max_dimension > 0:
+        scaled = capped_size(size, max_dimension)
+        # Scaling is applied before the EXIF transform, so ask for the stored orientation
+        if reader.transformation() & QImageIOHandler.TransformationRotate90: scaled.transpose()
+        reader.setScaledSize(scaled)
+    image = reader.read()
+    if image.isNull(): raise ImageLoadError(reader.errorString())
+    if max_dimension and max(image.width(), image.height()) > max_dimension:
+        # Formats without header sizes (or ignoring setScaledSize) are scaled after decoding
+        image = image.scaled(capped_size(image.size(), max_dimension), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+def build_pyramid(image):
+    """image followed by successive half-size copies."""
+    levels = [image]
+    while max(levels[-1].width(), levels[-1].height()) > MIP_MIN_SIZE:
+        last = levels[-1]
+        levels.append(last.scaled(max(1, last.width() // 2), max(1, last.height() // 2), Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+    return levels
+
+def source_key(path, max_dimension):
+    """Identifies a file's content together with the size cap it is decoded at."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): digest.update(block)
+    return (digest.hexdigest(), max_dimension)
+
+class _DecodeTask(QRunnable):
+    def __init__(self, loader, token, path, max_dimension, reuse=True):
+        super().__init__()
+        self.loader, self.token, self.path, self.max_dimension, self.reuse = loader, token, path, max_dimension, reuse
+        self.cancelled = loader.cancelled   # cancel() replaces the loader's event; this task keeps its own
+    def run(self):
+        if self.cancelled.is_set(): return
+        levels, image_id, error, key = [], "", "", None
+        try:
+            # A file whose image is already in the store is not decoded again
+            key = source_key(self.path, self.max_dimension)
+            image_id = (self.reuse and image_store.lookup_source(key)) or ""
+            if not image_id:
+                image = decode_image(self.path, self.max_dimension)
+                levels, image_id = build_pyramid(image), image_digest(image)
+        except (ImageLoadError, OSError) as e:
+            error = str(e) or "Could not decode image"
+        # Emitted from the worker thread; delivered on the GUI thread
+        if self.cancelled.is_set(): return
+        self.loader.decoded.emit(self.token, levels, image_id, error, key)
+
+class ImageLoader(QObject):
+    """Decodes image files on a thread pool. load() returns a placeholder
+    ImageItem straight away; it switches to the decoded image, registered in
+    the shared image store with its mip pyramid, when the decode finishes.
+    QPixmaps are only created on the GUI thread."""
+    decoded = pyqtSignal(int, list, str, str, object)
+    finished = pyqtSignal(object)       # the item whose image arrived
+    failed = pyqtSignal(object, str)    # item, error message
+    idle = pyqtSignal()                 # the last queued decode has been delivered
+
+    def __init__(self, pool=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.pending = {}   # token -> (item, path)
+        self._tokens = itertools.count(1)
+        self.cancelled = threading.Event()
+        self.decoded.connect(self._on_decoded)
+
+    def load(self, path, max_dimension=0):
+        size = read_header(path, max_dimension)
+        item = ImageItem.placeholder(size if size is not None else QSize(256, 256))
+        token = next(self._tokens); self.pending[token] = (item, path)
+        self.pool.start(_DecodeTask(self, token, path, max_dimension))
+        return item
+
+    def load_many(self, paths, max_dimension=0):
+        """Queue every path at once so decodes spread over the whole pool. Returns
+        the placeholders, in path order, and (path, error) for unreadable files."""
+        items, errors = [], []
+        for path in paths:
+            try: items.append(self.load(path, max_dimension))
+            except ImageLoadError as e: errors.append((path, str(e)))
+        return items, errors
+
+    def is_loading(self): return bool(self.pending)
+
+    def cancel(self):
+        """Drop every queued decode, before the loader goes away or the scene holding
+        its placeholders is cleared. Decodes already running still finish; wait for
+        them with the pool's waitForDone(). Later loads are not affected."""
+        self.cancelled.set(); self.cancelled = threading.Event(); self.pending.clear()
+
+    def wait(self, msecs=-1):
+        """Block until all queued decodes have run and been delivered (for scripts and benchmarks)."""
+        self.pool.waitForDone(msecs); QApplication.processEvents()
+
+    def finish(self):
+        """Run the event loop until every queued decode has been delivered, e.g. so a
+        save does not find placeholders; unlike wait() other pool tasks are not waited for."""
+        if not self.pending: return
+        loop = QEventLoop(); self.idle.connect(loop.quit)
+        try: loop.exec_()
+        finally: self.idle.disconnect(loop.quit)
+
+    def _on_decoded(self, token, levels, image_id, error, key):
+        entry = self.pending.pop(token, None)
+        if entry is None: return
+        try: self._deliver(token, entry, levels, image_id, error, key)
+        finally:
+            if not self.pending: self.idle.emit()
+
+    def _deliver(self, token, entry, levels, image_id, error, key):
+        item, path = entry
+        if sip.isdeleted(item): return
+        if item.scene() is None:
+            # Removed, e.g. by undoing the import, before its image arrived; not left loading forever
+            item.set_load_error("Removed before the image finished loading"); return
+        if not error and levels:
+            image_store.add(QPixmap.fromImage(levels[0]), [QPixmap.fromImage(level) for level in levels[1:]], image_id=image_id)
+        elif not error and image_id not in image_store:
+            # The stored copy was released while this task ran; decode after all
+            self.pending[token] = entry; self.pool.start(_DecodeTask(self, token, path, key[1], reuse=False)); return
+        if error: item.set_load_error(error); self.failed.emit(item, f"{path}: {error}"); return
+        image_store.remember_source(key, image_id)
+        item.set_image(image_id)
+        self.finished.emit(item)
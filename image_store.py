@@ -0,0 +1,143 @@
+# image_store.py
+import hashlib
+import threading
+import weakref
+import zlib
+from array import array
+from PyQt5 import sip
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt
+
+# Pyramid levels stop once the longest side is this small
+MIP_MIN_SIZE = 32
+
+def image_digest(image):
+    """Content id of a QImage: a hash over its size, pixel format and pixels."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.width()}x{image.height()}:{int(image.format())}:{image.bytesPerLine()}".encode())
+    if not image.isNull(): h.update(image.constBits().asstring(image.sizeInBytes()))
+    return h.hexdigest()
+
+# Spilled images are stored as zlib-compressed raw pixels: much faster than
+# PNG and still compact for the flat artwork this editor deals with
+def encode_image(image):
+    header = array('i', (image.width(), image.height(), image.bytesPerLine(), int(image.format()))).tobytes()
+    return header + zlib.compress(image.constBits().asstring(image.sizeInBytes()), 1)
+
+def decode_image(data):
+    width, height, stride, fmt = array('i', data[:16])
+    return QImage(zlib.decompress(data[16:]), width, height, stride, QImage.Format(fmt)).copy()
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+class _Entry:
+    __slots__ = ('pixmap', 'mips', 'refs', 'spill')
+    def __init__(self, pixmap, mips=None):
+        self.pixmap, self.mips = pixmap, mips
+        self.refs = weakref.WeakSet()   # ImageItems showing this image
+        self.spill = None               # journal record while the pixels live on disk
+
+def _live(refs):
+    # Items deleted on the C++ side (scene.clear()) can outlive their wrapper's last use
+    return [item for item in refs if not sip.isdeleted(item)]
+
+class ImageStore:
+    """Decoded images shared by every ImageItem that shows them, keyed by content.
+
+    Items hold an image id and the store holds the one pixmap (plus its mip
+    pyramid) for each id, so memory and saved documents grow with the number
+    of distinct images rather than with the number of placements. Entries no
+    item refers to any more are dropped by collect().
+    """
+    def __init__(self):
+        self.entries = {}
+        self._sources, self._lock = {}, threading.Lock()   # (file digest, size cap) -> image id
+
+    def __contains__(self, image_id): return image_id in self.entries
+
+    def add(self, pixmap, mips=None, image_id=None):
+        """Register pixmap and return its id; an already stored copy wins over the new one."""
+        if pixmap.isNull(): return None
+        if image_id is None: image_id = image_digest(pixmap.toImage())
+        if image_id not in self.entries: self.entries[image_id] = _Entry(pixmap, [pixmap] + list(mips) if mips else None)
+        return image_id
+
+    def pixmap(self, image_id):
+        entry = self.entries[image_id]
+        if entry.spill is not None: self._unspill(image_id, entry)
+        return entry.pixmap
+
+    def mip_levels(self, image_id):
+        """The image followed by successive half-size copies, built once per image."""
+        entry = self.entries[image_id]
+        if entry.mips is None:
+            entry.mips = [self.pixmap(image_id)]
+            while max(entry.mips[-1].width(), entry.mips[-1].height()) > MIP_MIN_SIZE:
+                last = entry.mips[-1]
+                entry.mips.append(last.scaled(max(1, last.width() // 2), max(1, last.height() // 2), Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        return entry.mips
+
+    # --- References ---
+    def acquire(self, image_id, item):
+        if image_id is not None: self.entries[image_id].refs.add(item)
+
+    def release(self, image_id, item):
+        entry = self.entries.get(image_id)
+        if entry is not None: entry.refs.discard(item)
+
+    def references(self, image_id):
+        entry = self.entries.get(image_id)
+        return _live(entry.refs) if entry is not None else []
+
+    def collect(self):
+        """Drop images no item refers to; returns how many were dropped."""
+        dead = [image_id for image_id, entry in self.entries.items() if not _live(entry.refs)]
+        for image_id in dead:
+            entry = self.entries.pop(image_id)
+            if entry.spill is not None: entry.spill.journal.release(entry.spill)
+        return len(dead)
+
+    # --- Source files ---
+    # Lets the import workers skip decoding a file whose image is already stored
+    def lookup_source(self, key):
+        with self._lock:
+            image_id = self._sources.get(key)
+        return image_id if image_id in self.entries else None
+
+    def remember_source(self, key, image_id):
+        with self._lock: self._sources[key] = image_id
+
+    # --- Spilling (used by the undo history) ---
+    def image_bytes(self, image_id):
+        entry = self.entries[image_id]
+        if entry.spill is not None: return 0
+        return sum(pixmap_bytes(level) for level in entry.mips) if entry.mips else pixmap_bytes(entry.pixmap)
+
+    def is_spilled(self, image_id): return self.entries[image_id].spill is not None
+
+    def spill(self, image_id, journal):
+        """Write an image to journal and drop its pixels from every referencing item; returns the bytes freed."""
+        entry = self.entries[image_id]
+        if entry.spill is not None: return 0
+        freed = self.image_bytes(image_id)
+        entry.spill = journal.append(encode_image(entry.pixmap.toImage()), freed)
+        entry.pixmap, entry.mips = None, None
+        for item in _live(entry.refs): item.drop_pixels()
+        return freed
+
+    def _unspill(self, image_id, entry):
+        record, entry.spill = entry.spill, None
+        entry.pixmap = QPixmap.fromImage(decode_image(record.journal.read(record)))
+        record.journal.release(record)
+
+    def stats(self):
+        self.collect()
+        spilled = [e for e in self.entries.values() if e.spill is not None]
+        refs = {image_id: len(_live(entry.refs)) for image_id, entry in self.entries.items()}
+        return {'images': len(self.entries), 'bytes': sum(self.image_bytes(i) for i in self.entries), 'references': sum(refs.values()),
+                'spilled': len(spilled), 'spilled_bytes': sum(e.spill.memory for e in spilled), 'refcounts': refs}
+
+    def clear(self): self.entries.clear()
+
+image_store = ImageStore()
@@ -0,0 +1,180 @@
+# instrumentation.py
+import json
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from PyQt5.QtWidgets import QGraphicsItem, QUndoCommand
+from PyQt5.QtGui import QColor, QFont, QFontMetrics
+from PyQt5.QtCore import Qt, QRectF, QPointF
+
+# Frames kept for the HUD's averages, and trace events kept for export
+FRAME_WINDOW = 120
+MAX_TRACE_EVENTS = 500_000
+HUD_TYPES = 6
+
+def _now_us(): return time.perf_counter_ns() // 1000
+
+class Profiler:
+    """Optional frame, paint, hit-test and undo command timing.
+
+    While disabled nothing is wrapped: CanvasView checks `enabled` once per
+    frame and the item, scene and command classes run their own methods. On
+    enable, paint() of every item class, the scene's hit-test queries and
+    redo()/undo() of every command class are replaced by timing wrappers,
+    which disable() removes again. Timings feed the HUD drawn over the canvas
+    and a Chrome trace (chrome://tracing, Perfetto) written by export_trace().
+    """
+    def __init__(self):
+        self.enabled = False
+        self._patched = []      # (owner, name, original or None when the owner did not define it)
+        self._depth = 0         # nested paint()/redo() calls are timed by the outermost one
+        self.stack, self._stack_index = None, 0
+        self.reset()
+
+    def reset(self):
+        self.events = deque(maxlen=MAX_TRACE_EVENTS)
+        self.frames = deque(maxlen=FRAME_WINDOW)      # (frame us, items painted, hit tests, items hit)
+        self.last_frame = {}                           # item type -> [us, count] for the last complete frame
+        self._frame_types = defaultdict(lambda: [0, 0])
+        self._hit_tests = self._hit_items = 0
+        self._command_start, self._command_us = None, 0
+        self.last_command = None                       # (text, direction, us)
+        self.origin = _now_us()
+
+    # --- Switching ---
+    def set_enabled(self, enabled, undo_stack=None):
+        if enabled == self.enabled: return
+        if enabled: self._install(undo_stack)
+        else: self._uninstall()
+        self.enabled = enabled
+
+    def _install(self, undo_stack):
+        import graphics_items, commands
+        from editor_scene import EditorScene
+        self.reset()
+        for cls in vars(graphics_items).values():
+            if isinstance(cls, type) and issubclass(cls, QGraphicsItem) and 'paint' in vars(cls):
+                self._patch(cls, 'paint', self._timed_paint(cls.paint, cls.__name__.replace('Item', '') or cls.__name__))
+        for name in ('items_at', 'items_in'):
+            self._patch(EditorScene, name, self._timed_query(getattr(EditorScene, name)))
+        for cls in vars(commands).values():
+            if isinstance(cls, type) and issubclass(cls, QUndoCommand):
+                for name in ('redo', 'undo'):
+                    if name in vars(cls): self._patch(cls, name, self._timed_command(getattr(cls, name), cls.__name__, name))
+        if undo_stack is not None:
+            self.stack, self._stack_index = undo_stack, undo_stack.index()
+            undo_stack.indexChanged.connect(self._stack_changed)
+
+    def _uninstall(self):
+        for owner, name, original in reversed(self._patched):
+            if original is None: delattr(owner, name)
+            else: setattr(owner, name, original)
+        self._patched.clear()
+        if self.stack is not None: self.stack.indexChanged.disconnect(self._stack_changed); self.stack = None
+
+    def _patch(self, owner, name, wrapper):
+        self._patched.append((owner, name, vars(owner).get(name)))
+        setattr(owner, name, wrapper)
+
+    # --- Wrappers ---
+    def _timed_paint(self, paint, type_name):
+        profiler = self
+        def timed_paint(item, painter, option, widget=None):
+            if profiler._depth: return paint(item, painter, option, widget)
+            profiler._depth += 1; start = _now_us()
+            try: return paint(item, painter, option, widget)
+            finally:
+                profiler._depth -= 1; end = _now_us()
+                totals = profiler._frame_types[type_name]; totals[0] += end - start; totals[1] += 1
+                profiler._event(type_name, 'paint', start, end)
+        return timed_paint
+
+    def _timed_query(self, query):
+        profiler = self
+        def timed_query(scene, *args, **kwargs):
+            start = _now_us()
+            hits = query(scene, *args, **kwargs)
+            profiler._hit_tests += 1; profiler._hit_items += len(hits)
+            profiler._event(query.__name__, 'hit-test', start, _now_us(), {'hits': len(hits)})
+            return hits
+        return timed_query
+
+    def _timed_command(self, method, class_name, direction):
+        profiler = self
+        def timed_command(command):
+            if profiler._depth: return method(command)
+            profiler._depth += 1; start = _now_us()
+            try: return method(command)
+            finally:
+                profiler._depth -= 1; end = _now_us()
+                if profiler._command_start is None: profiler._command_start = start
+                profiler._command_us += end - start
+                profiler._event(f"{class_name}.{direction}", 'command', start, end, {'text': command.text()})
+        return timed_command
+
+    def _stack_changed(self, index):
+        # A macro runs its children one by one; their times are summed into one entry per stack step
+        direction = 'undo' if index < self._stack_index else 'redo'
+        command = self.stack.command(index if direction == 'undo' else index - 1)
+        self._stack_index = index
+        if self._command_start is None or command is None: return
+        text = command.text() or command.actionText()
+        self.last_command = (text, direction, self._command_us)
+        self._event(f"{direction}: {text}", 'undo-stack', self._command_start, self._command_start + self._command_us)
+        self._command_start, self._command_us = None, 0
+
+    # --- Frames ---
+    def paint_frame(self, view, event, paint_event):
+        """Run the view's paintEvent as one timed frame."""
+        start = _now_us()
+        paint_event(event)
+        end = _now_us()
+        painted = sum(count for _, count in self._frame_types.values())
+        self.frames.append((end - start, painted, self._hit_tests, self._hit_items))
+        self._event('frame', 'frame', start, end, {'painted': painted})
+        self.events.append({'name': 'items', 'ph': 'C', 'ts': end - self.origin, 'pid': os.getpid(), 'tid': threading.get_ident(),
+                            'args': {'painted': painted, 'hit_tests': self._hit_tests, 'hit_items': self._hit_items}})
+        self.last_frame = dict(self._frame_types)
+        self._frame_types.clear(); self._hit_tests = self._hit_items = 0
+
+    def _event(self, name, category, start, end, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start - self.origin, 'dur': end - start, 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args: event['args'] = args
+        self.events.append(event)
+
+    def stats(self):
+        frames = list(self.frames)
+        last = frames[-1] if frames else (0, 0, 0, 0)
+        average = sum(f[0] for f in frames) / len(frames) if frames else 0
+        return {'frame_ms': last[0] / 1000, 'average_frame_ms': average / 1000, 'painted': last[1], 'hit_tests': last[2], 'hit_items': last[3],
+                'types': {name: (us / 1000, count) for name, (us, count) in self.last_frame.items()}, 'last_command': self.last_command,
+                'events': len(self.events)}
+
+    def draw_hud(self, painter, viewport_rect):
+        """Overlay the last frame's numbers in the view's top-left corner."""
+        st = self.stats()
+        fps = 1000 / st['average_frame_ms'] if st['average_frame_ms'] else 0
+        lines = [f"Frame {st['frame_ms']:.1f} ms  avg {st['average_frame_ms']:.1f} ms  ({fps:.0f} fps)",
+                 f"Painted {st['painted']} items  hit tests {st['hit_tests']} ({st['hit_items']} hits)"]
+        ranked = sorted(st['types'].items(), key=lambda t: t[1][0], reverse=True)[:HUD_TYPES]
+        lines += [f"  {name:<10} {ms:7.2f} ms  x{count}" for name, (ms, count) in ranked]
+        if st['last_command']:
+            text, direction, us = st['last_command']
+            lines.append(f"{direction.capitalize()} {text}: {us / 1000:.1f} ms")
+        painter.save(); painter.resetTransform()
+        font = QFont("Consolas", 9); font.setStyleHint(QFont.Monospace); painter.setFont(font)
+        metrics = QFontMetrics(font)
+        box = QRectF(viewport_rect.left() + 8, viewport_rect.top() + 8, max(metrics.horizontalAdvance(l) for l in lines) + 16, metrics.height() * len(lines) + 12)
+        painter.setPen(Qt.NoPen); painter.setBrush(QColor(0, 0, 0, 170)); painter.drawRoundedRect(box, 4, 4)
+        painter.setPen(QColor("#e8f5e9"))
+        for i, line in enumerate(lines):
+            painter.drawText(QPointF(box.left() + 8, box.top() + 6 + metrics.ascent() + i * metrics.height()), line)
+        painter.restore()
+
+    def export_trace(self, path):
+        """Write the recorded events in Chrome trace-event JSON format."""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+
+profiler = Profiler()
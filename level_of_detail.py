@@ -0,0 +1,56 @@
+# level_of_detail.py
+from PyQt5.QtGui import QColor, QFontMetricsF, QPainter
+
+class LodSettings:
+    """Screen-size thresholds, in device pixels, below which items are drawn cheaply."""
+    def __init__(self):
+        self.enabled = True
+        self.cull_px = 1.5          # skip items whose longest side is smaller than this
+        self.box_px = 6.0           # draw a flat box instead of the real geometry
+        self.no_antialias_px = 24.0 # paint small shapes without antialiasing
+        self.arrowhead_px = 3.0     # skip arrowheads smaller than this
+        self.text_bar_px = 7.0      # text with a shorter line height draws as placeholder bars
+
+lod_settings = LodSettings()
+
+def level_of_detail(painter, option):
+    return option.levelOfDetailFromTransform(painter.worldTransform())
+
+def screen_size(item, lod):
+    rect = item.boundingRect()
+    return max(rect.width(), rect.height()) * lod
+
+def paint_low_detail(item, painter, option, color):
+    """Cull or box tiny items. Returns True when the item needs no further painting."""
+    if not lod_settings.enabled: return False
+    size = screen_size(item, level_of_detail(painter, option))
+    if size >= lod_settings.box_px: return False
+    if size >= lod_settings.cull_px:
+        box_color = QColor(color); box_color.setAlpha(max(box_color.alpha(), 96))
+        painter.fillRect(item.boundingRect(), box_color)
+    return True
+
+def apply_shape_hints(item, painter, option):
+    if lod_settings.enabled and screen_size(item, level_of_detail(painter, option)) < lod_settings.no_antialias_px:
+        painter.setRenderHint(QPainter.Antialiasing, False)
+
+def paint_text_bars(item, painter, option):
+    """Draw each laid-out line of a text item as a translucent bar when the text is too small to read."""
+    if not lod_settings.enabled: return False
+    lod = level_of_detail(painter, option)
+    if QFontMetricsF(item.font()).height() * lod >= lod_settings.text_bar_px: return False
+    color = QColor(item.defaultTextColor()); color.setAlpha(110)
+    block = item.document().begin()
+    while block.isValid():
+        layout = block.layout(); origin = layout.position()
+        for i in range(layout.lineCount()):
+            rect = layout.lineAt(i).naturalTextRect().translated(origin)
+            painter.fillRect(rect.adjusted(0, rect.height() * 0.2, 0, -rect.height() * 0.2), color)
+        block = block.next()
+    return True
+
+def mip_level_for(lod, levels):
+    """Index of the pyramid level to draw at lod (level k is downsampled by 2**k)."""
+    level = 0
+    while level + 1 < levels and lod * (2 ** (level + 1)) <= 1.0: level += 1
+    return level
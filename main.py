@@ -1,19 +1,17 @@
 # main.py
 import sys
 import os
+import time
+_started = time.perf_counter()
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtCore import QObject, QEvent, QTimer
 
 # Import from our new modules
 from styles import STYLESHEET
-from main_window import ProfessionalEditor
 
-def main():
-    """Main function to initialize and run the application."""
-    app = QApplication(sys.argv)
-    app.setStyleSheet(STYLESHEET)
-
-    # Load the custom Urdu font
+def load_fonts():
+    """Register the bundled Urdu font with Qt."""
     try:
         script_dir = os.path.dirname(os.path.realpath(__file__))
     except NameError:
@@ -26,9 +24,55 @@ def main():
     else:
         print(f"Warning: Font 'Jameel Noori Nastaleeq Regular.ttf' not found at {font_path}")
 
+class FirstPaint(QObject):
+    """Calls back once the watched widget has painted for the first time."""
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            # Runs on the next event loop pass, after this paint has finished
+            QTimer.singleShot(0, self.callback)
+        return False
+
+def report_startup(phases):
+    """Print how long each startup phase took, from process start to the first idle event loop pass."""
+    print("Startup phases:", file=sys.stderr)
+    for (_, previous), (name, stamp) in zip(phases, phases[1:]):
+        print(f"  {name:<24} {(stamp - previous) * 1000:8.1f} ms", file=sys.stderr)
+    print(f"  {'total':<24} {(phases[-1][1] - phases[0][1]) * 1000:8.1f} ms", file=sys.stderr)
+
+def main():
+    """Main function to initialize and run the application."""
+    profile_startup = '--profile-startup' in sys.argv
+    if profile_startup: sys.argv.remove('--profile-startup')
+    phases = [('process start', _started), ('python imports', time.perf_counter())]
+    from main_window import ProfessionalEditor
+    phases.append(('editor imports', time.perf_counter()))
+
+    app = QApplication(sys.argv)
+    app.setApplicationName("Graphics Editor")
+    app.setStyleSheet(STYLESHEET)
+    phases.append(('application', time.perf_counter()))
+
     # Create and show the main window
     editor = ProfessionalEditor()
+    phases.extend(editor.startup_phases[1:])
     editor.show()
+    phases.append(('show', time.perf_counter()))
+
+    # The custom Urdu font is registered once the window is up; nothing uses it before the first text item.
+    # The font families are enumerated after it, so the inspector lists it
+    def after_first_frame():
+        phases.append(('first frame', time.perf_counter()))
+        load_fonts(); editor.font_loader.start()
+        phases.append(('urdu font', time.perf_counter()))
+        if profile_startup: report_startup(phases)
+        editor.start_session_journal()
+    FirstPaint(editor.view.viewport(), after_first_frame)
 
     # Start the application event loop
     sys.exit(app.exec_())
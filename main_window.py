@@ -1,75 +1,154 @@
 # main_window.py
 
-import qtawesome as qta
+import os
+import time
+from contextlib import contextmanager
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QPushButton, QFileDialog, QVBoxLayout, QGraphicsScene,
+    QMainWindow, QWidget, QPushButton, QFileDialog, QVBoxLayout,
     QColorDialog, QAction, QActionGroup, QLabel, QSlider, QUndoStack,
     QSpinBox, QToolBar, QDockWidget, QFormLayout, QGroupBox, QHBoxLayout,
     QComboBox, QMenu, QSizePolicy, QToolButton, QGraphicsView, QUndoCommand,
-    QButtonGroup
+    QButtonGroup, QMessageBox, QProgressDialog, QApplication, QInputDialog
 )
 from PyQt5.QtGui import (
-    QPixmap, QPainter, QImage, QColor, QFontDatabase, QKeySequence
+    QColor, QKeySequence
 )
-from PyQt5.QtCore import Qt, QRectF, QSize, QPointF
+from PyQt5.QtCore import Qt, QRectF, QSize, QPointF, QTimer
 
 # Import from our custom modules
 from canvas_view import CanvasView
-from commands import PropertyChangeCommand, DeleteCommand, AddCommand, GroupCommand, UngroupCommand
-from graphics_items import ImageItem, TextItem, BaseItem, GroupItem
+from commands import PropertyChangeCommand, DeleteCommand, AddCommand, GroupCommand, UngroupCommand, ZOrderCommand, BatchPropertyCommand
+from editor_scene import EditorScene
+import z_order
+from graphics_items import TextItem, BaseItem, GroupItem
+import document_io
+import exporter
+import display_list
+from render_cache import render_cache
+from level_of_detail import lod_settings
+from progressive_render import progressive_settings
+from undo_history import UndoHistory
+from image_store import image_store
+from instrumentation import profiler
+from image_loader import ImageLoader, image_file_filter, image_files_in, shelf_layout
+from icon_cache import icon
+from font_families import FontFamilyLoader
+import session_journal
+
+# Font families added to the inspector's combo per event loop pass
+FONT_FILL_CHUNK = 200
 
 class ProfessionalEditor(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.startup_phases = [('start', time.perf_counter())]
         self.setWindowTitle("Graphics Editor")
         self.setGeometry(100, 100, 1600, 900)
         self.current_tool = 'select'
         self.undo_stack = QUndoStack(self)
-        self.z_counter = 0
+        self.undo_history = UndoHistory(self.undo_stack, parent=self)
         self.zoom_levels = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 4.0, 8.0]
         self.clipboard = []
+        self.document_path = None
+        # Started by start_session_journal() once the window is up
+        self.session_journal = None
+        self._opacity_drag = None
+        self._pending_preview = None
+
+        # Pencil stroke post-processing, applied when a stroke is finished
+        self.simplify_strokes = True
+        self.smooth_strokes = False
+        self.stroke_tolerance_px = 1.0
+        self.eraser_radius_px = 8
+        self.partial_erase = False
+        self.pause_index_while_dragging = False
+
+        # Imported images are decoded off the GUI thread; 0 keeps their full resolution
+        self.max_image_dimension = 0
+        self.image_loader = ImageLoader(parent=self)
+        self.exports = set()    # BackgroundExports still rendering
+        self.image_loader.failed.connect(self.image_load_failed); self.image_loader.idle.connect(self.report_import_errors)
+        self.import_errors = []
 
         # --- NEW: State for eyedropper ---
         self.is_picking_color = False
         self.picking_for_property = None
 
+        self.preview_timer = QTimer(self, singleShot=True, interval=16, timeout=self.flush_preview)
+        # Inspector/action refreshes requested by scene changes are coalesced and run once per event loop pass
+        self._transaction_depth = 0
+        self._refresh_pending = self._refresh_inspector = False
+        self.refresh_timer = QTimer(self, singleShot=True, interval=0, timeout=self.flush_refresh)
+
+        # The inspector is built on first selection; the font list it offers is enumerated once the window is up
+        self.inspector_dock = None
+        self.font_loader = FontFamilyLoader(self); self.font_loader.loaded.connect(self.fill_font_families)
+        self._pending_families, self._font_names = [], set()
+        self.font_fill_timer = QTimer(self, interval=0, timeout=self.fill_font_chunk)
+
         self.setup_ui()
         self.setup_connections()
         self.set_tool('select')
         self.update_action_states()
+        self.mark_phase('connections')
+
+    def mark_phase(self, name): self.startup_phases.append((name, time.perf_counter()))
 
     def setup_ui(self):
-        self.scene = QGraphicsScene()
+        self.scene = EditorScene()
         self.scene.setSceneRect(-10000, -10000, 20000, 20000)
         self.scene.setBackgroundBrush(QColor("#f8f9fa"))
         self.view = CanvasView(self.scene, self)
         self.setCentralWidget(self.view)
+        self.mark_phase('scene and view')
 
-        self.create_actions()
-        self.create_tool_bar()
-        self.create_inspector_panel()
+        self.create_actions(); self.mark_phase('actions')
+        self.create_tool_bar(); self.mark_phase('tool bar')
         self.create_menu_bar()
-        self.create_zoom_controls()
+        self.create_zoom_controls(); self.mark_phase('menus')
 
     def create_actions(self):
         self.undo_action = self.undo_stack.createUndoAction(self, "Undo"); self.undo_action.setShortcut(QKeySequence.Undo)
         self.redo_action = self.undo_stack.createRedoAction(self, "Redo"); self.redo_action.setShortcut(QKeySequence.Redo)
-        self.copy_action = QAction(qta.icon('fa5s.copy', color='#333'), "Copy", self, triggered=self.copy_selection, shortcut=QKeySequence.Copy)
-        self.paste_action = QAction(qta.icon('fa5s.paste', color='#333'), "Paste", self, triggered=self.paste_selection, shortcut=QKeySequence.Paste)
-        self.duplicate_action = QAction(qta.icon('fa5s.clone', color='#333'), "Duplicate", self, triggered=self.duplicate_selection, shortcut=QKeySequence("Ctrl+D"))
-        self.delete_action = QAction(qta.icon('fa5s.trash-alt', color='#d9534f'), "Delete", self, triggered=self.delete_selection, shortcut=QKeySequence.Delete)
-        self.group_action = QAction(qta.icon('fa5s.object-group', color='#333'), "Group", self, triggered=self.group_selection, shortcut=QKeySequence("Ctrl+G"))
-        self.ungroup_action = QAction(qta.icon('fa5s.object-ungroup', color='#333'), "Ungroup", self, triggered=self.ungroup_selection, shortcut=QKeySequence("Ctrl+Shift+G"))
+        self.copy_action = QAction(icon('fa5s.copy', color='#333'), "Copy", self, triggered=self.copy_selection, shortcut=QKeySequence.Copy)
+        self.paste_action = QAction(icon('fa5s.paste', color='#333'), "Paste", self, triggered=self.paste_selection, shortcut=QKeySequence.Paste)
+        self.duplicate_action = QAction(icon('fa5s.clone', color='#333'), "Duplicate", self, triggered=self.duplicate_selection, shortcut=QKeySequence("Ctrl+D"))
+        self.delete_action = QAction(icon('fa5s.trash-alt', color='#d9534f'), "Delete", self, triggered=self.delete_selection, shortcut=QKeySequence.Delete)
+        self.group_action = QAction(icon('fa5s.object-group', color='#333'), "Group", self, triggered=self.group_selection, shortcut=QKeySequence("Ctrl+G"))
+        self.ungroup_action = QAction(icon('fa5s.object-ungroup', color='#333'), "Ungroup", self, triggered=self.ungroup_selection, shortcut=QKeySequence("Ctrl+Shift+G"))
         self.save_action = QAction("Save as PNG...", self, triggered=self.save_image)
-        self.open_action = QAction("Import Image...", self, triggered=self.import_image)
-        self.bring_to_front_action = QAction(qta.icon('fa5s.angle-double-up', color='#333'), "Bring to Front", self, triggered=self.bring_to_front)
-        self.send_to_back_action = QAction(qta.icon('fa5s.angle-double-down', color='#333'), "Send to Back", self, triggered=self.send_to_back)
-        self.bring_forward_action = QAction(qta.icon('fa5s.angle-up', color='#333'), "Bring Forward", self, triggered=self.bring_forward)
-        self.send_backward_action = QAction(qta.icon('fa5s.angle-down', color='#333'), "Send Backward", self, triggered=self.send_backward)
+        self.open_document_action = QAction("Open...", self, triggered=self.open_document, shortcut=QKeySequence.Open)
+        self.save_document_action = QAction("Save", self, triggered=self.save_document, shortcut=QKeySequence.Save)
+        self.save_document_as_action = QAction("Save As...", self, triggered=self.save_document_as, shortcut=QKeySequence.SaveAs)
+        self.open_action = QAction("Import Images...", self, triggered=self.import_image)
+        self.import_folder_action = QAction("Import Image Folder...", self, triggered=self.import_image_folder)
+        self.image_size_limit_action = QAction("Imported Image Size Limit...", self, triggered=self.set_image_size_limit)
+        self.bring_to_front_action = QAction(icon('fa5s.angle-double-up', color='#333'), "Bring to Front", self, triggered=self.bring_to_front)
+        self.send_to_back_action = QAction(icon('fa5s.angle-double-down', color='#333'), "Send to Back", self, triggered=self.send_to_back)
+        self.bring_forward_action = QAction(icon('fa5s.angle-up', color='#333'), "Bring Forward", self, triggered=self.bring_forward)
+        self.send_backward_action = QAction(icon('fa5s.angle-down', color='#333'), "Send Backward", self, triggered=self.send_backward)
         self.zoom_in_action = QAction("Zoom In", self, triggered=self.zoom_in); self.zoom_in_action.setShortcuts([QKeySequence("Ctrl++"), QKeySequence("Ctrl+=")])
         self.zoom_out_action = QAction("Zoom Out", self, triggered=self.zoom_out); self.zoom_out_action.setShortcut(QKeySequence("Ctrl+-"))
         self.reset_zoom_action = QAction("Reset Zoom to 100%", self, triggered=self.reset_zoom); self.reset_zoom_action.setShortcut(QKeySequence("Ctrl+0"))
         self.addAction(self.zoom_in_action); self.addAction(self.zoom_out_action); self.addAction(self.reset_zoom_action)
+        self.simplify_strokes_action = QAction("Simplify Pencil Strokes", self, checkable=True, checked=self.simplify_strokes, toggled=lambda c: setattr(self, 'simplify_strokes', c))
+        self.smooth_strokes_action = QAction("Smooth Pencil Strokes", self, checkable=True, checked=self.smooth_strokes, toggled=lambda c: setattr(self, 'smooth_strokes', c))
+        self.render_cache_action = QAction("Cache Text && Image Rendering", self, checkable=True, checked=render_cache.enabled, toggled=self.set_render_cache_enabled)
+        self.index_mode_group = QActionGroup(self)
+        for mode, label in (('bsp', "BSP Tree"), ('rtree', "R-Tree"), ('none', "No Index")):
+            action = QAction(label, self, checkable=True, checked=mode == 'bsp', triggered=lambda c, m=mode: self.set_index_mode(m)); action.setData(mode); self.index_mode_group.addAction(action)
+        self.bsp_depth_action = QAction("BSP Tree Depth...", self, triggered=self.set_bsp_depth)
+        self.pause_index_action = QAction("Pause Index While Dragging", self, checkable=True, checked=self.pause_index_while_dragging, toggled=lambda c: setattr(self, 'pause_index_while_dragging', c))
+        self.lod_action = QAction("Simplify When Zoomed Out", self, checkable=True, checked=lod_settings.enabled, toggled=self.set_lod_enabled)
+        self.progressive_action = QAction("Draft Rendering While Zooming", self, checkable=True, checked=progressive_settings.enabled, toggled=self.set_progressive_enabled)
+        self.refine_delay_action = QAction("Draft Refine Delay...", self, triggered=self.set_refine_delay)
+        self.render_cache_stats_action = QAction("Render Cache Statistics...", self, triggered=self.show_render_cache_stats)
+        self.image_store_stats_action = QAction("Image Store Statistics...", self, triggered=self.show_image_store_stats)
+        self.instrumentation_action = QAction("Performance Overlay", self, checkable=True, checked=profiler.enabled, toggled=self.set_instrumentation_enabled, shortcut=QKeySequence("Ctrl+Shift+P"))
+        self.export_trace_action = QAction("Export Performance Trace...", self, triggered=self.export_trace)
+        self.undo_budget_action = QAction("Undo Memory Limit...", self, triggered=self.set_undo_budget)
+        self.undo_stats_action = QAction("Undo History Statistics...", self, triggered=self.show_undo_stats)
+        self.partial_erase_action = QAction("Eraser Splits Drawings", self, checkable=True, checked=self.partial_erase, toggled=lambda c: setattr(self, 'partial_erase', c))
 
     def create_tool_bar(self):
         self.tool_bar = QToolBar("Tools")
@@ -80,8 +159,8 @@ class ProfessionalEditor(QMainWindow):
         shortcuts = {'Select':'V', 'Pan':'H', 'Rectangle':'R', 'Ellipse':'O', 'Line':'L', 'Arrow':'A', 'Pencil':'P', 'EN Text':'T', 'Image':'I', 'Eraser':'E'}
         for tool_info in tools:
             if tool_info is None: self.tool_bar.addSeparator(); continue
-            name, icon, text = tool_info
-            action = QAction(qta.icon(icon, color='#333'), text, self); action.setData(name)
+            name, icon_name, text = tool_info
+            action = QAction(icon(icon_name, color='#333'), text, self); action.setData(name)
             tooltip_text = text
             if text in shortcuts:
                 shortcut_key = shortcuts[text]
@@ -106,7 +185,7 @@ class ProfessionalEditor(QMainWindow):
         stroke_layout = QHBoxLayout(self.stroke_row)
         stroke_layout.setContentsMargins(0, 0, 0, 0); stroke_layout.setSpacing(5)
         self.stroke_color_btn = QPushButton(); self.stroke_color_btn.setProperty("class", "color-button")
-        self.stroke_eyedropper_btn = QPushButton(qta.icon('fa5s.eye-dropper', color='#333'), ""); self.stroke_eyedropper_btn.setToolTip("Pick Stroke Color from Canvas"); self.stroke_eyedropper_btn.setFixedSize(34, 34)
+        self.stroke_eyedropper_btn = QPushButton(icon('fa5s.eye-dropper', color='#333'), ""); self.stroke_eyedropper_btn.setToolTip("Pick Stroke Color from Canvas"); self.stroke_eyedropper_btn.setFixedSize(34, 34)
         stroke_layout.addWidget(self.stroke_color_btn)
         stroke_layout.addWidget(self.stroke_eyedropper_btn)
         form_layout1.addRow("Stroke:", self.stroke_row)
@@ -121,7 +200,7 @@ class ProfessionalEditor(QMainWindow):
         fill_layout = QHBoxLayout(self.fill_row)
         fill_layout.setContentsMargins(0, 0, 0, 0); fill_layout.setSpacing(5)
         self.fill_color_btn = QPushButton(); self.fill_color_btn.setProperty("class", "color-button")
-        self.fill_eyedropper_btn = QPushButton(qta.icon('fa5s.eye-dropper', color='#333'), ""); self.fill_eyedropper_btn.setToolTip("Pick Fill Color from Canvas"); self.fill_eyedropper_btn.setFixedSize(34, 34)
+        self.fill_eyedropper_btn = QPushButton(icon('fa5s.eye-dropper', color='#333'), ""); self.fill_eyedropper_btn.setToolTip("Pick Fill Color from Canvas"); self.fill_eyedropper_btn.setFixedSize(34, 34)
         fill_layout.addWidget(self.fill_color_btn)
         fill_layout.addWidget(self.fill_eyedropper_btn)
         form_layout1.addRow("Fill:", self.fill_row)
@@ -129,19 +208,19 @@ class ProfessionalEditor(QMainWindow):
         form_layout1.addRow("Opacity:", self.opacity_slider)
         self.text_box = QGroupBox("Text")
         form_layout2 = QFormLayout(self.text_box)
-        self.font_family_combo = QComboBox(); self.font_family_combo.addItems(QFontDatabase().families())
+        self.font_family_combo = QComboBox()
         self.font_size_input = QSpinBox(minimum=8, maximum=500)
         self.text_color_btn = QPushButton(); self.text_color_btn.setProperty("class", "color-button")
-        self.align_left_btn = QPushButton(qta.icon('fa5s.align-left', color='#333'), ""); self.align_left_btn.setToolTip("Align Left")
-        self.align_center_btn = QPushButton(qta.icon('fa5s.align-center', color='#333'), ""); self.align_center_btn.setToolTip("Align Center")
-        self.align_right_btn = QPushButton(qta.icon('fa5s.align-right', color='#333'), ""); self.align_right_btn.setToolTip("Align Right")
-        self.align_justify_btn = QPushButton(qta.icon('fa5s.align-justify', color='#333'), ""); self.align_justify_btn.setToolTip("Justify")
+        self.align_left_btn = QPushButton(icon('fa5s.align-left', color='#333'), ""); self.align_left_btn.setToolTip("Align Left")
+        self.align_center_btn = QPushButton(icon('fa5s.align-center', color='#333'), ""); self.align_center_btn.setToolTip("Align Center")
+        self.align_right_btn = QPushButton(icon('fa5s.align-right', color='#333'), ""); self.align_right_btn.setToolTip("Align Right")
+        self.align_justify_btn = QPushButton(icon('fa5s.align-justify', color='#333'), ""); self.align_justify_btn.setToolTip("Justify")
         self.align_group = QButtonGroup(self); self.align_group.setExclusive(True)
         for i, btn in enumerate([self.align_left_btn, self.align_center_btn, self.align_right_btn, self.align_justify_btn]):
             btn.setCheckable(True); btn.setProperty("class", "format-button"); self.align_group.addButton(btn, i)
-        self.bold_btn=QPushButton(qta.icon('fa5s.bold',color='#333'),"");self.bold_btn.setCheckable(True);self.bold_btn.setProperty("class","format-button")
-        self.italic_btn=QPushButton(qta.icon('fa5s.italic',color='#333'),"");self.italic_btn.setCheckable(True);self.italic_btn.setProperty("class","format-button")
-        self.underline_btn=QPushButton(qta.icon('fa5s.underline',color='#333'),"");self.underline_btn.setCheckable(True);self.underline_btn.setProperty("class","format-button")
+        self.bold_btn=QPushButton(icon('fa5s.bold',color='#333'),"");self.bold_btn.setCheckable(True);self.bold_btn.setProperty("class","format-button")
+        self.italic_btn=QPushButton(icon('fa5s.italic',color='#333'),"");self.italic_btn.setCheckable(True);self.italic_btn.setProperty("class","format-button")
+        self.underline_btn=QPushButton(icon('fa5s.underline',color='#333'),"");self.underline_btn.setCheckable(True);self.underline_btn.setProperty("class","format-button")
         format_layout=QHBoxLayout(); format_layout.setSpacing(5)
         format_layout.addWidget(self.bold_btn); format_layout.addWidget(self.italic_btn); format_layout.addWidget(self.underline_btn)
         format_layout.addSpacing(10); format_layout.addWidget(self.align_left_btn); format_layout.addWidget(self.align_center_btn); format_layout.addWidget(self.align_right_btn); format_layout.addWidget(self.align_justify_btn)
@@ -153,17 +232,53 @@ class ProfessionalEditor(QMainWindow):
         self.inspector_dock.setWidget(panel_widget)
         self.addDockWidget(Qt.RightDockWidgetArea, self.inspector_dock)
         self.inspector_dock.hide()
+        self.connect_inspector()
+        if self.font_loader.families is not None: self.fill_font_families(self.font_loader.families)
+        else: self.font_loader.start()
+
+    def ensure_inspector(self):
+        if self.inspector_dock is None: self.create_inspector_panel()
+
+    # --- Font list: added to the combo in chunks so a large collection never stalls the event loop ---
+    def fill_font_families(self, families):
+        if self.inspector_dock is None: return
+        self._pending_families = list(families)
+        if not self.font_fill_timer.isActive(): self.font_fill_timer.start()
+
+    def fill_font_chunk(self):
+        chunk, self._pending_families = self._pending_families[:FONT_FILL_CHUNK], self._pending_families[FONT_FILL_CHUNK:]
+        chunk = [family for family in chunk if family not in self._font_names]
+        self._font_names.update(chunk)
+        self.font_family_combo.blockSignals(True)
+        self.font_family_combo.addItems(chunk)
+        if not self._pending_families:
+            self.font_fill_timer.stop()
+            # Families shown before the list arrived were appended out of order
+            self.font_family_combo.model().sort(0)
+        self.font_family_combo.blockSignals(False)
+
+    def show_font_family(self, family):
+        if family not in self._font_names: self._font_names.add(family); self.font_family_combo.addItem(family)
+        self.font_family_combo.blockSignals(True); self.font_family_combo.setCurrentText(family); self.font_family_combo.blockSignals(False)
     
     def create_menu_bar(self):
         menubar = self.menuBar()
-        file_menu = menubar.addMenu("File"); file_menu.addAction(self.open_action); file_menu.addAction(self.save_action)
+        file_menu = menubar.addMenu("File")
+        file_menu.addAction(self.open_document_action); file_menu.addAction(self.save_document_action); file_menu.addAction(self.save_document_as_action); file_menu.addSeparator()
+        file_menu.addAction(self.open_action); file_menu.addAction(self.import_folder_action); file_menu.addAction(self.image_size_limit_action); file_menu.addAction(self.save_action)
         edit_menu = menubar.addMenu("Edit"); edit_menu.addAction(self.undo_action); edit_menu.addAction(self.redo_action); edit_menu.addSeparator()
         edit_menu.addAction(self.copy_action); edit_menu.addAction(self.paste_action); edit_menu.addAction(self.duplicate_action); edit_menu.addSeparator(); edit_menu.addAction(self.delete_action)
+        edit_menu.addSeparator(); edit_menu.addAction(self.undo_budget_action); edit_menu.addAction(self.undo_stats_action)
         object_menu = menubar.addMenu("Object")
         object_menu.addAction(self.group_action); object_menu.addAction(self.ungroup_action)
         object_menu.addSeparator()
         object_menu.addAction(self.bring_to_front_action); object_menu.addAction(self.bring_forward_action); object_menu.addAction(self.send_backward_action); object_menu.addAction(self.send_to_back_action)
         view_menu = menubar.addMenu("View"); view_menu.addAction(self.zoom_in_action); view_menu.addAction(self.zoom_out_action); view_menu.addAction(self.reset_zoom_action)
+        view_menu.addSeparator(); view_menu.addAction(self.progressive_action); view_menu.addAction(self.refine_delay_action); view_menu.addAction(self.lod_action); view_menu.addAction(self.render_cache_action); view_menu.addAction(self.render_cache_stats_action); view_menu.addAction(self.image_store_stats_action)
+        index_menu = view_menu.addMenu("Spatial Index"); index_menu.addActions(self.index_mode_group.actions())
+        index_menu.addSeparator(); index_menu.addAction(self.bsp_depth_action); index_menu.addAction(self.pause_index_action)
+        view_menu.addSeparator(); view_menu.addAction(self.instrumentation_action); view_menu.addAction(self.export_trace_action)
+        view_menu.addSeparator(); view_menu.addAction(self.simplify_strokes_action); view_menu.addAction(self.smooth_strokes_action); view_menu.addAction(self.partial_erase_action)
 
     def create_zoom_controls(self):
         self.zoom_widget=QWidget(self,objectName="zoomPanel");layout=QHBoxLayout(self.zoom_widget);layout.setContentsMargins(5,5,5,5);layout.setSpacing(5);zoom_out_btn=QPushButton("-");zoom_out_btn.clicked.connect(self.zoom_out);self.zoom_button=QToolButton();self.zoom_button.setText("100%");self.zoom_button.setToolTip("Set zoom level");self.zoom_button.setPopupMode(QToolButton.InstantPopup);self.zoom_button.setFixedWidth(70);zoom_menu=QMenu(self);
@@ -173,15 +288,19 @@ class ProfessionalEditor(QMainWindow):
 
     # --- FUNCTION MODIFIED ---
     def setup_connections(self):
-        self.scene.selectionChanged.connect(self.update_inspector); self.scene.selectionChanged.connect(self.update_action_states)
+        self.scene.selectionChanged.connect(self.selection_changed)
+
+    def connect_inspector(self):
         self.stroke_color_btn.clicked.connect(lambda: self.change_color_property('stroke'))
         self.fill_color_btn.clicked.connect(lambda: self.change_color_property('fill'))
         self.text_color_btn.clicked.connect(lambda: self.change_color_property('color'))
         self.opacity_slider.sliderPressed.connect(self.cache_opacity_change)
-        self.opacity_slider.valueChanged.connect(lambda v: self.change_property('opacity', v, is_final=False))
+        self.opacity_slider.valueChanged.connect(self.opacity_value_changed)
         self.opacity_slider.sliderReleased.connect(self.finalize_opacity_change)
-        self.font_size_input.editingFinished.connect(lambda: self.change_property('size', self.font_size_input.value()))
-        self.stroke_width_input.editingFinished.connect(lambda: self.change_property('stroke_width', self.stroke_width_input.value()))
+        # Spinboxes report only finished values, but every arrow/wheel step; consecutive steps merge into one undo entry
+        self.font_size_input.setKeyboardTracking(False); self.stroke_width_input.setKeyboardTracking(False)
+        self.font_size_input.valueChanged.connect(lambda v: self.change_property('size', v, mergeable=True))
+        self.stroke_width_input.valueChanged.connect(lambda v: self.change_property('stroke_width', v, mergeable=True))
         self.font_family_combo.currentTextChanged.connect(lambda family: self.change_property('family', family))
         self.bold_btn.toggled.connect(lambda c: self.change_property('bold', c))
         self.italic_btn.toggled.connect(lambda c: self.change_property('italic', c))
@@ -230,41 +349,73 @@ class ProfessionalEditor(QMainWindow):
         if new_alignment is not None and item.alignment != new_alignment:
             self.add_command(PropertyChangeCommand(item, 'alignment', item.alignment, new_alignment))
 
+    # --- Transactions ---
+    @contextmanager
+    def transaction(self):
+        """Run a compound scene mutation; the refreshes it triggers are applied once when the outermost transaction ends."""
+        self._transaction_depth += 1
+        try:
+            yield
+        finally:
+            self._transaction_depth -= 1
+            if not self._transaction_depth: self.flush_refresh()
+
+    def schedule_refresh(self, inspector=False):
+        self._refresh_pending = True; self._refresh_inspector |= inspector
+        if not self._transaction_depth and not self.refresh_timer.isActive(): self.refresh_timer.start()
+
+    def selection_changed(self): self.schedule_refresh(inspector=True)
+
+    def flush_refresh(self):
+        self.refresh_timer.stop()
+        if not self._refresh_pending: return
+        inspector = self._refresh_inspector
+        self._refresh_pending = self._refresh_inspector = False
+        if inspector: self.update_inspector()
+        self.update_action_states()
+
+    def push_transaction(self, command):
+        with self.transaction(): self.add_command(command)
+
     def group_selection(self):
         selected = self.scene.selectedItems()
-        if len(selected) > 1: self.add_command(GroupCommand(self.scene, selected))
+        if len(selected) > 1: self.push_transaction(GroupCommand(self.scene, selected))
 
     def ungroup_selection(self):
         selected = self.scene.selectedItems()
         groups = [item for item in selected if isinstance(item, GroupItem)]
         if groups:
-            cmd = QUndoCommand("Ungroup Multiple"); [UngroupCommand(self.scene, g, parent=cmd) for g in groups]; self.add_command(cmd)
+            cmd = QUndoCommand("Ungroup Multiple"); [UngroupCommand(self.scene, g, parent=cmd) for g in groups]; self.push_transaction(cmd)
 
     def copy_selection(self):
         self.clipboard=[item.clone() for item in self.scene.selectedItems()]; self.update_action_states()
 
     def paste_selection(self):
         if not self.clipboard: return
-        self.scene.clearSelection(); items_to_add=[]
-        for item in self.clipboard:
-            new_item=item.clone(); new_item.setPos(new_item.pos()+QPointF(20,20)); new_item.setSelected(True); items_to_add.append(new_item)
-        cmd=QUndoCommand(); cmd.setText(f"Paste {len(items_to_add)} items"); [AddCommand(self.scene,i,parent=cmd) for i in items_to_add]; self.add_command(cmd)
+        with self.transaction():
+            self.scene.clearSelection(); items_to_add=[]
+            for item in self.clipboard:
+                new_item=item.clone(); new_item.setPos(new_item.pos()+QPointF(20,20)); new_item.setSelected(True); items_to_add.append(new_item)
+            cmd=QUndoCommand(); cmd.setText(f"Paste {len(items_to_add)} items"); [AddCommand(self.scene,i,parent=cmd) for i in items_to_add]; self.add_command(cmd)
 
     def duplicate_selection(self):
         selected_items=self.scene.selectedItems()
         if not selected_items: return
-        self.scene.clearSelection(); items_to_add=[]
-        for item in selected_items:
-            new_item=item.clone(); new_item.setPos(item.pos()+QPointF(20,20)); new_item.setSelected(True); items_to_add.append(new_item)
-        cmd=QUndoCommand(); cmd.setText(f"Duplicate {len(items_to_add)} items"); [AddCommand(self.scene,i,parent=cmd) for i in items_to_add]; self.add_command(cmd)
+        with self.transaction():
+            self.scene.clearSelection(); items_to_add=[]
+            for item in selected_items:
+                new_item=item.clone(); new_item.setPos(item.pos()+QPointF(20,20)); new_item.setSelected(True); items_to_add.append(new_item)
+            cmd=QUndoCommand(); cmd.setText(f"Duplicate {len(items_to_add)} items"); [AddCommand(self.scene,i,parent=cmd) for i in items_to_add]; self.add_command(cmd)
 
     def get_selected(self):
         selected=self.scene.selectedItems(); return selected[0] if len(selected)==1 else None
 
     def update_inspector(self, focused_item=None):
         item = focused_item if focused_item else self.get_selected()
-        if item: self.inspector_dock.show()
-        else: self.inspector_dock.hide(); return
+        if not item:
+            if self.inspector_dock is not None: self.inspector_dock.hide()
+            return
+        self.ensure_inspector(); self.inspector_dock.show()
 
         is_text = isinstance(item, TextItem)
         is_shape = isinstance(item, BaseItem)
@@ -279,7 +430,7 @@ class ProfessionalEditor(QMainWindow):
 
         if is_text:
             font = item.font()
-            self.font_family_combo.blockSignals(True); self.font_family_combo.setCurrentText(font.family()); self.font_family_combo.blockSignals(False)
+            self.show_font_family(font.family())
             self.font_size_input.blockSignals(True); self.font_size_input.setValue(font.pointSize()); self.font_size_input.blockSignals(False)
             self.bold_btn.blockSignals(True); self.bold_btn.setChecked(font.bold()); self.bold_btn.blockSignals(False)
             self.italic_btn.blockSignals(True); self.italic_btn.setChecked(font.italic()); self.italic_btn.blockSignals(False)
@@ -296,27 +447,41 @@ class ProfessionalEditor(QMainWindow):
             fill_name = item.fill_color.name() if item.fill_color.alpha() > 0 else 'transparent'
             self.fill_color_btn.setStyleSheet(f"background-color: {fill_name};")
 
-    def change_property(self, prop, new_val, is_final=True):
-        item = self.get_selected()
-        if not item: return
-        if not is_final: item.set_property(prop, new_val); return
-        old_val=None
-        if prop=='size':old_val=item.font().pointSize()
-        elif prop=='family':old_val=item.font().family()
-        elif prop=='bold':old_val=item.font().bold()
-        elif prop=='italic':old_val=item.font().italic()
-        elif prop=='underline':old_val=item.font().underline()
-        elif prop=='stroke_width':old_val=item.stroke_width
-        if old_val is not None and old_val != new_val: self.add_command(PropertyChangeCommand(item,prop,old_val,new_val))
+    def property_targets(self, prop):
+        return [item for item in self.scene.selectedItems() if item.get_property(prop) is not None]
+
+    def change_property(self, prop, new_val, mergeable=False):
+        if not (items := self.property_targets(prop)): return
+        old_values = [item.get_property(prop) for item in items]
+        if any(old != new_val for old in old_values):
+            self.add_command(BatchPropertyCommand(self.scene, items, prop, old_values, new_val, mergeable=mergeable))
 
+    # --- Opacity slider: live previews are coalesced to one per frame, the drag becomes one undo entry ---
     def cache_opacity_change(self):
-        if(item:=self.get_selected()):setattr(item,'_old_opacity',item.opacity_val*100)
+        items = self.property_targets('opacity')
+        self._opacity_drag = (items, [item.get_property('opacity') for item in items])
+
+    def opacity_value_changed(self, value):
+        if self.opacity_slider.isSliderDown(): self.schedule_preview('opacity', value)
+        else: self.change_property('opacity', value, mergeable=True)
+
+    def schedule_preview(self, prop, value):
+        self._pending_preview = (prop, value)
+        if not self.preview_timer.isActive(): self.preview_timer.start()
+
+    def flush_preview(self):
+        if not (pending := self._pending_preview): return
+        self._pending_preview = None
+        prop, value = pending
+        for item in self._opacity_drag[0] if self._opacity_drag else (): item.set_property(prop, value)
 
     def finalize_opacity_change(self):
-        if(item:=self.get_selected()) and hasattr(item,'_old_opacity'):
-            new_opacity=item.opacity_val*100
-            if item._old_opacity!=new_opacity:self.add_command(PropertyChangeCommand(item,'opacity',item._old_opacity,new_opacity))
-            delattr(item,'_old_opacity')
+        self.preview_timer.stop(); self._pending_preview = None
+        if not self._opacity_drag: return
+        items, old_values = self._opacity_drag; self._opacity_drag = None
+        new_opacity = self.opacity_slider.value()
+        if items and any(old != new_opacity for old in old_values):
+            self.add_command(BatchPropertyCommand(self.scene, items, 'opacity', old_values, new_opacity))
 
     def change_color_property(self,prop_name):
         if not(item:=self.get_selected()):return
@@ -351,46 +516,30 @@ class ProfessionalEditor(QMainWindow):
         self.bring_to_front_action.setEnabled(has_selection); self.send_to_back_action.setEnabled(has_selection)
         self.bring_forward_action.setEnabled(has_selection); self.send_backward_action.setEnabled(has_selection)
 
-    def bring_to_front(self):
-        if not (items := self.scene.selectedItems()): return
-        self.z_counter += 1
-        for item in items: self.add_command(PropertyChangeCommand(item, 'zValue', item.zValue(), self.z_counter))
-    def send_to_back(self):
-        if not (items := self.scene.selectedItems()): return
-        min_z = min((i.zValue() for i in self.scene.items()), default=0)
-        for item in items: self.add_command(PropertyChangeCommand(item, 'zValue', item.zValue(), min_z - 1))
-    def bring_forward(self):
-        if not (item := self.get_selected()): return
-        sorted_items = sorted(self.scene.items(), key=lambda i: i.zValue())
-        try:
-            idx = sorted_items.index(item)
-            if idx < len(sorted_items) - 1:
-                new_z = sorted_items[idx + 1].zValue() + 0.01; self.add_command(PropertyChangeCommand(item, 'zValue', item.zValue(), new_z))
-        except ValueError: pass
-    def send_backward(self):
-        if not (item := self.get_selected()): return
-        sorted_items = sorted(self.scene.items(), key=lambda i: i.zValue())
-        try:
-            idx = sorted_items.index(item)
-            if idx > 0:
-                new_z = sorted_items[idx - 1].zValue() - 0.01; self.add_command(PropertyChangeCommand(item, 'zValue', item.zValue(), new_z))
-        except ValueError: pass
+    def reorder_selection(self, plan, text):
+        # Only top-level items take part; children keep their order inside their group
+        if not (items := [i for i in self.scene.selectedItems() if i.parentItem() is None]): return
+        if (changes := plan(self.scene.z_index, items)): self.add_command(ZOrderCommand(self.scene, changes, text))
+    def bring_to_front(self): self.reorder_selection(z_order.bring_to_front, "Bring to Front")
+    def send_to_back(self): self.reorder_selection(z_order.send_to_back, "Send to Back")
+    def bring_forward(self): self.reorder_selection(z_order.bring_forward, "Bring Forward")
+    def send_backward(self): self.reorder_selection(z_order.send_backward, "Send Backward")
     def toggle_lock_selected(self):
         if(items:=self.scene.selectedItems()):
             target_lock_state = not items[0].locked
-            for item in items: self.add_command(PropertyChangeCommand(item,'locked',item.locked, target_lock_state))
+            self.add_command(BatchPropertyCommand(self.scene, items, 'locked', [item.locked for item in items], target_lock_state))
     def set_zoom_level(self, scale):
         current_scale = self.view.transform().m11()
         if abs(current_scale) < 1e-9: return
-        factor = scale / current_scale; self.view.scale(factor, factor); self.update_zoom_display()
+        factor = scale / current_scale; self.view.zoom_by(factor); self.update_zoom_display()
     def zoom_in(self):
         current_scale=self.view.transform().m11();next_level=next((l for l in self.zoom_levels if l>current_scale+0.01),None)
         if next_level:self.set_zoom_level(next_level)
-        else:self.view.scale(1.2,1.2);self.update_zoom_display()
+        else:self.view.zoom_by(1.2);self.update_zoom_display()
     def zoom_out(self):
         current_scale=self.view.transform().m11();prev_level=next((l for l in reversed(self.zoom_levels) if l<current_scale-0.01),None)
         if prev_level:self.set_zoom_level(prev_level)
-        else:self.view.scale(1/1.2,1.2);self.update_zoom_display()
+        else:self.view.zoom_by(1/1.2);self.update_zoom_display()
     def reset_zoom(self): self.set_zoom_level(1.0)
     def update_zoom_display(self):
         scale=self.view.transform().m11()
@@ -409,19 +558,192 @@ class ProfessionalEditor(QMainWindow):
     def keyReleaseEvent(self,event):
         if not event.isAutoRepeat() and event.key()==Qt.Key_Space and hasattr(self,'_last_tool'): self.set_tool(self._last_tool)
     def import_image(self):
-        path,_=QFileDialog.getOpenFileName(self,"Import Image","","Images (*.png *.jpg *.jpeg)")
-        if path:
-            pixmap=QPixmap(path)
-            if pixmap.isNull(): return
-            item=ImageItem(pixmap);self.add_command(AddCommand(self.scene,item));item_bounds=item.sceneBoundingRect()
-            padded_bounds=item_bounds.adjusted(-item_bounds.width()*0.05,-item_bounds.height()*0.05,item_bounds.width()*0.05,item_bounds.height()*0.05)
-            self.view.fitInView(padded_bounds,Qt.KeepAspectRatio);self.update_zoom_display()
+        paths,_=QFileDialog.getOpenFileNames(self,"Import Images","",image_file_filter())
+        if paths: self.import_image_files(paths)
+    def import_image_folder(self):
+        directory=QFileDialog.getExistingDirectory(self,"Import Image Folder")
+        if not directory: return
+        if not (paths:=image_files_in(directory)): QMessageBox.information(self, "Import Folder", f"No images found in {directory}."); return
+        self.import_image_files(paths)
+    def import_image_files(self, paths):
+        # Headers are read up front so placeholders can be laid out at their final size;
+        # the decodes then run in parallel on the thread pool and fill the grid in as they finish
+        items, errors = self.image_loader.load_many(paths, self.max_image_dimension)
+        self.import_errors.extend(f"{path}: {error}" for path, error in errors)
+        if not items: self.report_import_errors(); return
+        offsets = shelf_layout([item.boundingRect().size() for item in items])
+        block = QRectF()
+        for offset, item in zip(offsets, items): block = block.united(QRectF(offset, item.boundingRect().size()))
+        origin = self.view.mapToScene(self.view.viewport().rect().center()) - block.center()
+        for item, offset in zip(items, offsets): item.setPos(origin + offset)
+        text = "Add Image" if len(items) == 1 else f"Import {len(items)} Images"
+        with self.transaction():
+            self.scene.clearSelection()
+            cmd = QUndoCommand(text); [AddCommand(self.scene, item, parent=cmd) for item in items]; self.add_command(cmd)
+            for item in items: item.setSelected(True)
+        bounds = block.translated(origin)
+        self.view.fitInView(bounds.adjusted(-bounds.width()*0.05,-bounds.height()*0.05,bounds.width()*0.05,bounds.height()*0.05),Qt.KeepAspectRatio);self.update_zoom_display()
+        if not self.image_loader.is_loading(): self.report_import_errors()
+    def image_load_failed(self, item, message):
+        self.import_errors.append(message)
+    def report_import_errors(self):
+        if not self.import_errors: return
+        errors, self.import_errors = self.import_errors, []
+        listed = "\n".join(errors[:10]) + (f"\n... and {len(errors) - 10} more" if len(errors) > 10 else "")
+        QMessageBox.warning(self, "Import Images", f"{len(errors)} image(s) could not be imported:\n{listed}")
+    def set_image_size_limit(self):
+        limit, ok = QInputDialog.getInt(self, "Imported Image Size", "Longest side in pixels (0 keeps full resolution):", self.max_image_dimension, 0, 65536, 512)
+        if ok: self.max_image_dimension = limit
     def save_image(self):
         bounds = self.scene.itemsBoundingRect()
         if not bounds.isValid(): return
         path, _ = QFileDialog.getSaveFileName(self, "Save Image", "untitled.png", "PNG (*.png)")
         if not path: return
-        self.scene.clearSelection();image = QImage(bounds.size().toSize(), QImage.Format_ARGB32_Premultiplied);image.fill(Qt.transparent)
-        painter=QPainter(image);painter.setRenderHint(QPainter.Antialiasing);self.scene.render(painter,QRectF(image.rect()),bounds);painter.end();image.save(path)
+        scale, ok = QInputDialog.getDouble(self, "Export Scale", "Scale factor:", 1.0, 0.1, 16.0, 2)
+        if not ok: return
+        # The document is captured once here; the tiles are rendered from that snapshot on the thread pool
+        snapshot = display_list.snapshot(self.scene, bounds, scale)
+        if not snapshot.thread_safe(): self.export_on_gui_thread(snapshot, bounds, path, scale); return
+        export = exporter.BackgroundExport(snapshot, bounds, path, scale, parent=self); self.exports.add(export)
+        progress = QProgressDialog(f"Exporting {os.path.basename(path)}...", "Cancel", 0, 0, self); progress.setWindowModality(Qt.NonModal); progress.setMinimumDuration(500)
+        def on_progress(done, total): progress.setMaximum(total); progress.setValue(done)
+        def on_failed(message): QMessageBox.warning(self, "Save Image", f"Could not save {path}:\n{message}")
+        def on_done(*_):
+            progress.canceled.disconnect(export.cancel); progress.close(); progress.deleteLater()
+            self.exports.discard(export); export.deleteLater()
+        export.progress.connect(on_progress); progress.canceled.connect(export.cancel)
+        export.failed.connect(on_failed)
+        for signal in (export.finished, export.failed, export.cancelled): signal.connect(on_done)
+        export.start()
+    def export_on_gui_thread(self, snapshot, bounds, path, scale):
+        progress = QProgressDialog("Exporting image...", "Cancel", 0, 0, self); progress.setWindowModality(Qt.WindowModal); progress.setMinimumDuration(500)
+        def on_tile(done, total):
+            progress.setMaximum(total); progress.setValue(done); QApplication.processEvents()
+            return not progress.wasCanceled()
+        try:
+            exporter.export_png(self.scene, bounds, path, scale=scale, progress=on_tile, render_tile=exporter.display_list_renderer(snapshot))
+        except exporter.ExportCancelled:
+            pass
+        except OSError as e:
+            QMessageBox.warning(self, "Save Image", f"Could not save {path}:\n{e}")
+        finally:
+            progress.close()
+    def set_lod_enabled(self, enabled):
+        lod_settings.enabled = enabled; self.scene.update()
+    def set_progressive_enabled(self, enabled):
+        progressive_settings.enabled = enabled
+        if not enabled: self.view.gesture.refine()
+    def set_refine_delay(self):
+        delay, ok = QInputDialog.getInt(self, "Draft Refine Delay", "Milliseconds without zooming or panning before full-quality redraw:", progressive_settings.refine_delay_ms, 0, 5000, 50)
+        if ok: progressive_settings.refine_delay_ms = delay
+    def set_render_cache_enabled(self, enabled):
+        render_cache.set_enabled(enabled); self.scene.update()
+    def show_render_cache_stats(self):
+        st = render_cache.stats()
+        QMessageBox.information(self, "Render Cache", f"Entries: {st['entries']}\nMemory: {st['bytes'] / 2**20:.1f} of {st['budget'] / 2**20:.0f} MB\nHits: {st['hits']}\nMisses: {st['misses']}\nEvictions: {st['evictions']}")
+    def set_index_mode(self, mode):
+        self.scene.set_index_mode(mode, self.scene.bsp_depth); self.bsp_depth_action.setEnabled(mode == 'bsp')
+    def set_bsp_depth(self):
+        depth, ok = QInputDialog.getInt(self, "BSP Tree Depth", "Depth (0 picks one from the item count):", self.scene.bsp_depth, 0, 32)
+        if ok: self.scene.set_index_mode('bsp', depth)
+    def show_image_store_stats(self):
+        st = image_store.stats()
+        shared = sorted(st['refcounts'].values(), reverse=True)[:5]
+        QMessageBox.information(self, "Image Store", f"Distinct images: {st['images']}\nMemory: {st['bytes'] / 2**20:.1f} MB\nPlacements: {st['references']}\nMost placed: {', '.join(map(str, shared)) or '-'}\nSpilled to disk: {st['spilled']}")
+    def set_instrumentation_enabled(self, enabled):
+        profiler.set_enabled(enabled, self.undo_stack); self.view.viewport().update()
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Performance Trace", "trace.json", "Chrome Trace (*.json)")
+        if not path: return
+        try:
+            profiler.export_trace(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Performance Trace", f"Could not save {path}:\n{e}")
+    def set_undo_budget(self):
+        budget_mb, ok = QInputDialog.getInt(self, "Undo Memory Limit", "Memory kept for undo history (MB):", self.undo_history.budget // 2**20, 16, 65536)
+        if ok: self.undo_history.set_budget(budget_mb * 2**20)
+    def show_undo_stats(self):
+        st = self.undo_history.stats()
+        QMessageBox.information(self, "Undo History", f"Commands: {st['commands']}\nIn memory: {st['held_bytes'] / 2**20:.1f} of {st['budget'] / 2**20:.0f} MB\nSpilled to disk: {st['spilled_items']} items, {st['spilled_bytes'] / 2**20:.1f} MB\nJournal size: {st['journal_bytes'] / 2**20:.1f} MB")
+    def clear_document(self):
+        # Queued decodes would deliver into placeholders the clear deletes
+        self.image_loader.cancel(); self.import_errors.clear()
+        self.scene.clearSelection(); self.undo_stack.clear(); self.scene.clear()
+    def open_document(self):
+        if not self.undo_stack.isClean() and QMessageBox.question(self, "Open Document", "Discard unsaved changes?") != QMessageBox.Yes: return
+        path, _ = QFileDialog.getOpenFileName(self, "Open Document", "", document_io.FILE_FILTER)
+        if not path: return
+        progress = QProgressDialog("Loading document...", None, 0, 0, self); progress.setWindowModality(Qt.WindowModal); progress.setMinimumDuration(500)
+        def on_batch(loaded, total):
+            progress.setMaximum(total); progress.setValue(loaded); QApplication.processEvents()
+        with self.transaction():
+            self.clear_document()
+            try:
+                document_io.load_document(self.scene, path, on_batch=on_batch)
+            except document_io.DocumentError as e:
+                # The previous document is already gone from the scene; Save must not write what is left over its file
+                progress.close(); self.scene.rebuild_index(); self.scene.changes.reset(); self.document_path = None; self.undo_stack.resetClean(); self.schedule_refresh()
+                QMessageBox.warning(self, "Open Document", f"Could not open {path}:\n{e}"); return
+            progress.close()
+            # One bulk load for the R-tree, and room in the scene rect for everything loaded
+            self.scene.rebuild_index(); self.scene.setSceneRect(self.scene.sceneRect().united(self.scene.itemsBoundingRect().adjusted(-1000, -1000, 1000, 1000)))
+            self.document_path = path; self.undo_stack.setClean(); self.schedule_refresh()
+            if self.session_journal: self.session_journal.checkpoint(path, self.scene)
+    def save_document(self):
+        if not self.document_path: self.save_document_as(); return
+        if self.image_loader.is_loading():
+            # Images still decoding have nothing to save yet
+            progress = QProgressDialog("Waiting for images to finish loading...", None, 0, 0, self); progress.setWindowModality(Qt.WindowModal); progress.setMinimumDuration(500)
+            try: self.image_loader.finish()
+            finally: progress.close()
+        try:
+            document_io.save_document(self.scene, self.document_path); self.undo_stack.setClean()
+        except document_io.DocumentError as e:
+            QMessageBox.warning(self, "Save Document", f"Could not save {self.document_path}:\n{e}"); return
+        if self.session_journal: self.session_journal.checkpoint(self.document_path, self.scene)
+    def save_document_as(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Document", self.document_path or "untitled.gedoc", document_io.FILE_FILTER)
+        if path: self.document_path = path; self.save_document()
+    # --- Session journal ---
+    def start_session_journal(self, directory=None):
+        """Journal every change from now on, first offering to recover a session that did not end cleanly."""
+        orphans = session_journal.orphaned_journals(directory)
+        for _, lock in orphans[1:]: lock.unlock()     # offered again next time
+        try:
+            if orphans and QMessageBox.question(self, "Recover Session", "The editor did not close normally last time.\nRecover the unsaved changes?") == QMessageBox.Yes:
+                self.session_journal = self.recover_session(*orphans[0])
+            else:
+                if orphans: session_journal.discard_journal(*orphans[0])
+                self.session_journal = session_journal.SessionJournal.create(directory, parent=self)
+                self.session_journal.checkpoint(self.document_path or '', self.scene)
+        except (OSError, document_io.DocumentError) as e:
+            QMessageBox.warning(self, "Session Journal", f"Changes in this session cannot be recovered after a crash:\n{e}"); return
+        self.session_journal.failed.connect(self.session_journal_failed)
+        self.session_journal.attach(self.undo_stack)
+    def recover_session(self, path, lock):
+        progress = QProgressDialog("Recovering session...", None, 0, 0, self); progress.setWindowModality(Qt.WindowModal); progress.setMinimumDuration(500)
+        def on_batch(loaded, total):
+            progress.setMaximum(total); progress.setValue(loaded); QApplication.processEvents()
+        with self.transaction():
+            self.clear_document()
+            try:
+                base, failed, end = session_journal.replay(self.scene, path, on_batch=on_batch)
+            finally:
+                progress.close()
+            self.scene.rebuild_index(); self.scene.setSceneRect(self.scene.sceneRect().united(self.scene.itemsBoundingRect().adjusted(-1000, -1000, 1000, 1000)))
+            # The recovered changes are not in any file yet
+            self.document_path = base or None; self.undo_stack.resetClean(); self.schedule_refresh()
+        if failed: QMessageBox.warning(self, "Recover Session", f"{failed} item(s) could not be recovered.")
+        return session_journal.SessionJournal.resume(path, lock, end, self.scene, parent=self)
+    def session_journal_failed(self, message):
+        QMessageBox.warning(self, "Session Journal", f"Changes are no longer journaled and cannot be recovered after a crash:\n{message}")
+    def closeEvent(self, event):
+        # Decodes and exports report through QObjects owned by this window; none may still run once it is gone
+        self.image_loader.cancel()
+        for export in self.exports: export.cancel()
+        for pool in {self.image_loader.pool, *(export.pool for export in self.exports)}: pool.waitForDone()
+        # Kept when there are unsaved changes, so the next start offers them back
+        if self.session_journal: self.session_journal.close(discard=self.undo_stack.isClean()); self.session_journal = None
+        super().closeEvent(event)
     def delete_selection(self):
-        if(items:=self.scene.selectedItems()): self.add_command(DeleteCommand(self.scene,items))
\ No newline at end of file
+        if(items:=self.scene.selectedItems()): self.push_transaction(DeleteCommand(self.scene,items))
\ No newline at end of file
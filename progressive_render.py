@@ -0,0 +1,75 @@
+# progressive_render.py
+import math
+from PyQt5.QtGui import QPainter, QPaintEvent, QRegion
+from PyQt5.QtCore import QObject, QTimer, QRect, QRectF, QPointF, QSizeF
+
+# Hints dropped while a gesture is in progress
+DRAFT_HINTS_OFF = QPainter.Antialiasing | QPainter.SmoothPixmapTransform | QPainter.TextAntialiasing
+
+class ProgressiveSettings:
+    """Draft rendering of zoom and pan gestures, refined once input goes idle."""
+    def __init__(self):
+        self.enabled = True
+        self.refine_delay_ms = 150   # idle time after the last zoom or pan step before the full-quality pass
+
+progressive_settings = ProgressiveSettings()
+
+def _inner_rect(rect):
+    """The device pixels rect covers completely."""
+    left, top = math.ceil(rect.left()), math.ceil(rect.top())
+    return QRect(left, top, max(math.floor(rect.right()) - left, 0), max(math.floor(rect.bottom()) - top, 0))
+
+class GestureRenderer(QObject):
+    """Interactive zoom and pan for one view.
+
+    The first zoom step of a gesture grabs the viewport as it is; until input
+    has been idle for refine_delay_ms every frame scales that snapshot to the
+    current transform instead of repainting the items under it. Only areas
+    the snapshot does not cover, such as the border uncovered by zooming out
+    or the strip scrolled into view by a pan, are painted live, with
+    antialiasing and smooth scaling turned off. Pans do not need a snapshot:
+    the view scrolls the pixels already on screen. When the timer fires the
+    snapshot is dropped and the whole viewport is repainted at full quality.
+    """
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.active = False
+        self.snapshot, self.snapshot_transform = None, None
+        self.hints, self.grabbing = None, False
+        self.refine_timer = QTimer(self, singleShot=True, timeout=self.refine)
+
+    def step(self, zoom):
+        """Note one zoom or pan step; call before the view's transform or scroll position changes."""
+        if not progressive_settings.enabled: return
+        if zoom and self.snapshot is None:
+            # Taken before the hints drop, so the steps that follow scale a full-quality frame
+            self.grabbing = True
+            try: self.snapshot = self.view.viewport().grab()
+            finally: self.grabbing = False
+            self.snapshot_transform = self.view.viewportTransform()
+        if not self.active:
+            self.active, self.hints = True, self.view.renderHints()
+            self.view.setRenderHints(self.hints & ~DRAFT_HINTS_OFF)
+        self.refine_timer.start(progressive_settings.refine_delay_ms)
+
+    def refine(self):
+        """End the gesture now and repaint at full quality."""
+        self.refine_timer.stop()
+        if not self.active: return
+        self.active, self.snapshot, self.snapshot_transform = False, None, None
+        self.view.setRenderHints(self.hints); self.hints = None
+        self.view.viewport().update()
+
+    def paint(self, event, paint_event):
+        """Paint one draft frame: the scaled snapshot plus whatever it does not cover."""
+        if self.snapshot is None: paint_event(event); return
+        to_view = self.snapshot_transform.inverted()[0] * self.view.viewportTransform()
+        size = QSizeF(self.snapshot.size()) / self.snapshot.devicePixelRatio()
+        covered = _inner_rect(to_view.mapRect(QRectF(QPointF(0, 0), size)))
+        exposed = event.region().subtracted(QRegion(covered))
+        if not exposed.isEmpty(): paint_event(QPaintEvent(exposed))
+        painter = QPainter(self.view.viewport())
+        painter.setClipRegion(event.region().intersected(QRegion(covered)))
+        painter.setTransform(to_view); painter.drawPixmap(QPointF(0, 0), self.snapshot)
+        painter.end()
@@ -0,0 +1,96 @@
+# render_cache.py
+import itertools
+import math
+from collections import OrderedDict
+from PyQt5.QtWidgets import QStyle, QStyleOptionGraphicsItem
+from PyQt5.QtGui import QPixmap, QPainter
+from PyQt5.QtCore import Qt, QRectF
+
+DEFAULT_BUDGET_MB = 128
+# Zoom levels are bucketed in quarter octaves so small zoom changes reuse entries
+BUCKETS_PER_OCTAVE = 4
+
+_tokens = itertools.count(1)
+
+class RenderCache:
+    """Process-wide LRU of rendered item pixmaps, keyed on item and zoom bucket.
+    Items opt in by calling paint_cached() from paint() and invalidate() whenever
+    their appearance changes; entries for dead items simply age out."""
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.enabled = False
+        self.budget = budget_bytes
+        self.entries = OrderedDict()   # (token, bucket) -> (pixmap, cost)
+        self.by_token = {}             # token -> set of keys
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled: self.clear()
+
+    def set_budget(self, budget_bytes):
+        self.budget = budget_bytes; self._evict()
+
+    def clear(self):
+        self.entries.clear(); self.by_token.clear(); self.size = 0
+
+    def reset_counters(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size, 'budget': self.budget, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def invalidate(self, item):
+        token = getattr(item, '_render_token', None)
+        for key in self.by_token.pop(token, ()):
+            _, cost = self.entries.pop(key); self.size -= cost
+
+    def _insert(self, key, pixmap, cost):
+        self.entries[key] = (pixmap, cost); self.by_token.setdefault(key[0], set()).add(key)
+        self.size += cost; self._evict()
+
+    def _evict(self):
+        while self.size > self.budget and self.entries:
+            key, (_, cost) = self.entries.popitem(last=False)
+            self.size -= cost; self.evictions += 1
+            keys = self.by_token.get(key[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys: del self.by_token[key[0]]
+
+    def paint_cached(self, item, painter, option, widget, paint_content, max_scale=None):
+        """Draw item through the cache. paint_content(painter, option, widget) must
+        draw everything except selection decoration at full opacity. Returns False
+        when the item should be painted directly instead."""
+        if not self.enabled: return False
+        rect = item.boundingRect()
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod <= 0 or rect.isEmpty(): return False
+        bucket = round(math.log2(lod) * BUCKETS_PER_OCTAVE)
+        scale = 2 ** (bucket / BUCKETS_PER_OCTAVE)
+        if max_scale is not None and scale > max_scale: return False
+        width, height = math.ceil(rect.width() * scale), math.ceil(rect.height() * scale)
+        cost = width * height * 4
+        if cost == 0 or cost > self.budget // 8: return False
+
+        token = getattr(item, '_render_token', None)
+        if token is None: token = item._render_token = next(_tokens)
+        key = (token, bucket)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1; self.entries.move_to_end(key); pixmap = entry[0]
+        else:
+            self.misses += 1
+            pixmap = QPixmap(width, height); pixmap.fill(Qt.transparent)
+            cache_painter = QPainter(pixmap)
+            cache_painter.setRenderHints(painter.renderHints() | QPainter.SmoothPixmapTransform)
+            cache_painter.scale(scale, scale); cache_painter.translate(-rect.topLeft())
+            content_option = QStyleOptionGraphicsItem(option)
+            content_option.exposedRect = rect; content_option.state &= ~QStyle.State_Selected
+            paint_content(cache_painter, content_option, widget); cache_painter.end()
+            self._insert(key, pixmap, cost)
+        painter.save(); painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(rect, pixmap, QRectF(pixmap.rect())); painter.restore()
+        return True
+
+render_cache = RenderCache()
@@ -0,0 +1,309 @@
+# session_journal.py
+import os
+import struct
+import threading
+import time
+import zlib
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import QObject, QByteArray, QLockFile, QStandardPaths, pyqtSignal
+
+from document_io import DocumentError, encode_item, decode_item, item_uid, is_document_item, image_ids, top_level_items, load_document
+from image_store import image_store, encode_image, decode_image
+from undo_history import held_items
+
+# File layout: MAGIC, journal version, then records. Every record is a
+# 4-byte tag, the payload length and the payload's CRC-32, followed by the
+# payload; replay stops at the first record that is cut short or fails its
+# check, which is where a crash interrupted a write.
+#   BASE  the document file the session started from ('' for a new one);
+#         everything journaled before it no longer applies
+#   IMG   an image store id and its pixels, written before the first item using it
+#   TXN   one undo stack step: a sequence of ops, each an op code, an item
+#         uid and a length-prefixed encode_item() payload (empty for deletes)
+MAGIC = b'GEJRNL'
+JOURNAL_VERSION = 1
+SUFFIX = '.gejournal'
+HEADER = struct.Struct('<H')
+RECORD = struct.Struct('<4sII')
+OP = struct.Struct('<BQI')
+IMAGE_ID = struct.Struct('<H')
+
+TAG_BASE = b'BASE'
+TAG_IMAGE = b'IMG '
+TAG_TXN = b'TXN '
+OP_PUT, OP_DELETE = 1, 2
+
+# Compaction runs once the journal has grown past both of these
+COMPACT_MIN_BYTES = 16 * 2**20
+COMPACT_GROWTH = 2.0            # times its size after the last checkpoint or compaction
+COMPACT_OPS_PER_RECORD = 1000
+
+def journal_directory():
+    base = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation) or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'sessions')
+
+def _lock_for(path):
+    lock = QLockFile(path + '.lock')
+    # Only a dead owner makes a lock stale; a long session must keep its journal
+    lock.setStaleLockTime(0)
+    return lock
+
+def _record(tag, payload): return RECORD.pack(tag, len(payload), zlib.crc32(payload)) + payload
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC: raise DocumentError("Not a session journal")
+    version, = HEADER.unpack(f.read(HEADER.size))
+    if version > JOURNAL_VERSION: raise DocumentError(f"Unsupported journal version {version}")
+
+def _records(f):
+    """Yield (payload offset, tag, payload) for each intact record from the current position."""
+    while len(header := f.read(RECORD.size)) == RECORD.size:
+        tag, length, crc = RECORD.unpack(header)
+        offset = f.tell(); payload = f.read(length)
+        if len(payload) != length or zlib.crc32(payload) != crc: return
+        yield offset, tag, payload
+
+def _ops(payload):
+    """Yield (op, uid, start, length) for each op in a TXN payload."""
+    position = 0
+    while position < len(payload):
+        op, uid, length = OP.unpack_from(payload, position); position += OP.size
+        yield op, uid, position, length
+        position += length
+
+def _image_id(payload):
+    length, = IMAGE_ID.unpack_from(payload)
+    return payload[IMAGE_ID.size:IMAGE_ID.size + length].decode(), IMAGE_ID.size + length
+
+def read_journal(path):
+    """The session a journal describes: (base document path, {image id: encoded
+    pixels}, {uid: encode_item() bytes, or None once deleted}, end of the intact part)."""
+    base, images, state = '', {}, {}
+    with open(path, 'rb') as f:
+        _read_header(f)
+        end = f.tell()
+        for offset, tag, payload in _records(f):
+            if tag == TAG_BASE: base, images, state = payload.decode(), {}, {}
+            elif tag == TAG_IMAGE:
+                image_id, start = _image_id(payload); images[image_id] = payload[start:]
+            elif tag == TAG_TXN:
+                for op, uid, start, length in _ops(payload): state[uid] = payload[start:start + length] if op == OP_PUT else None
+            end = offset + len(payload)
+    return base, images, state, end
+
+def replay(scene, path, on_batch=None):
+    """Rebuild a journaled session in scene, bypassing the undo stack: load its
+    base document, then apply the last journaled state of every item.
+    Returns (base path, items that could not be restored, end of the intact journal)."""
+    base, images, state, end = read_journal(path)
+    top = {}
+    if base:
+        try: top = {item.doc_uid: item for item in load_document(scene, base, on_batch=on_batch)}
+        except DocumentError: base = ''    # gone or unreadable: keep what the journal itself holds
+    for image_id, data in images.items(): image_store.add(QPixmap.fromImage(decode_image(data)), image_id=image_id)
+    failed = 0
+    for uid, data in state.items():
+        if (old := top.pop(uid, None)) is not None: scene.removeItem(old)
+        if data is None: continue
+        try: item = decode_item(QByteArray(data))
+        except DocumentError: failed += 1; continue
+        scene.addItem(item); top[uid] = item
+    return base, failed, end
+
+def orphaned_journals(directory=None):
+    """(path, held lock) for every journal whose session is no longer running, newest first."""
+    directory = directory or journal_directory()
+    try: names = os.listdir(directory)
+    except OSError: return []
+    found = []
+    for name in names:
+        if not name.endswith(SUFFIX): continue
+        path = os.path.join(directory, name); lock = _lock_for(path)
+        if lock.tryLock(0): found.append((path, lock))
+    found.sort(key=lambda entry: os.path.getmtime(entry[0]), reverse=True)
+    return found
+
+def discard_journal(path, lock):
+    try: os.remove(path)
+    except OSError: pass
+    lock.unlock()
+
+class SessionJournal(QObject):
+    """Crash-safe record of an editing session.
+
+    After every undo stack step (push, undo, redo, merge) the items the step's
+    commands hold are journaled as they now are: a put of each one's top-level
+    item, or a delete of items that left the scene or the top level. The
+    records are encoded on the GUI thread and written by a background thread;
+    whatever queued up while it was writing goes out in one write and one
+    fsync. Saving or opening a document checkpoints the journal back to a
+    single BASE record, and in between the writer thread compacts it to one
+    record per item once it has doubled in size, so replay stays proportional
+    to the document rather than to the session's length.
+    """
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, lock, end=None, parent=None):
+        """Start journaling to path, whose lock the caller holds. With end, continue
+        an existing journal from there, dropping anything after it."""
+        super().__init__(parent)
+        self.path, self.lock = path, lock
+        self.stack, self._index = None, 0
+        self.images = set()             # image ids already journaled since the last BASE
+        self.records = self.commits = self.compactions = 0
+        self.error = None
+        if end is None:
+            self.file = open(path, 'w+b'); self.file.write(MAGIC + HEADER.pack(JOURNAL_VERSION))
+        else:
+            self.file = open(path, 'r+b'); self.file.truncate(end); self.file.seek(end)
+        self.compacted_size = self.file.tell()
+        self._pending, self._closing = [], False
+        self._queued = self._committed = 0     # entries handed to the writer, and those it has synced
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='session-journal', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def create(cls, directory=None, parent=None):
+        directory = directory or journal_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"session-{os.getpid()}-{time.time_ns()}{SUFFIX}")
+        lock = _lock_for(path)
+        if not lock.tryLock(0): raise OSError(f"Could not lock {path}")
+        return cls(path, lock, parent=parent)
+
+    @classmethod
+    def resume(cls, path, lock, end, scene, parent=None):
+        """Keep journaling to an orphaned journal once replay() has restored it into scene."""
+        journal = cls(path, lock, end=end, parent=parent)
+        journal.images = set(image_ids(top_level_items(scene)))
+        return journal
+
+    # --- Recording (GUI thread) ---
+    def attach(self, undo_stack):
+        self.stack, self._index = undo_stack, undo_stack.index()
+        undo_stack.indexChanged.connect(self._stack_changed)
+
+    def _stack_changed(self, index):
+        low, high = sorted((self._index, index))
+        # An unchanged index means the current command absorbed a merge
+        if low == high: low = max(index - 1, 0)
+        self._index = index
+        touched = []
+        for i in range(low, high):
+            if (command := self.stack.command(i)) is not None: touched.extend(held_items(command))
+        if touched: self.record(touched)
+
+    def record(self, items):
+        """Journal the current state of items as one transaction."""
+        puts, deletes = {}, set()
+        for item in items:
+            if not is_document_item(item): continue
+            if item.scene() is None: deletes.add(item_uid(item)); continue
+            top = item.topLevelItem()
+            if top is not item: deletes.add(item_uid(item))
+            if is_document_item(top): puts[item_uid(top)] = top
+        if not puts and not deletes: return
+        entries = []
+        for image_id in image_ids(list(puts.values())):
+            if image_id in self.images: continue
+            # Compressed by the writer thread; toImage() shares the pixmap's pixels
+            self.images.add(image_id); entries.append((TAG_IMAGE, image_id, image_store.pixmap(image_id).toImage()))
+        ops = [OP.pack(OP_DELETE, uid, 0) for uid in deletes - puts.keys()]
+        for uid, item in puts.items():
+            data = bytes(encode_item(item)); ops.append(OP.pack(OP_PUT, uid, len(data)) + data)
+        entries.append((TAG_TXN, b''.join(ops)))
+        self._enqueue(entries)
+
+    def checkpoint(self, path, scene):
+        """The session now equals the document at path ('' for an empty one)."""
+        self.images = set(image_ids(top_level_items(scene))) if path else set()
+        self._enqueue([(TAG_BASE, path)])
+
+    def _enqueue(self, entries):
+        if self.error is not None: return
+        with self._condition:
+            self._pending.extend(entries); self._queued += len(entries); self._condition.notify_all()
+
+    # --- Writing (journal thread) ---
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing: self._condition.wait()
+                if not self._pending: return
+                batch, self._pending = self._pending, []
+            try:
+                for entry in batch: self._write(entry)
+                self.file.flush(); os.fsync(self.file.fileno()); self.commits += 1
+                size = self.file.tell()
+                if size > COMPACT_MIN_BYTES and size > self.compacted_size * COMPACT_GROWTH: self._compact()
+            except OSError as e:
+                self.error = str(e); self.failed.emit(self.error)
+                with self._condition: self._condition.notify_all()
+                return
+            with self._condition:
+                self._committed += len(batch); self._condition.notify_all()
+
+    def _write(self, entry):
+        tag = entry[0]
+        if tag == TAG_BASE:
+            self.file.seek(0); self.file.truncate()
+            self.file.write(MAGIC + HEADER.pack(JOURNAL_VERSION) + _record(TAG_BASE, entry[1].encode()))
+            self.compacted_size = self.file.tell()
+        elif tag == TAG_IMAGE:
+            image_id = entry[1].encode()
+            self.file.write(_record(TAG_IMAGE, IMAGE_ID.pack(len(image_id)) + image_id + encode_image(entry[2])))
+        else:
+            self.file.write(_record(tag, entry[1]))
+        self.records += 1
+
+    def _compact(self):
+        """Rewrite the journal as its base, its images and the last state of each item, then swap it in."""
+        self.file.flush(); self.file.seek(0)
+        _read_header(self.file)
+        base, images, state = b'', {}, {}
+        for offset, tag, payload in _records(self.file):
+            if tag == TAG_BASE: base, images, state = payload, {}, {}
+            elif tag == TAG_IMAGE: images[_image_id(payload)[0]] = (offset, len(payload))
+            elif tag == TAG_TXN:
+                for op, uid, start, length in _ops(payload): state[uid] = (offset + start, length) if op == OP_PUT else None
+        partial = self.path + '.compact'
+        with open(partial, 'wb') as out:
+            out.write(MAGIC + HEADER.pack(JOURNAL_VERSION) + _record(TAG_BASE, base))
+            for offset, length in images.values():
+                self.file.seek(offset); out.write(_record(TAG_IMAGE, self.file.read(length)))
+            ops = []
+            for uid, where in state.items():
+                if where is None:
+                    # Without a base document a delete has nothing left to remove
+                    if base: ops.append(OP.pack(OP_DELETE, uid, 0))
+                else:
+                    self.file.seek(where[0]); ops.append(OP.pack(OP_PUT, uid, where[1]) + self.file.read(where[1]))
+                if len(ops) >= COMPACT_OPS_PER_RECORD: out.write(_record(TAG_TXN, b''.join(ops))); ops = []
+            if ops: out.write(_record(TAG_TXN, b''.join(ops)))
+            out.flush(); os.fsync(out.fileno())
+        self.file.close()
+        os.replace(partial, self.path)
+        self.file = open(self.path, 'r+b'); self.file.seek(0, os.SEEK_END)
+        self.compacted_size = self.file.tell(); self.compactions += 1
+
+    # --- Shutdown ---
+    def flush(self):
+        """Wait until everything recorded so far is on disk."""
+        with self._condition:
+            target = self._queued
+            self._condition.wait_for(lambda: self._committed >= target or self.error is not None)
+
+    def close(self, discard):
+        """Stop journaling; discard deletes the journal, as after a clean exit with nothing unsaved."""
+        if self.stack is not None: self.stack.indexChanged.disconnect(self._stack_changed); self.stack = None
+        with self._condition:
+            self._closing = True; self._condition.notify()
+        self._thread.join()
+        self.file.close()
+        if discard: discard_journal(self.path, self.lock)
+        else: self.lock.unlock()
+
+    def stats(self):
+        return {'path': self.path, 'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                'records': self.records, 'commits': self.commits, 'compactions': self.compactions, 'error': self.error}
@@ -0,0 +1,97 @@
+# spatial_index.py
+import math
+
+def _bounds(item):
+    r = item.sceneBoundingRect()
+    return (r.left(), r.top(), r.right(), r.bottom())
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+class RTree:
+    """Static R-tree over (box, item) pairs, bulk loaded with Sort-Tile-Recursive
+    packing. Boxes are (left, top, right, bottom) tuples in scene coordinates."""
+    NODE_CAPACITY = 16
+
+    def __init__(self, entries):
+        self.size = len(entries)
+        # A node is (box, children, is_leaf); leaf children are (box, item) pairs
+        level, leaf = list(entries), True
+        while True:
+            level = [(_union([c[0] for c in group]), group, leaf) for group in self._tile(level)]
+            leaf = False
+            if len(level) <= 1: break
+        self.root = level[0] if level else None
+
+    def _tile(self, entries):
+        cap = self.NODE_CAPACITY
+        if not entries: return []
+        slices = max(1, math.ceil(math.sqrt(math.ceil(len(entries) / cap))))
+        per_slice = slices * cap
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        groups = []
+        for s in range(0, len(entries), per_slice):
+            column = sorted(entries[s:s + per_slice], key=lambda e: e[0][1] + e[0][3])
+            groups.extend(column[i:i + cap] for i in range(0, len(column), cap))
+        return groups
+
+    def query(self, left, top, right, bottom):
+        """Items whose box intersects the query box."""
+        if self.root is None: return []
+        hits, stack = [], [self.root]
+        while stack:
+            _, children, leaf = stack.pop()
+            for child in children:
+                box = child[0]
+                if box[0] > right or box[2] < left or box[1] > bottom or box[3] < top: continue
+                if leaf: hits.append(child[1])
+                else: stack.append(child)
+        return hits
+
+class ItemIndex:
+    """R-tree index of a scene's top-level items.
+
+    The tree is rebuilt in one bulk load; items added, moved or reshaped since
+    then sit in a small overflow set that queries scan linearly, and the tree
+    is rebuilt once that set grows past a fraction of the whole. Dragging a
+    selection therefore only ever touches the overflow set.
+    """
+    REBUILD_FRACTION = 0.1
+    MIN_OVERFLOW = 256
+
+    def __init__(self, items=()):
+        self.tree, self.in_tree = RTree([]), set()
+        self.stale, self.overflow = set(), set()
+        self.rebuilds = 0
+        self.rebuild(items)
+
+    def __len__(self): return len(self.in_tree) - len(self.stale) + len(self.overflow)
+
+    def rebuild(self, items=None):
+        if items is None: items = (self.in_tree - self.stale) | self.overflow
+        items = list(items)
+        self.tree = RTree([(_bounds(item), item) for item in items])
+        self.in_tree, self.stale, self.overflow = set(items), set(), set()
+        self.rebuilds += 1
+
+    def add(self, item):
+        self.overflow.add(item)
+        if item in self.in_tree: self.stale.add(item)
+
+    def discard(self, item):
+        self.overflow.discard(item)
+        if item in self.in_tree: self.stale.add(item)
+
+    def changed(self, item):
+        if item in self.in_tree or item in self.overflow: self.add(item)
+
+    def query(self, left, top, right, bottom):
+        if len(self.overflow) > max(self.MIN_OVERFLOW, self.REBUILD_FRACTION * len(self.in_tree)): self.rebuild()
+        hits = [item for item in self.tree.query(left, top, right, bottom) if item not in self.stale]
+        for item in self.overflow:
+            box = _bounds(item)
+            if not (box[0] > right or box[2] < left or box[1] > bottom or box[3] < top): hits.append(item)
+        return hits
+
+    def stats(self):
+        return {'items': len(self), 'tree': len(self.in_tree), 'stale': len(self.stale), 'overflow': len(self.overflow), 'rebuilds': self.rebuilds}
@@ -0,0 +1,62 @@
+# stroke_geometry.py
+# Freehand strokes are stored as flat array('f') buffers: x0, y0, x1, y1, ...
+from array import array
+from PyQt5.QtGui import QPainterPath
+
+POINT_TYPECODE = 'f'
+
+def new_points(values=()):
+    return array(POINT_TYPECODE, values)
+
+def points_from_path(path):
+    points = new_points()
+    for i in range(path.elementCount()):
+        e = path.elementAt(i); points.append(e.x); points.append(e.y)
+    return points
+
+def simplify(points, tolerance):
+    """Ramer-Douglas-Peucker: drop points closer than tolerance to the simplified polyline."""
+    n = len(points) // 2
+    if n < 3 or tolerance <= 0: return new_points(points)
+    keep = bytearray(n); keep[0] = keep[-1] = 1
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay, bx, by = points[2*first], points[2*first+1], points[2*last], points[2*last+1]
+        dx, dy = bx - ax, by - ay
+        seg_len2 = dx * dx + dy * dy
+        max_d2, index = 0.0, 0
+        for i in range(first + 1, last):
+            px, py = points[2*i] - ax, points[2*i+1] - ay
+            if seg_len2 == 0:
+                d2 = px * px + py * py
+            else:
+                cross = px * dy - py * dx
+                d2 = cross * cross / seg_len2
+            if d2 > max_d2: max_d2, index = d2, i
+        if max_d2 > tol2:
+            keep[index] = 1
+            stack.append((first, index)); stack.append((index, last))
+    out = new_points()
+    for i in range(n):
+        if keep[i]: out.append(points[2*i]); out.append(points[2*i+1])
+    return out
+
+def build_path(points, smooth=False):
+    """Polyline through points, or a Catmull-Rom spline (as cubic Beziers) when smooth."""
+    path = QPainterPath()
+    n = len(points) // 2
+    if n == 0: return path
+    path.moveTo(points[0], points[1])
+    if not smooth or n < 3:
+        for i in range(1, n): path.lineTo(points[2*i], points[2*i+1])
+        return path
+    for i in range(n - 1):
+        p0 = max(i - 1, 0); p3 = min(i + 2, n - 1)
+        x0, y0 = points[2*p0], points[2*p0+1]
+        x1, y1 = points[2*i], points[2*i+1]
+        x2, y2 = points[2*i+2], points[2*i+3]
+        x3, y3 = points[2*p3], points[2*p3+1]
+        path.cubicTo(x1 + (x2 - x0) / 6, y1 + (y2 - y0) / 6, x2 - (x3 - x1) / 6, y2 - (y3 - y1) / 6, x2, y2)
+    return path
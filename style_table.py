@@ -0,0 +1,50 @@
+# style_table.py
+from PyQt5.QtGui import QColor, QPen, QBrush
+from PyQt5.QtCore import Qt
+
+class Style:
+    """One interned combination of stroke, fill, width, cap, join and opacity.
+
+    Shared by every item using it and never modified; the pen and brush are
+    built once here so painting only hands them to the painter. Callers must
+    not change the returned QColor, QPen or QBrush in place.
+    """
+    __slots__ = ('stroke', 'fill', 'width', 'cap', 'join', 'opacity', 'pen', 'brush', 'head_pen', 'head_brush')
+
+    def __init__(self, stroke, fill, width, cap, join, opacity):
+        self.stroke, self.fill, self.width, self.cap, self.join, self.opacity = QColor(stroke), QColor(fill), width, cap, join, opacity
+        self.pen = QPen(self.stroke, width, Qt.SolidLine, cap, join)
+        self.brush = QBrush(self.fill)
+        # Arrowheads are filled with the stroke colour and outlined with a cosmetic pen
+        self.head_pen, self.head_brush = QPen(self.stroke), QBrush(self.stroke)
+
+    def replace(self, **changes):
+        """The id of the style equal to this one except for changes."""
+        values = {'stroke': self.stroke, 'fill': self.fill, 'width': self.width, 'cap': self.cap, 'join': self.join, 'opacity': self.opacity}
+        values.update(changes)
+        return style_table.intern(**values)
+
+class StyleTable:
+    """Interns Styles so items store a small integer instead of their own colours and pens.
+
+    Drawings use a handful of styles across thousands of shapes; the table
+    keeps one Style per distinct combination for the life of the process.
+    """
+    def __init__(self):
+        self.styles = []
+        self.ids = {}
+
+    def intern(self, stroke=QColor("#343a40"), fill=QColor(Qt.transparent), width=4, cap=Qt.RoundCap, join=Qt.RoundJoin, opacity=1.0):
+        key = (QColor(stroke).rgba(), QColor(fill).rgba(), width, int(cap), int(join), opacity)
+        style_id = self.ids.get(key)
+        if style_id is None:
+            style_id = self.ids[key] = len(self.styles)
+            self.styles.append(Style(stroke, fill, width, cap, join, opacity))
+        return style_id
+
+    def __getitem__(self, style_id): return self.styles[style_id]
+
+    def __len__(self): return len(self.styles)
+
+style_table = StyleTable()
+DEFAULT_STYLE = style_table.intern()
@@ -0,0 +1,206 @@
+# undo_history.py
+import tempfile
+import zlib
+from array import array
+from PyQt5.QtCore import QObject, QTimer
+
+from graphics_items import FreehandItem, ImageItem
+from image_store import image_store
+
+DEFAULT_BUDGET_MB = 256
+# Payloads smaller than this stay in memory; spilling them would cost more than it saves
+SPILL_MIN_BYTES = 64 * 1024
+ITEM_OVERHEAD_BYTES = 512
+
+def held_items(command):
+    """Items a command (and its children) keeps references to."""
+    items = list(command.held_items()) if hasattr(command, 'held_items') else []
+    for i in range(command.childCount()): items.extend(held_items(command.child(i)))
+    return items
+
+def payload_bytes(item):
+    """Approximate memory held by an item's own payload. Image pixels belong to
+    the image store and are accounted once per image, not per item."""
+    if isinstance(item, FreehandItem): return len(item.points) * item.points.itemsize
+    return 0
+
+def item_nodes(item):
+    """item and all its descendants."""
+    yield item
+    for child in item.childItems(): yield from item_nodes(child)
+
+# Point buffers are spilled zlib-compressed; images are spilled by the image store
+def _encode_points(item): return zlib.compress(item.points.tobytes(), 1)
+
+def _decode_points(item, data):
+    points = array(item.points.typecode); points.frombytes(zlib.decompress(data))
+    item.set_points(points)
+
+class SpillRecord:
+    """Where a payload lives in the journal. Stroke items carry one as
+    spill_record while spilled and restore themselves when re-entering a scene."""
+    __slots__ = ('journal', 'offset', 'length', 'memory')
+    def __init__(self, journal, offset, length, memory):
+        self.journal, self.offset, self.length, self.memory = journal, offset, length, memory
+    def restore(self, item):
+        item.spill_record = None
+        _decode_points(item, self.journal.read(self))
+        self.journal.release(self)
+
+class SpillJournal:
+    """Append-only temporary file of spilled payloads. Space is reclaimed by
+    truncating the file once no spilled payload is left in it."""
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.file = None
+        self.live = set()
+        self.size = 0
+    def append(self, data, memory):
+        if self.file is None: self.file = tempfile.TemporaryFile(prefix='undo-', suffix='.spill', dir=self.directory)
+        self.file.seek(self.size); self.file.write(data)
+        record = SpillRecord(self, self.size, len(data), memory)
+        self.size += len(data); self.live.add(record)
+        return record
+    def read(self, record):
+        self.file.seek(record.offset); return self.file.read(record.length)
+    def release(self, record):
+        self.live.discard(record)
+        if not self.live and self.file is not None: self.file.truncate(0); self.size = 0
+    def live_bytes(self): return sum(r.length for r in self.live)
+    def close(self):
+        if self.file is not None: self.file.close(); self.file = None
+        self.live.clear(); self.size = 0
+
+class UndoHistory(QObject):
+    """Keeps the memory held by an undo stack's off-scene items under a budget.
+
+    Items that only the history references (deleted items, undone additions)
+    are kept in a running total. When the stack index moves, only the
+    commands it crossed, and any pushed, merged or dropped, are measured
+    again. While the total exceeds the budget, the payloads of those furthest
+    from the current index are written to a spill journal and dropped from
+    memory; an item reads its payload back when a command puts it into a
+    scene again.
+    """
+    def __init__(self, undo_stack, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024, journal_dir=None, parent=None):
+        super().__init__(parent)
+        self.stack, self.budget = undo_stack, budget_bytes
+        self.journal = SpillJournal(journal_dir)
+        self.commands = []  # [command, off-scene nodes it holds, spill candidates] in stack order, as last measured
+        self.nodes = {}     # off-scene node -> [commands holding it, bytes, image id]
+        self.images = {}    # image id -> off-scene nodes showing it
+        self.held, self.index = 0, 0
+        self.spilled = {}   # stroke item -> SpillRecord, for items the history still references
+        self.enforce_timer = QTimer(self, singleShot=True, interval=0, timeout=self.enforce)
+        undo_stack.indexChanged.connect(self.schedule_enforce)
+
+    def set_budget(self, budget_bytes):
+        self.budget = budget_bytes; self.enforce()
+
+    def schedule_enforce(self):
+        if not self.enforce_timer.isActive(): self.enforce_timer.start()
+
+    # --- Running total ---
+    def _measure(self, command):
+        """Nodes of the items only command keeps alive, and the payloads among them worth spilling."""
+        nodes, candidates = set(), []
+        for item in held_items(command):
+            if item.scene() is not None: continue
+            for node in item_nodes(item):
+                if node in nodes: continue
+                nodes.add(node)
+                if isinstance(node, FreehandItem) and payload_bytes(node) >= SPILL_MIN_BYTES: candidates.append(node)
+                elif isinstance(node, ImageItem) and node.image_id is not None: candidates.append(node.image_id)
+        return [command, nodes, candidates]
+
+    def _count(self, nodes):
+        for node in nodes:
+            entry = self.nodes.get(node)
+            if entry is None:
+                image_id = node.image_id if isinstance(node, ImageItem) else None
+                entry = self.nodes[node] = [0, ITEM_OVERHEAD_BYTES + payload_bytes(node), image_id]
+                self.held += entry[1]
+                if image_id is not None: self.images[image_id] = self.images.get(image_id, 0) + 1
+            entry[0] += 1
+
+    def _uncount(self, nodes):
+        for node in nodes:
+            entry = self.nodes[node]; entry[0] -= 1
+            if entry[0]: continue
+            del self.nodes[node]; self.held -= entry[1]
+            if (image_id := entry[2]) is not None:
+                self.images[image_id] -= 1
+                if not self.images[image_id]: del self.images[image_id]
+            # A payload still spilled when no command holds its item was dropped with the command
+            record = self.spilled.pop(node, None)
+            if record is not None and getattr(node, 'spill_record', None) is record: self.journal.release(record)
+
+    def _replace(self, i, entry):
+        # Counting the new state first keeps nodes held before and after from dropping to zero
+        self._count(entry[1])
+        if i < len(self.commands): self._uncount(self.commands[i][1]); self.commands[i] = entry
+        else: self.commands.append(entry)
+
+    def _truncate(self, count):
+        for _, nodes, _ in self.commands[count:]: self._uncount(nodes)
+        del self.commands[count:]
+
+    def _sync(self):
+        """Measure again the commands changed since the last call."""
+        count, index, commands = self.stack.count(), self.stack.index(), self.commands
+        # The undo limit drops commands off the bottom of the stack, clear() drops them all
+        first, dropped = self.stack.command(0) if count else None, 0
+        while commands and commands[0][0] is not first:
+            self._uncount(commands.pop(0)[1]); dropped += 1
+        # Commands the index crossed, and the one below it, which a push may have merged into
+        old = max(self.index - dropped, 0)
+        crossed = min(max(old, index), count)
+        for i in range(max(min(old, index) - 1, 0), crossed):
+            command = self.stack.command(i)
+            if i < len(commands) and commands[i][0] is not command: self._truncate(i)
+            self._replace(i, self._measure(command))
+        # A push after undoing replaces the redo commands above the index
+        for i in range(crossed, min(len(commands), count)):
+            if commands[i][0] is not self.stack.command(i): self._truncate(i); break
+        self._truncate(count)
+        for i in range(len(commands), count): self._replace(i, self._measure(self.stack.command(i)))
+        self.index = index
+
+    def held_bytes(self):
+        """Bytes held only by the history: its off-scene items and the images no scene item shows."""
+        return self.held + sum(image_store.image_bytes(image_id) for image_id in self.images if image_id in image_store and not self._shown(image_id))
+
+    def _shown(self, image_id):
+        # An image still shown in the scene is held by the document, not by the history
+        return any(ref.scene() is not None for ref in image_store.references(image_id))
+
+    def enforce(self):
+        self.enforce_timer.stop()
+        self._sync()
+        image_store.collect()
+        held = self.held_bytes()
+        if held <= self.budget: return
+        index = self.index
+        for i in sorted(range(len(self.commands)), key=lambda i: index - i if i < index else i - index + 1, reverse=True):
+            for target in self.commands[i][2]:
+                if held <= self.budget: return
+                if isinstance(target, str):
+                    if target in image_store and not self._shown(target): held -= image_store.spill(target, self.journal)
+                elif getattr(target, 'spill_record', None) is None: held -= self.spill(target)
+
+    def spill(self, item):
+        """Move a stroke's points to the journal; returns the bytes freed."""
+        memory = payload_bytes(item)
+        record = self.journal.append(_encode_points(item), memory)
+        item.set_points(array(item.points.typecode))
+        item.spill_record = record; self.spilled[item] = record
+        if (entry := self.nodes.get(item)) is not None: entry[1] -= memory; self.held -= memory
+        return memory
+
+    def stats(self):
+        self._sync()
+        store = image_store.stats()
+        return {'commands': self.stack.count(), 'held_bytes': self.held_bytes(), 'budget': self.budget, 'spilled_items': len(self.spilled) + store['spilled'],
+                'spilled_bytes': sum(r.memory for r in self.spilled.values()) + store['spilled_bytes'], 'journal_bytes': self.journal.size, 'journal_live_bytes': self.journal.live_bytes()}
+
+    def close(self): self.journal.close(); self.spilled.clear()
@@ -0,0 +1,124 @@
+# z_order.py
+import bisect
+import itertools
+from contextlib import contextmanager
+
+class ZOrderIndex:
+    """Top-level scene items kept sorted by stacking order.
+
+    Neighbour and extreme queries are O(log n). Ties in z are broken by the
+    order items entered the index, which matches how Qt stacks equal-z siblings.
+    """
+    MIN_GAP = 1e-6
+
+    def __init__(self):
+        self._keys, self._items, self._key_of = [], [], {}
+        self._seq = itertools.count()
+        self._bulk, self._pending = 0, set()
+
+    def __len__(self): return len(self._items)
+    def __contains__(self, item): return item in self._key_of
+
+    def clear(self):
+        self._keys.clear(); self._items.clear(); self._key_of.clear(); self._pending.clear()
+
+    def add(self, item):
+        if item in self._key_of: self.update(item); return
+        key = (item.zValue(), next(self._seq))
+        i = bisect.bisect(self._keys, key)
+        self._keys.insert(i, key); self._items.insert(i, item); self._key_of[item] = key
+
+    def discard(self, item):
+        key = self._key_of.pop(item, None)
+        if key is None: return
+        i = bisect.bisect_left(self._keys, key)
+        del self._keys[i]; del self._items[i]
+        self._pending.discard(item)
+
+    def update(self, item):
+        key = self._key_of.get(item)
+        if key is None or key[0] == item.zValue(): return
+        if self._bulk: self._pending.add(item); return
+        self.discard(item); self.add(item)
+
+    @contextmanager
+    def bulk(self):
+        """Defer re-sorting while many z values change; large batches trigger a single rebuild."""
+        self._bulk += 1
+        try:
+            yield self
+        finally:
+            self._bulk -= 1
+            if not self._bulk and self._pending:
+                pending, self._pending = self._pending, set()
+                if len(pending) * 8 > len(self._items): self._rebuild()
+                else:
+                    for item in pending: self.discard(item); self.add(item)
+
+    def _rebuild(self):
+        ordered = sorted(zip(self._keys, self._items), key=lambda pair: (pair[1].zValue(), pair[0][1]))
+        self._keys = [(item.zValue(), key[1]) for key, item in ordered]
+        self._items = [item for _, item in ordered]
+        self._key_of = dict(zip(self._items, self._keys))
+
+    def position(self, item): return bisect.bisect_left(self._keys, self._key_of[item])
+    def items(self): return list(self._items)
+    def top_z(self, default=0.0): return self._keys[-1][0] if self._keys else default
+    def bottom_z(self, default=0.0): return self._keys[0][0] if self._keys else default
+
+    def above(self, item):
+        i = self.position(item) + 1
+        return self._items[i] if i < len(self._items) else None
+
+    def below(self, item):
+        i = self.position(item) - 1
+        return self._items[i] if i >= 0 else None
+
+# --- Reordering plans ---
+# Each plan applies its z changes immediately and returns {item: (old_z, new_z)}
+# for every item it touched, ready to be wrapped in a ZOrderCommand.
+
+class _Changes(dict):
+    def set(self, item, z):
+        old = self[item][0] if item in self else item.zValue()
+        item.setZValue(z); self[item] = (old, z)
+
+def _renormalize(index, changes):
+    """Respace every item to integer z values, keeping the current order."""
+    with index.bulk():
+        for rank, item in enumerate(index.items()): changes.set(item, float(rank))
+
+def _ordered(index, items):
+    return sorted((i for i in items if i in index), key=index.position)
+
+def bring_to_front(index, items):
+    changes, top = _Changes(), index.top_z()
+    with index.bulk():
+        for offset, item in enumerate(_ordered(index, items), 1): changes.set(item, top + offset)
+    return changes
+
+def send_to_back(index, items):
+    ordered, changes = _ordered(index, items), _Changes()
+    bottom = index.bottom_z()
+    with index.bulk():
+        for offset, item in enumerate(ordered): changes.set(item, bottom - len(ordered) + offset)
+    return changes
+
+def _step(index, items, forward):
+    selected, changes = set(items), _Changes()
+    ordered = _ordered(index, items)
+    neighbour_of = index.above if forward else index.below
+    for item in (reversed(ordered) if forward else ordered):
+        target = neighbour_of(item)
+        while target is not None and target in selected: target = neighbour_of(target)
+        if target is None: continue
+        beyond = neighbour_of(target)
+        if beyond is not None and abs(beyond.zValue() - target.zValue()) < 2 * ZOrderIndex.MIN_GAP:
+            _renormalize(index, changes); beyond = neighbour_of(target)
+        if beyond is None: z = target.zValue() + (1 if forward else -1)
+        else: z = (target.zValue() + beyond.zValue()) / 2
+        changes.set(item, z)
+    return changes
+
+def bring_forward(index, items): return _step(index, items, forward=True)
+def send_backward(index, items): return _step(index, items, forward=False)